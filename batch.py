@@ -0,0 +1,392 @@
+"""
+Headless batch commands. None of them import PySide6.
+
+    python -m sudokuSolver solve --jobs N in.txt > out.txt
+
+Reads one puzzle per line in the 81 or 162 character formats accepted by the
+input dialog and writes one line per puzzle, in input order: the 81 digit
+solution, "no solution" or "invalid input". With --cache PATH the results
+are kept in a puzzle cache shared by the workers, see puzzle_cache.py.
+
+    python -m sudokuSolver generate -n N --band hard --jobs N > out.txt
+
+Writes N unique puzzles of the wanted symmetry and difficulty band.
+
+    python -m sudokuSolver serve --port 8765 --jobs N
+    python -m sudokuSolver load --port 8765 puzzles.txt
+
+Run the local solve service and a load generator against it, see server.py.
+
+    python -m sudokuSolver pack in.txt out.sudc --solutions solved.txt
+    python -m sudokuSolver unpack in.sudc > out.txt
+
+Convert puzzle files to and from the packed binary corpus, see corpus.py.
+
+    python -m sudokuSolver enumerate PUZZLE -n 100 [--resume CURSOR]
+    python -m sudokuSolver enumerate PUZZLE --count --jobs N
+
+List the solutions of one puzzle, printing a cursor to continue from, or
+count them by splitting the search over N processes, see enumerator.py.
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from codec import parse_board
+from corpus import CANDIDATES, SOLUTIONS, Corpus, CorpusWriter, pack_lines, unpack_lines
+from enumerator import SolutionEnumerator, count_parallel
+from generator import BANDS, SYMMETRIES, generate_many
+from puzzle_cache import DEFAULT_MAX_ENTRIES, PuzzleCache
+from solver import solve
+
+NO_SOLUTION = "no solution"
+INVALID_INPUT = "invalid input"
+
+
+def solve_line(line: str, cache=None) -> str:
+    try:
+        board = parse_board(line)
+    except ValueError:
+        return INVALID_INPUT
+    result = solve(board) if cache is None else cache.solve(board)
+    return str(result) if result.solved else NO_SOLUTION
+
+
+# puzzle cache of a worker process, see _init_worker
+_cache = None
+
+
+def _init_worker(cache_path, cache_size: int) -> None:
+    global _cache
+    if cache_path is not None:
+        _cache = PuzzleCache(cache_path, cache_size)
+
+
+def solve_chunk(lines: list) -> tuple:
+    """
+    Solves a chunk of puzzle lines, through the worker's cache if it has one;
+    returns (output lines, pid, busy seconds, cache hits).
+    """
+    start = time.perf_counter()
+    if _cache is None:
+        output = [solve_line(line) for line in lines]
+        hits = 0
+    else:
+        before = _cache.hits
+        output = [solve_line(line, _cache) for line in lines]
+        hits = _cache.hits - before
+        # other workers and later runs see the results of finished chunks
+        _cache.flush()
+    return output, os.getpid(), time.perf_counter() - start, hits
+
+
+class WorkerStats:
+    __slots__ = ("chunks", "puzzles", "busy", "hits")
+
+    def __init__(self) -> None:
+        self.chunks = 0
+        self.puzzles = 0
+        self.busy = 0.0
+        self.hits = 0
+
+
+def read_chunks(stream, chunk_size: int):
+    """Yields lists of up to chunk_size stripped, non-blank lines."""
+    lines = (line.strip() for line in stream)
+    lines = (line for line in lines if line)
+    while True:
+        chunk = list(islice(lines, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def solve_stream(
+    source, sink, jobs: int = 1, chunk_size: int = 256, cache_path=None, cache_size: int = DEFAULT_MAX_ENTRIES
+) -> dict:
+    """
+    Solves every puzzle line of source and writes the results to sink in
+    input order. At most 2 * jobs chunks are in flight at any time, so memory
+    stays bounded regardless of the input size. Returns per-worker stats
+    keyed by pid.
+    """
+    stats = {}
+
+    def write(result) -> None:
+        output, pid, busy, hits = result
+        worker = stats.setdefault(pid, WorkerStats())
+        worker.chunks += 1
+        worker.puzzles += len(output)
+        worker.busy += busy
+        worker.hits += hits
+        sink.write("\n".join(output))
+        sink.write("\n")
+
+    global _cache
+    chunks = read_chunks(source, chunk_size)
+    if jobs <= 1:
+        _init_worker(cache_path, cache_size)
+        try:
+            for chunk in chunks:
+                write(solve_chunk(chunk))
+        finally:
+            if _cache is not None:
+                _cache.close()
+                _cache = None
+        return stats
+
+    with ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(cache_path, cache_size)) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(solve_chunk, chunk))
+            if len(pending) >= 2 * jobs:
+                write(pending.popleft().result())
+        while pending:
+            write(pending.popleft().result())
+    return stats
+
+
+def format_summary(stats: dict, elapsed: float) -> str:
+    total = sum(worker.puzzles for worker in stats.values())
+    lines = [f"{total} puzzles in {elapsed:.3f} s ({total / elapsed if elapsed else 0:.1f} puzzles/sec)"]
+    hits = sum(worker.hits for worker in stats.values())
+    if hits:
+        lines.append(f"  {hits} answered from the cache")
+    for pid, worker in sorted(stats.items()):
+        rate = worker.puzzles / worker.busy if worker.busy else 0
+        lines.append(
+            f"  worker {pid}: {worker.puzzles} puzzles in {worker.chunks} chunks, "
+            f"busy {worker.busy:.3f} s ({rate:.1f} puzzles/sec)"
+        )
+    return "\n".join(lines)
+
+
+def format_generate_summary(stats: dict, elapsed: float) -> str:
+    attempts = sum(band.puzzles for band in stats.values())
+    lines = [f"{attempts} puzzles generated in {elapsed:.3f} s ({attempts / elapsed if elapsed else 0:.1f} puzzles/sec)"]
+    for name in BANDS:
+        if name not in stats:
+            continue
+        band = stats[name]
+        rate = band.puzzles / band.time if band.time else 0
+        lines.append(
+            f"  {name}: {band.puzzles} puzzles, {band.puzzles / elapsed if elapsed else 0:.1f} puzzles/sec overall, "
+            f"{rate:.1f} puzzles/sec per worker"
+        )
+    return "\n".join(lines)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="sudokuSolver")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    solve_parser = commands.add_parser("solve", help="solve a file of puzzles, one per line")
+    solve_parser.add_argument("input", nargs="?", default="-", help="puzzle file, - for stdin")
+    solve_parser.add_argument("-o", "--output", default="-", help="output file, - for stdout")
+    solve_parser.add_argument("-j", "--jobs", type=int, default=1, help="number of worker processes")
+    solve_parser.add_argument("--chunk-size", type=int, default=256, help="puzzles per work item")
+    solve_parser.add_argument("--cache", default=None, help="SQLite puzzle cache to check and fill")
+    solve_parser.add_argument(
+        "--cache-size", type=int, default=DEFAULT_MAX_ENTRIES, help="puzzles kept in the cache"
+    )
+    solve_parser.add_argument("-q", "--quiet", action="store_true", help="do not print the summary")
+
+    generate_parser = commands.add_parser("generate", help="generate unique puzzles, one per line")
+    generate_parser.add_argument("-n", "--count", type=int, default=1, help="number of puzzles to write")
+    generate_parser.add_argument("-o", "--output", default="-", help="output file, - for stdout")
+    generate_parser.add_argument("-j", "--jobs", type=int, default=1, help="number of worker processes")
+    generate_parser.add_argument("--symmetry", choices=SYMMETRIES, default="rotational")
+    generate_parser.add_argument("--band", choices=BANDS, default=None, help="difficulty band, any if omitted")
+    generate_parser.add_argument("--seed", type=int, default=None)
+    generate_parser.add_argument("-q", "--quiet", action="store_true", help="do not print the summary")
+
+    serve_parser = commands.add_parser("serve", help="answer solve requests over a local socket")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    serve_parser.add_argument("--port", type=int, default=8765, help="TCP port, 0 picks a free one")
+    serve_parser.add_argument("--socket", default=None, help="listen on this Unix socket instead of TCP")
+    serve_parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="number of worker processes")
+    serve_parser.add_argument("--batch-size", type=int, default=64, help="most requests per worker call")
+    serve_parser.add_argument(
+        "--batch-delay", type=float, default=2.0, help="milliseconds a request waits for others to batch with"
+    )
+    serve_parser.add_argument("--cache", default=None, help="SQLite puzzle cache to check and fill")
+    serve_parser.add_argument(
+        "--cache-size", type=int, default=DEFAULT_MAX_ENTRIES, help="puzzles kept in the cache"
+    )
+
+    load_parser = commands.add_parser("load", help="send puzzles to a running service and report its latency")
+    load_parser.add_argument("input", help="puzzle file, one puzzle per line, reused round robin")
+    load_parser.add_argument("--host", default="127.0.0.1")
+    load_parser.add_argument("--port", type=int, default=8765)
+    load_parser.add_argument("--socket", default=None, help="connect to this Unix socket instead of TCP")
+    load_parser.add_argument("-n", "--requests", type=int, default=10_000, help="number of requests to send")
+    load_parser.add_argument("-c", "--connections", type=int, default=8, help="concurrent connections")
+    load_parser.add_argument("--window", type=int, default=32, help="unanswered requests per connection")
+    load_parser.add_argument(
+        "--op", choices=("plain", "solve", "count", "candidates"), default="plain",
+        help="plain puzzle lines or JSON requests of this operation",
+    )
+
+    pack_parser = commands.add_parser("pack", help="convert a puzzle file to a packed binary corpus")
+    pack_parser.add_argument("input", help="puzzle file, one puzzle per line, - for stdin")
+    pack_parser.add_argument("output", help="corpus file to write")
+    pack_parser.add_argument("--size", type=int, default=9, help="grid size of the puzzles")
+    pack_parser.add_argument(
+        "--candidates", action="store_true", help="keep centermarks and placed digits of 162 character lines"
+    )
+    pack_parser.add_argument("--solutions", default=None, help="solve output of the same file, one line per puzzle")
+    pack_parser.add_argument("--append", action="store_true", help="add to an existing corpus in its own layout")
+    pack_parser.add_argument("-q", "--quiet", action="store_true", help="do not print the summary")
+
+    unpack_parser = commands.add_parser("unpack", help="write the puzzles of a corpus as text lines")
+    unpack_parser.add_argument("input", help="corpus file")
+    unpack_parser.add_argument("-o", "--output", default="-", help="output file, - for stdout")
+    unpack_parser.add_argument("--solutions", action="store_true", help="write the stored solutions instead")
+
+    enumerate_parser = commands.add_parser("enumerate", help="list or count the solutions of one puzzle")
+    enumerate_parser.add_argument("puzzle", help="81 or 162 character puzzle")
+    enumerate_parser.add_argument("-n", "--limit", type=int, default=10, help="solutions to list, 0 for all")
+    enumerate_parser.add_argument("--resume", default=None, help="cursor printed by an earlier run")
+    enumerate_parser.add_argument("-o", "--output", default="-", help="output file, - for stdout")
+    enumerate_parser.add_argument("--count", action="store_true", help="count all solutions instead of listing them")
+    enumerate_parser.add_argument("-j", "--jobs", type=int, default=1, help="worker processes for --count")
+    enumerate_parser.add_argument("--parts", type=int, default=None, help="subtrees for --count, 8 per job by default")
+    enumerate_parser.add_argument("-q", "--quiet", action="store_true", help="do not print the summary")
+    return parser
+
+
+def run_generate(args) -> int:
+    sink = sys.stdout if args.output == "-" else open(args.output, "w")
+    stats = {}
+    try:
+        start = time.perf_counter()
+        for puzzle in generate_many(args.count, args.symmetry, args.band, args.jobs, args.seed, stats):
+            sink.write(puzzle)
+            sink.write("\n")
+        sink.flush()
+        elapsed = time.perf_counter() - start
+    finally:
+        if sink is not sys.stdout:
+            sink.close()
+
+    if not args.quiet:
+        print(format_generate_summary(stats, elapsed), file=sys.stderr)
+    return 0
+
+
+def run_pack(args) -> int:
+    source = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+    solutions = open(args.solutions, "rb") if args.solutions else None
+    planes = (CANDIDATES if args.candidates else 0) | (SOLUTIONS if solutions else 0)
+    try:
+        start = time.perf_counter()
+        with CorpusWriter(args.output, args.size, planes, args.append) as writer:
+            written, invalid = pack_lines(source, writer, solutions)
+        elapsed = time.perf_counter() - start
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+        if solutions is not None:
+            solutions.close()
+
+    if not args.quiet:
+        print(
+            f"{written} puzzles packed in {elapsed:.3f} s ({written / elapsed if elapsed else 0:.1f} puzzles/sec), "
+            f"{os.path.getsize(args.output)} bytes" + (f", {invalid} invalid lines skipped" if invalid else ""),
+            file=sys.stderr,
+        )
+    return 0
+
+
+def run_unpack(args) -> int:
+    sink = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        with Corpus(args.input) as corpus:
+            unpack_lines(corpus, sink, args.solutions)
+        sink.flush()
+    finally:
+        if sink is not sys.stdout.buffer:
+            sink.close()
+    return 0
+
+
+def run_enumerate(args) -> int:
+    try:
+        board = parse_board(args.puzzle)
+        enumerator = SolutionEnumerator(board, args.resume)
+    except ValueError as error:
+        print(f"sudokuSolver enumerate: {error}", file=sys.stderr)
+        return 2
+
+    start = time.perf_counter()
+    if args.count:
+        counts = count_parallel(board, args.jobs, args.parts)
+        elapsed = time.perf_counter() - start
+        print(sum(count for count, _ in counts))
+        if not args.quiet:
+            nodes = sum(nodes for _, nodes in counts)
+            print(f"{len(counts)} subtrees, {nodes} nodes in {elapsed:.3f} s", file=sys.stderr)
+        return 0
+
+    sink = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        first = enumerator.count
+        for solution in enumerator:
+            sink.write("".join(map(str, solution)))
+            sink.write("\n")
+            if args.limit and enumerator.count - first >= args.limit:
+                break
+        sink.flush()
+        elapsed = time.perf_counter() - start
+    finally:
+        if sink is not sys.stdout:
+            sink.close()
+
+    if not args.quiet:
+        print(
+            f"solutions {first + 1} to {enumerator.count} in {elapsed:.3f} s, {enumerator.nodes} nodes"
+            if enumerator.count > first else "no more solutions",
+            file=sys.stderr,
+        )
+    if not enumerator.done:
+        print(f"cursor: {enumerator.cursor()}", file=sys.stderr)
+    return 0
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == "generate":
+        return run_generate(args)
+    if args.command == "pack":
+        return run_pack(args)
+    if args.command == "unpack":
+        return run_unpack(args)
+    if args.command == "enumerate":
+        return run_enumerate(args)
+    if args.command in ("serve", "load"):
+        # asyncio is only needed by these two
+        from server import run_load, run_serve
+
+        return run_serve(args) if args.command == "serve" else run_load(args)
+
+    source = sys.stdin if args.input == "-" else open(args.input)
+    sink = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        start = time.perf_counter()
+        stats = solve_stream(source, sink, args.jobs, args.chunk_size, args.cache, args.cache_size)
+        sink.flush()
+        elapsed = time.perf_counter() - start
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+    if not args.quiet:
+        print(format_summary(stats, elapsed), file=sys.stderr)
+    return 0
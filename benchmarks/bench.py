@@ -0,0 +1,290 @@
+"""
+Benchmark suite.
+
+    python benchmarks/bench.py                      # run, compare with baseline.json
+    python benchmarks/bench.py -o results.json      # also write the results
+    python benchmarks/bench.py --update-baseline    # store the results as the new baseline
+
+Every result is the time of one operation in seconds, the best of many
+short timed loops. While results are more than --threshold (default 50%)
+slower than the baseline, the suite runs again, up to --rounds times, and
+each result keeps its best round. What is still slower is reported as a
+regression and makes the script exit with 1.
+The GUI benchmarks run on Qt's offscreen platform plugin.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+# keep the window from opening the user's puzzle cache and session journal
+os.environ.setdefault("SUDOKU_CACHE", "0")
+os.environ.setdefault("SUDOKU_JOURNAL", "0")
+
+import PySide6  # noqa: E402
+from PySide6.QtCore import QSize  # noqa: E402
+from PySide6.QtGui import QPixmap  # noqa: E402
+from PySide6.QtWidgets import QApplication  # noqa: E402
+
+from board import Board  # noqa: E402
+from canonical import canonicalize  # noqa: E402
+from codec import encode, parse_board  # noqa: E402
+from input_output_dialogs import InputDialog, OutputDialog  # noqa: E402
+from logic import solve_logically  # noqa: E402
+from main_window import MainWindow  # noqa: E402
+from puzzle_cache import PuzzleCache  # noqa: E402
+from solver import solve  # noqa: E402
+
+CORPUS = os.path.join(HERE, "puzzles.txt")
+BASELINE = os.path.join(HERE, "baseline.json")
+# shared machines easily vary by a third between runs, tighten on a quiet machine
+THRESHOLD = 0.5
+# rounds of the whole suite at most, a regression must persist in all of them
+ROUNDS = 3
+# shortest timed loop of measure, longer than the clock's resolution and a scheduler tick
+SAMPLE_TIME = 0.005
+WINDOW_SIZES = ((400, 400), (800, 800), (1600, 1600))
+
+SPARSE = "4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......"
+FULL = "358967421741352689629184375173546892492873516586219743264795138915438267837621954"
+# a headless tool: parse a puzzle, check it and fill its centermarks without Qt or numpy
+HEADLESS = f"""
+import sys
+from codec import parse_board
+board = parse_board("{SPARSE}")
+board.check_conflicts()
+board.update_candidates(fill=True)
+if "PySide6" in sys.modules or "numpy" in sys.modules:
+    sys.exit("the core imported PySide6 or numpy")
+"""
+
+
+def measure(function, min_time: float = 0.1, repeat: int = 7) -> float:
+    """
+    Returns the best time of one call to function, taken over loops of at
+    least SAMPLE_TIME that run for repeat * min_time in total. A pause of
+    the machine slows one short loop, while a long loop rarely escapes it.
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= SAMPLE_TIME:
+            break
+        number *= 2
+    best = elapsed / number
+    total = elapsed
+    while total < repeat * min_time:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed / number)
+        total += elapsed
+    return best
+
+
+def load_corpus(path: str = CORPUS) -> list:
+    with open(path) as stream:
+        return [line.strip() for line in stream if line.strip()]
+
+
+def sample_boards() -> dict:
+    """Empty, sparse (with all centermarks) and full boards."""
+    sparse = parse_board(SPARSE)
+    sparse.fill_candidates()
+    sparse.clear_seen_candidates()
+    return {"empty": Board(), "sparse": sparse, "full": parse_board(FULL)}
+
+
+def bench_codec(window: MainWindow, results: dict) -> None:
+    dialog = InputDialog(window)
+    sparse = sample_boards()["sparse"]
+    packed = encode(sparse)
+    results["codec.parse_board.81"] = measure(lambda: parse_board(SPARSE))
+    results["codec.parse_board.162"] = measure(lambda: parse_board(packed))
+    results["codec.encode.sparse"] = measure(lambda: encode(sparse))
+    # the dialog also validates the puzzle and fills its widgets
+    results["input_dialog.make_cells.81"] = measure(lambda: dialog.make_cells(SPARSE))
+    results["input_dialog.make_cells.162"] = measure(lambda: dialog.make_cells(packed))
+    # the checks of the puzzle are cancelled by the next one, let the last finish before timing more
+    window.tasks.cancel()
+    window.tasks.wait()
+    output = OutputDialog(window)
+    for name, board in sample_boards().items():
+        results[f"output_dialog.make_cells_reverse.{name}"] = measure(lambda: output.make_cells_reverse(board))
+
+
+def bench_check_doubles(window: MainWindow, results: dict) -> None:
+    widget = window.central_widget
+    for auto_clear in (False, True):
+        widget.auto_clear = auto_clear
+        suffix = ".auto_clear" if auto_clear else ""
+        for name, board in sample_boards().items():
+            widget.data = board
+            results[f"draw_widget.check_doubles.{name}{suffix}"] = measure(widget.checkDoubles)
+    widget.auto_clear = False
+
+
+def bench_paint(window: MainWindow, results: dict) -> None:
+    widget = window.central_widget
+    for name, board in sample_boards().items():
+        widget.data = board
+        widget.checkDoubles()
+        for width, height in WINDOW_SIZES:
+            widget.resize(width, height)
+            pixmap = QPixmap(QSize(width, height))
+
+            def cold_frame() -> None:
+                # a frame that has to rebuild the grid and centermark caches
+                widget.grid_cache_key = None
+                widget.render(pixmap)
+
+            results[f"draw_widget.paint.{name}.{width}x{height}.cold"] = measure(cold_frame, repeat=3)
+            results[f"draw_widget.paint.{name}.{width}x{height}"] = measure(lambda: widget.render(pixmap))
+
+
+def bench_solver(results: dict) -> None:
+    puzzles = load_corpus()
+
+    def solve_all() -> None:
+        for puzzle in puzzles:
+            solve(puzzle)
+
+    def solve_all_logically() -> None:
+        for puzzle in puzzles:
+            solve_logically(puzzle)
+
+    results["solver.corpus_per_puzzle"] = measure(solve_all, repeat=3) / len(puzzles)
+    results["logic.corpus_per_puzzle"] = measure(solve_all_logically, repeat=3) / len(puzzles)
+
+
+def bench_cache(results: dict) -> None:
+    puzzles = load_corpus()
+
+    def canonicalize_all() -> None:
+        for puzzle in puzzles:
+            canonicalize(puzzle)
+
+    results["canonical.corpus_per_puzzle"] = measure(canonicalize_all, repeat=3) / len(puzzles)
+    with tempfile.TemporaryDirectory() as directory:
+        with PuzzleCache(os.path.join(directory, "cache.sqlite")) as cache:
+            for puzzle in puzzles:
+                cache.solve(puzzle)
+
+            def solve_all_cached() -> None:
+                for puzzle in puzzles:
+                    cache.solve(puzzle)
+
+            results["puzzle_cache.hit_per_puzzle"] = measure(solve_all_cached, repeat=3) / len(puzzles)
+
+
+def bench_cold_start(results: dict) -> None:
+    """Wall time of a fresh interpreter running HEADLESS, the interpreter's own startup included."""
+    command = [sys.executable, "-c", HEADLESS]
+    best = None
+    for _ in range(10):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=os.path.dirname(HERE), check=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    results["core.cold_start"] = best
+
+
+def run() -> dict:
+    app = QApplication.instance() or QApplication([])
+    window = MainWindow()
+    window.show()
+    app.processEvents()
+    results = {}
+    bench_codec(window, results)
+    bench_check_doubles(window, results)
+    bench_paint(window, results)
+    bench_solver(results)
+    bench_cache(results)
+    bench_cold_start(results)
+    window.close()
+    return {
+        "python": platform.python_version(),
+        "pyside": PySide6.__version__,
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def regressed(results: dict, baseline: dict, threshold: float) -> list:
+    """The names of the results more than threshold slower than their baseline."""
+    return [
+        name for name, seconds in results.items()
+        if baseline.get(name) and seconds / baseline[name] > 1 + threshold
+    ]
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Prints a comparison table; returns the names that regressed by more than threshold."""
+    regressions = regressed(results, baseline, threshold)
+    width = max(map(len, results))
+    for name, seconds in results.items():
+        line = f"{name:<{width}}  {seconds * 1e6:12.1f} us"
+        if name in baseline:
+            ratio = seconds / baseline[name] if baseline[name] else 1.0
+            line += f"  {ratio:6.2f}x baseline"
+            if name in regressions:
+                line += "  REGRESSION"
+        print(line)
+    return regressions
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="run the benchmark suite")
+    parser.add_argument("-o", "--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="allowed slowdown, 0.5 is 50%%")
+    parser.add_argument(
+        "--rounds", type=int, default=ROUNDS, help="rounds to run at most while results regress, keeping the best"
+    )
+    parser.add_argument("--update-baseline", action="store_true", help="store the results as the baseline")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as stream:
+            baseline = json.load(stream)["results"]
+    report = run()
+    for _ in range(args.rounds - 1):
+        if not regressed(report["results"], baseline, args.threshold):
+            break
+        # a slow phase of a shared machine spans whole benchmarks, a real regression shows in every round
+        again = run()["results"]
+        report["results"] = {name: min(seconds, again[name]) for name, seconds in report["results"].items()}
+    if args.output:
+        with open(args.output, "w") as stream:
+            json.dump(report, stream, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w") as stream:
+            json.dump(report, stream, indent=2)
+            stream.write("\n")
+        compare(report["results"], {}, args.threshold)
+        return 0
+    regressions = compare(report["results"], baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regressions over {args.threshold:.0%}: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,543 @@
+import sys
+from array import array
+from functools import lru_cache
+from math import isqrt
+
+from cages import MAX_CAGE_DIGITS, Cage, cage_digits, total_range
+
+SIZE = 9
+BOX = 3
+NUM_CELLS = SIZE * SIZE
+ALL_DIGITS = (1 << SIZE) - 1
+# grid sizes the Board and the GUI support, larger grids need wider candidate masks
+MIN_SIZE = 4
+MAX_SIZE = 25
+
+# digits (1-9) set in a 9 bit candidate mask, indexed by the mask
+MASK_DIGITS = tuple(
+    tuple(d + 1 for d in range(SIZE) if mask & (1 << d)) for mask in range(1 << SIZE)
+)
+# packed mask byte -> b"1" where bit b of it is set, b"0" elsewhere, one table per bit
+_BIT_FLAGS = tuple(bytes(b"01"[byte >> bit & 1] for byte in range(256)) for bit in range(8))
+
+
+def digit_bit(digit: int) -> int:
+    return 1 << (digit - 1)
+
+
+def mask_digits(mask: int) -> tuple:
+    """Digits set in a candidate mask of any grid size."""
+    if mask <= ALL_DIGITS:
+        return MASK_DIGITS[mask]
+    return tuple(d + 1 for d in range(mask.bit_length()) if mask >> d & 1)
+
+
+def bitmap_cells(bits: int) -> list:
+    """Cell indices set in a bitmap over the cells, in increasing order."""
+    cells = []
+    while bits:
+        low = bits & -bits
+        cells.append(low.bit_length() - 1)
+        bits ^= low
+    return cells
+
+
+def cell_index(x: int, y: int) -> int:
+    """Converts the widget's (column, row) coordinates into a flat cell index."""
+    return y * SIZE + x
+
+
+def box_of(idx: int) -> int:
+    return (idx // SIZE // BOX) * BOX + (idx % SIZE) // BOX
+
+
+def box_shape(size: int) -> tuple:
+    """
+    Returns (height, width) of the boxes of a size x size grid, as square as
+    possible. Sizes without such a split (primes) need explicit regions.
+    """
+    height = max(d for d in range(1, isqrt(size) + 1) if size % d == 0)
+    if height == 1:
+        raise ValueError(f"a {size}x{size} grid has no box layout, its regions must be given")
+    return height, size // height
+
+
+class Geometry:
+    """
+    Layout of a size x size grid: its rows, columns, regions and killer cages.
+
+    Regions default to the boxes of box_shape(size); irregular (jigsaw)
+    layouts pass their own as size groups of size cell indices. cages are
+    Cage objects, or (cells, total) pairs, of cells that must hold different
+    digits. Units are numbered rows first, then columns, then regions, then
+    cages, so cell_units[idx] starts with (row, size + column, 2 * size +
+    region) for every layout and ends with the cage unit of caged cells.
+    unit_bits and peer_bits hold the same cells as bitmaps over the cell
+    indices, for the digit index of a Board.
+    """
+
+    __slots__ = (
+        "size", "num_cells", "all_digits", "typecode", "regions", "cages", "unit_cells", "cell_units", "peers",
+        "unit_bits", "peer_bits",
+    )
+
+    def __init__(self, size: int, regions=None, cages=()) -> None:
+        if not MIN_SIZE <= size <= MAX_SIZE:
+            raise ValueError(f"grid size must be between {MIN_SIZE} and {MAX_SIZE}, got {size}")
+        num_cells = size * size
+        if regions is None:
+            height, width = box_shape(size)
+            regions = [
+                [(top + r) * size + left + c for r in range(height) for c in range(width)]
+                for top in range(0, size, height)
+                for left in range(0, size, width)
+            ]
+        regions = tuple(sorted(tuple(sorted(region)) for region in regions))
+        if len(regions) != size or any(len(region) != size for region in regions):
+            raise ValueError(f"expected {size} regions of {size} cells")
+        if sorted(idx for region in regions for idx in region) != list(range(num_cells)):
+            raise ValueError("regions must cover every cell exactly once")
+        cages = tuple(sorted(
+            (cage if isinstance(cage, Cage) else Cage(*cage) for cage in cages), key=lambda cage: cage.cells
+        ))
+        caged = [idx for cage in cages for idx in cage.cells]
+        if len(set(caged)) != len(caged) or any(not 0 <= idx < num_cells for idx in caged):
+            raise ValueError("cages must not overlap and must lie inside the grid")
+        for cage in cages:
+            if not 0 < len(cage.cells) <= size:
+                raise ValueError(f"a cage must have 1 to {size} cells, got {len(cage.cells)}")
+            if cage.total is not None:
+                low, high = total_range(len(cage.cells), size)
+                if not low <= cage.total <= high:
+                    raise ValueError(f"a {len(cage.cells)} cell cage cannot add up to {cage.total}")
+
+        self.size = size
+        self.num_cells = num_cells
+        self.all_digits = (1 << size) - 1
+        # candidate masks need size bits, "I" is at least 32 bits wide
+        self.typecode = "H" if size <= 16 else "I"
+        self.regions = regions
+        self.cages = cages
+        rows = tuple(tuple(r * size + c for c in range(size)) for r in range(size))
+        cols = tuple(tuple(r * size + c for r in range(size)) for c in range(size))
+        self.unit_cells = rows + cols + regions + tuple(cage.cells for cage in cages)
+        region_of = [0] * num_cells
+        for region, cells in enumerate(regions):
+            for idx in cells:
+                region_of[idx] = region
+        cage_units = [()] * num_cells
+        for cage, cage_cells in enumerate(cages):
+            for idx in cage_cells.cells:
+                cage_units[idx] = (3 * size + cage,)
+        self.cell_units = tuple(
+            (idx // size, size + idx % size, 2 * size + region_of[idx]) + cage_units[idx] for idx in range(num_cells)
+        )
+        self.peers = tuple(
+            tuple(sorted(set().union(*(self.unit_cells[unit] for unit in self.cell_units[idx])) - {idx}))
+            for idx in range(num_cells)
+        )
+        self.unit_bits = tuple(sum(1 << idx for idx in cells) for cells in self.unit_cells)
+        self.peer_bits = tuple(sum(1 << peer for peer in peers) for peers in self.peers)
+
+    def region_of(self, idx: int) -> int:
+        return self.cell_units[idx][2] - 2 * self.size
+
+    def cage_of(self, idx: int):
+        """The Cage holding the cell, None if it is in none."""
+        units = self.cell_units[idx]
+        return self.cages[units[3] - 3 * self.size] if len(units) > 3 else None
+
+    def without_cages(self) -> "Geometry":
+        """The same grid without its cages, shared with square_geometry when the regions are regular boxes."""
+        if not self.cages:
+            return self
+        geometry = Geometry(self.size, self.regions)
+        return square_geometry(self.size) if geometry.is_square() else geometry
+
+    def is_square(self) -> bool:
+        """True for regular box regions, whatever the cages."""
+        try:
+            return self.regions == square_geometry(self.size).regions
+        except ValueError:
+            return False
+
+    def __eq__(self, other) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, Geometry):
+            return NotImplemented
+        return self.size == other.size and self.regions == other.regions and self.cages == other.cages
+
+    def __hash__(self) -> int:
+        return hash((self.size, self.regions, self.cages))
+
+    def __repr__(self) -> str:
+        kinds = []
+        if not self.is_square():
+            kinds.append("jigsaw")
+        if self.cages:
+            kinds.append(f"{len(self.cages)} cages")
+        return f"Geometry({', '.join([str(self.size)] + kinds)})"
+
+
+@lru_cache(maxsize=None)
+def square_geometry(size: int) -> Geometry:
+    """The shared Geometry of a size x size grid with regular boxes."""
+    return Geometry(size)
+
+
+STANDARD = square_geometry(SIZE)
+
+# tables of the standard 9x9 layout, used by the solvers
+ROW_CELLS = STANDARD.unit_cells[:SIZE]
+COL_CELLS = STANDARD.unit_cells[SIZE:2 * SIZE]
+BOX_CELLS = STANDARD.unit_cells[2 * SIZE:]
+# the row, column and box unit ids of each cell, as indices into UNIT_CELLS
+UNIT_CELLS = STANDARD.unit_cells
+CELL_UNITS = STANDARD.cell_units
+PEERS = STANDARD.peers
+
+
+class Board:
+    """
+    Compact sudoku board.
+
+    values holds the placed digit of each cell (0 when empty), candidates holds
+    a centermark mask per cell (bit 0 is digit 1), and given / conflicts are
+    bitmaps over the cell indices. geometry is the grid layout, the standard
+    9x9 one unless another is passed.
+
+    Conflicts are tracked incrementally: counts holds how often each digit is
+    placed in each row, column and region, and unit_masks the digits present
+    in each unit, so every edit only touches the three units of the edited
+    cell.
+
+    The digit index is kept in step with every edit as well: digit_cells[d - 1]
+    is a bitmap of the cells holding digit d and candidate_cells[d - 1] one of
+    the cells with d as a centermark. Masking one with a unit's bitmap answers
+    where a digit is or can go in that unit without visiting its cells.
+    """
+
+    __slots__ = (
+        "geometry", "values", "candidates", "given", "conflicts", "counts", "unit_masks",
+        "digit_cells", "candidate_cells",
+    )
+
+    def __init__(self, geometry: Geometry = STANDARD) -> None:
+        self.geometry = geometry
+        self.values = bytearray(geometry.num_cells)
+        self.candidates = array(geometry.typecode, [0]) * geometry.num_cells
+        self.given = 0
+        self.conflicts = 0
+        self.counts = bytearray(len(geometry.unit_cells) * geometry.size)
+        self.unit_masks = array(geometry.typecode, [0]) * len(geometry.unit_cells)
+        self.digit_cells = [0] * geometry.size
+        self.candidate_cells = [0] * geometry.size
+
+    @classmethod
+    def from_cells(cls, values, candidates, given: int = 0, geometry: Geometry = STANDARD) -> "Board":
+        """Builds a board from its values, candidate masks and a given bitmap in one go."""
+        board = cls(geometry)
+        board.values[:] = bytes(values)
+        board.candidates[:] = array(geometry.typecode, candidates)
+        board.given = given
+        board.check_conflicts()
+        board.index_candidates()
+        return board
+
+    def copy(self) -> "Board":
+        board = Board.__new__(Board)
+        board.geometry = self.geometry
+        board.values = bytearray(self.values)
+        board.candidates = array(self.candidates.typecode, self.candidates)
+        board.given = self.given
+        board.conflicts = self.conflicts
+        board.counts = bytearray(self.counts)
+        board.unit_masks = array(self.unit_masks.typecode, self.unit_masks)
+        board.digit_cells = self.digit_cells[:]
+        board.candidate_cells = self.candidate_cells[:]
+        return board
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Board):
+            return NotImplemented
+        return (
+            self.values == other.values
+            and self.candidates == other.candidates
+            and self.given == other.given
+            and self.geometry == other.geometry
+        )
+
+    def is_given(self, idx: int) -> bool:
+        return bool(self.given >> idx & 1)
+
+    def is_conflict(self, idx: int) -> bool:
+        return bool(self.conflicts >> idx & 1)
+
+    def is_empty(self, idx: int) -> bool:
+        return not self.values[idx] and not self.candidates[idx]
+
+    def set_value(self, idx: int, digit: int, given: bool = False) -> None:
+        """Places a digit in the cell, replacing any centermarks."""
+        if self.values[idx] != digit:
+            self._remove_value(idx)
+            self.values[idx] = digit
+            if digit:
+                self._add_value(idx)
+        self._mark(idx, 0)
+        if given:
+            self.given |= 1 << idx
+        else:
+            self.given &= ~(1 << idx)
+
+    def set_candidates(self, idx: int, mask: int) -> None:
+        """Replaces the cell's contents with the given centermark mask."""
+        self._remove_value(idx)
+        self.values[idx] = 0
+        self._mark(idx, mask)
+        self.given &= ~(1 << idx)
+
+    def toggle_candidate(self, idx: int, digit: int) -> None:
+        self.set_candidates(idx, self.candidates[idx] ^ digit_bit(digit))
+
+    def clear_cell(self, idx: int) -> None:
+        self.set_candidates(idx, 0)
+
+    def cell_state(self, idx: int) -> tuple:
+        """Returns (value, candidates, given) for the cell, e.g. for the clipboard."""
+        return (self.values[idx], self.candidates[idx], self.is_given(idx))
+
+    def set_cell_state(self, idx: int, state: tuple) -> None:
+        value, candidates, given = state
+        if value:
+            self.set_value(idx, value, given)
+        else:
+            self.set_candidates(idx, candidates)
+
+    def _mark(self, idx: int, mask: int) -> None:
+        """Sets the cell's centermark mask and moves the cell between the candidate bitmaps of the changed digits."""
+        candidates = self.candidates
+        changed = candidates[idx] ^ mask
+        if changed:
+            candidates[idx] = mask
+            cell = 1 << idx
+            candidate_cells = self.candidate_cells
+            for digit in mask_digits(changed):
+                candidate_cells[digit - 1] ^= cell
+
+    def _add_value(self, idx: int) -> None:
+        digit = self.values[idx]
+        self.digit_cells[digit - 1] |= 1 << idx
+        bit = 1 << (digit - 1)
+        counts = self.counts
+        size = self.geometry.size
+        for unit in self.geometry.cell_units[idx]:
+            slot = unit * size + digit - 1
+            counts[slot] += 1
+            if counts[slot] == 1:
+                self.unit_masks[unit] |= bit
+            elif counts[slot] == 2:
+                self._refresh_conflicts(unit, digit)
+        if self._in_conflict(idx):
+            self.conflicts |= 1 << idx
+
+    def _remove_value(self, idx: int) -> None:
+        digit = self.values[idx]
+        if not digit:
+            return
+        self.values[idx] = 0
+        self.conflicts &= ~(1 << idx)
+        self.digit_cells[digit - 1] &= ~(1 << idx)
+        counts = self.counts
+        size = self.geometry.size
+        for unit in self.geometry.cell_units[idx]:
+            slot = unit * size + digit - 1
+            counts[slot] -= 1
+            if counts[slot] == 0:
+                self.unit_masks[unit] &= ~(1 << (digit - 1))
+            elif counts[slot] == 1:
+                self._refresh_conflicts(unit, digit)
+
+    def _in_conflict(self, idx: int) -> bool:
+        slot = self.values[idx] - 1
+        counts = self.counts
+        size = self.geometry.size
+        for unit in self.geometry.cell_units[idx]:
+            if counts[unit * size + slot] > 1:
+                return True
+        return False
+
+    def _refresh_conflicts(self, unit: int, digit: int) -> None:
+        """Re-evaluates the conflict flag of every cell in the unit holding digit."""
+        values = self.values
+        for idx in self.geometry.unit_cells[unit]:
+            if values[idx] == digit:
+                if self._in_conflict(idx):
+                    self.conflicts |= 1 << idx
+                else:
+                    self.conflicts &= ~(1 << idx)
+
+    def seen_mask(self, idx: int) -> int:
+        """Mask of the digits placed in the cell's row, column, region and cage."""
+        masks = self.unit_masks
+        seen = 0
+        for unit in self.geometry.cell_units[idx]:
+            seen |= masks[unit]
+        return seen
+
+    def placements(self, digit: int, unit=None) -> int:
+        """Bitmap of the cells holding digit, only those of the unit when one is given."""
+        cells = self.digit_cells[digit - 1]
+        return cells if unit is None else cells & self.geometry.unit_bits[unit]
+
+    def positions(self, digit: int, unit=None) -> int:
+        """Bitmap of the cells with digit as a centermark, only those of the unit when one is given."""
+        cells = self.candidate_cells[digit - 1]
+        return cells if unit is None else cells & self.geometry.unit_bits[unit]
+
+    def bivalue_cells(self) -> int:
+        """Bitmap of the cells with exactly two centermarks."""
+        once = twice = more = 0
+        for cells in self.candidate_cells:
+            more |= twice & cells
+            twice |= once & cells
+            once |= cells
+        return twice & ~more
+
+    def check_conflicts(self) -> None:
+        """
+        Rebuilds the digit counts, the conflict bitmap and the placed digits'
+        index from scratch. The centermark index is kept up to date by every
+        edit; see index_candidates for boards whose masks were assigned in bulk.
+        """
+        geometry = self.geometry
+        size = geometry.size
+        cell_units = geometry.cell_units
+        counts = bytearray(len(geometry.unit_cells) * size)
+        unit_masks = array(geometry.typecode, [0]) * len(geometry.unit_cells)
+        digit_cells = [0] * size
+        placed = [(idx, digit) for idx, digit in enumerate(self.values) if digit]
+        # count every unit's digits first, then a cell conflicts if one of its units counts its digit twice
+        for idx, digit in placed:
+            digit_cells[digit - 1] |= 1 << idx
+            for unit in cell_units[idx]:
+                counts[unit * size + digit - 1] += 1
+        conflicts = 0
+        for idx, digit in placed:
+            bit = 1 << (digit - 1)
+            for unit in cell_units[idx]:
+                unit_masks[unit] |= bit
+                if counts[unit * size + digit - 1] > 1:
+                    conflicts |= 1 << idx
+        self.counts = counts
+        self.unit_masks = unit_masks
+        self.conflicts = conflicts
+        self.digit_cells = digit_cells
+
+    def index_candidates(self) -> None:
+        """Rebuilds candidate_cells after the centermark masks were assigned directly."""
+        candidates = self.candidates
+        size = self.geometry.size
+        if not any(candidates):
+            self.candidate_cells = [0] * size
+            return
+        # one plane per byte of the masks, each digit a bit of one plane
+        data = candidates.tobytes()
+        width = candidates.itemsize
+        candidate_cells = []
+        for digit in range(size):
+            byte = digit >> 3 if sys.byteorder == "little" else width - 1 - (digit >> 3)
+            plane = data[byte::width]
+            candidate_cells.append(int(plane[::-1].translate(_BIT_FLAGS[digit & 7]), 2))
+        self.candidate_cells = candidate_cells
+
+    def fill_candidates(self) -> None:
+        """Puts every digit as a centermark in every cell without a placed digit."""
+        all_digits = self.geometry.all_digits
+        for idx in range(self.geometry.num_cells):
+            if not self.values[idx]:
+                self.candidates[idx] = all_digits
+        placed = 0
+        for cells in self.digit_cells:
+            placed |= cells
+        empty = (1 << self.geometry.num_cells) - 1 & ~placed
+        self.candidate_cells = [empty] * self.geometry.size
+
+    def clear_seen_candidates(self) -> None:
+        """Removes centermarks that are already placed in the cell's row, column or region."""
+        for idx in range(self.geometry.num_cells):
+            if self.candidates[idx]:
+                self.candidates[idx] &= ~self.seen_mask(idx)
+        # a digit is gone from every cell of the units it is placed in
+        unit_bits = self.geometry.unit_bits
+        seen_cells = [0] * self.geometry.size
+        for unit, mask in enumerate(self.unit_masks):
+            for digit in mask_digits(mask):
+                seen_cells[digit - 1] |= unit_bits[unit]
+        self.candidate_cells = [cells & ~seen for cells, seen in zip(self.candidate_cells, seen_cells)]
+
+    def update_candidates(self, fill: bool) -> None:
+        """
+        With fill every blank cell gets all digits it does not see as
+        centermarks, otherwise the existing centermarks are reduced to them.
+        Killer cages also remove the digits their totals rule out.
+        """
+        if fill:
+            self.fill_candidates()
+        self.clear_seen_candidates()
+        if self.geometry.cages:
+            self.clear_cage_candidates()
+
+    def clear_cage_candidates(self, cages=None) -> None:
+        """
+        Removes centermarks that no combination of the cage's missing digits
+        allows, for every cage with a total (or only those given). Grids over
+        9x9 have no sum tables and are left alone.
+        """
+        geometry = self.geometry
+        if geometry.size > MAX_CAGE_DIGITS:
+            return
+        values = self.values
+        candidates = self.candidates
+        for cage in geometry.cages if cages is None else cages:
+            if cage.total is None:
+                continue
+            placed = placed_sum = 0
+            available = 0
+            free = []
+            for idx in cage.cells:
+                digit = values[idx]
+                if digit:
+                    placed |= 1 << (digit - 1)
+                    placed_sum += digit
+                else:
+                    free.append(idx)
+                    # a cell without centermarks may still hold any digit
+                    available |= candidates[idx] or geometry.all_digits
+            if not free:
+                continue
+            allowed = cage_digits(len(free), cage.total - placed_sum, available & ~placed)
+            for idx in free:
+                if candidates[idx]:
+                    self._mark(idx, candidates[idx] & allowed)
+
+    def auto_clear_cell(self, idx: int) -> None:
+        """
+        Applies the auto clear rule after an edit of a single cell: a placed
+        digit is removed from the centermarks of its peers, centermarks are
+        reduced to the digits not yet seen by the cell and to those its cage
+        total still allows.
+        """
+        digit = self.values[idx]
+        if digit:
+            bit = digit_bit(digit)
+            candidates = self.candidates
+            for peer in self.geometry.peers[idx]:
+                if candidates[peer] & bit:
+                    candidates[peer] &= ~bit
+            self.candidate_cells[digit - 1] &= ~self.geometry.peer_bits[idx]
+        elif self.candidates[idx]:
+            self._mark(idx, self.candidates[idx] & ~self.seen_mask(idx))
+        cage = self.geometry.cage_of(idx)
+        if cage is not None:
+            self.clear_cage_candidates((cage,))
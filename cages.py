@@ -0,0 +1,81 @@
+"""
+Killer cages.
+
+A cage is a group of cells whose digits are all different and, when the cage
+has a total, add up to it. Cages are part of a board's Geometry, which treats
+every cage as one more unit after the rows, columns and regions.
+
+Sum pruning works on 9 bit digit masks (grids up to 9x9). COMBINATIONS lists
+every set of n different digits adding up to a total, and cage_table(n,
+total) precomputes for each of the 512 masks of still available digits the
+union of those combinations that only use available digits, so pruning a
+cage during a search is a single table lookup.
+"""
+
+from array import array
+from functools import lru_cache
+
+# digits the sum tables cover
+MAX_CAGE_DIGITS = 9
+
+
+class Cage:
+    __slots__ = ("cells", "total")
+
+    def __init__(self, cells, total=None) -> None:
+        self.cells = tuple(sorted(cells))
+        self.total = total
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Cage):
+            return NotImplemented
+        return self.cells == other.cells and self.total == other.total
+
+    def __hash__(self) -> int:
+        return hash((self.cells, self.total))
+
+    def __repr__(self) -> str:
+        return f"Cage({self.cells}, {self.total})"
+
+
+def _combinations() -> dict:
+    combinations = {}
+    for mask in range(1, 1 << MAX_CAGE_DIGITS):
+        digits = [d + 1 for d in range(MAX_CAGE_DIGITS) if mask >> d & 1]
+        combinations.setdefault((len(digits), sum(digits)), []).append(mask)
+    return {key: tuple(masks) for key, masks in combinations.items()}
+
+
+# (cells, total) -> masks of the digit sets that fill the cells and add up to total
+COMBINATIONS = _combinations()
+
+
+def total_range(cells: int, size: int = MAX_CAGE_DIGITS) -> tuple:
+    """Smallest and largest total of cells different digits from 1 to size."""
+    return cells * (cells + 1) // 2, cells * (2 * size - cells + 1) // 2
+
+
+@lru_cache(maxsize=None)
+def cage_table(cells: int, total: int) -> array:
+    """
+    Table indexed by a mask of available digits: the digits that can appear in
+    cells free cells adding up to total, 0 if no combination fits.
+    """
+    table = array("H", bytes(2 << MAX_CAGE_DIGITS))
+    for combination in COMBINATIONS.get((cells, total), ()):
+        # every superset of the combination allows its digits
+        free = (1 << MAX_CAGE_DIGITS) - 1 & ~combination
+        subset = free
+        while True:
+            table[combination | subset] |= combination
+            if not subset:
+                break
+            subset = (subset - 1) & free
+    return table
+
+
+def cage_digits(cells: int, total: int, available: int) -> int:
+    """The digits of available that can fill cells free cells adding up to total."""
+    if cells <= 0 or total <= 0:
+        return 0
+    return cage_table(cells, total)[available]
@@ -0,0 +1,109 @@
+"""
+Vectorized candidate computation for many boards at once.
+
+Boards are (N, 81) uint8 arrays of placed digits (0 for blanks), candidate
+masks are (N, 81) uint16 arrays using the same bit layout as Board.candidates.
+numpy is optional: without it the batch functions raise ImportError. It is
+only imported by the first batch call, importing numpy takes longer than
+the rest of the program's startup.
+"""
+
+from importlib.util import find_spec
+
+from board import ALL_DIGITS, CELL_UNITS, MASK_DIGITS, NUM_CELLS, UNIT_CELLS
+
+HAVE_NUMPY = find_spec("numpy") is not None
+
+# numpy and the index tables, set by _require_numpy
+np = None
+
+
+def _require_numpy() -> None:
+    global np, _UNIT_INDEX, _ROW_OF, _COL_OF, _BOX_OF, _DIGIT_BIT, _SINGLE_DIGIT
+    if np is not None:
+        return
+    if not HAVE_NUMPY:
+        raise ImportError("candidate_kernel batch functions require numpy")
+    import numpy
+
+    _UNIT_INDEX = numpy.array(UNIT_CELLS, dtype=numpy.intp)  # (27, 9)
+    _ROW_OF = numpy.array([units[0] for units in CELL_UNITS], dtype=numpy.intp)
+    _COL_OF = numpy.array([units[1] for units in CELL_UNITS], dtype=numpy.intp)
+    _BOX_OF = numpy.array([units[2] for units in CELL_UNITS], dtype=numpy.intp)
+    # digit -> bit, with 0 (blank) mapping to no bits
+    _DIGIT_BIT = numpy.array([0] + [1 << d for d in range(9)], dtype=numpy.uint16)
+    # mask -> digit for single bit masks, 0 otherwise
+    _SINGLE_DIGIT = numpy.array(
+        [digits[0] if len(digits) == 1 else 0 for digits in MASK_DIGITS], dtype=numpy.uint8
+    )
+    np = numpy
+
+
+def _unit_once_twice(bits):
+    """
+    Folds the cell masks of every unit: returns (once, twice), (N, 27) arrays
+    with the bits present at least once and at least twice in each unit.
+    """
+    gathered = bits[:, _UNIT_INDEX]  # (N, 27, 9)
+    once = np.zeros(gathered.shape[:2], dtype=np.uint16)
+    twice = np.zeros_like(once)
+    for k in range(gathered.shape[2]):
+        column = gathered[:, :, k]
+        twice |= once & column
+        once |= column
+    return once, twice
+
+
+def _per_cell(unit_masks):
+    """ORs each cell's row, column and box entries of an (N, 27) unit array."""
+    return unit_masks[:, _ROW_OF] | unit_masks[:, _COL_OF] | unit_masks[:, _BOX_OF]
+
+
+def candidates(boards):
+    """
+    Computes the candidate masks and conflict flags of each board.
+
+    Returns (masks, conflicts): masks is (N, 81) uint16 with the digits not
+    yet seen by each blank cell (0 for filled cells), conflicts is (N, 81)
+    bool marking placed digits that repeat in a row, column or box.
+    """
+    _require_numpy()
+    boards = np.asarray(boards, dtype=np.uint8).reshape(-1, NUM_CELLS)
+    bits = _DIGIT_BIT[boards]
+    once, twice = _unit_once_twice(bits)
+    seen = _per_cell(once)
+    masks = np.where(boards == 0, ALL_DIGITS & ~seen, 0).astype(np.uint16)
+    conflicts = (bits & _per_cell(twice)) != 0
+    return masks, conflicts
+
+
+def apply_singles(boards, max_rounds: int = 81):
+    """
+    Places naked and hidden singles on every board in bulk until no board
+    changes any more.
+
+    Returns (boards, masks, conflicts) for the resulting boards; the input
+    array is not modified. Boards that hit a contradiction simply stop
+    progressing and keep an empty mask on the stuck cell.
+    """
+    _require_numpy()
+    boards = np.array(boards, dtype=np.uint8).reshape(-1, NUM_CELLS)
+    # only boards that changed in the previous round are processed again
+    active = np.arange(len(boards))
+    for _ in range(max_rounds):
+        current = boards[active]
+        masks, _ = candidates(current)
+        # naked singles: blank cells with exactly one candidate
+        placements = _SINGLE_DIGIT[masks]
+        # hidden singles: digits with only one possible cell in a unit
+        once, twice = _unit_once_twice(masks)
+        hidden = masks & _per_cell(once & ~twice)
+        placements = np.where(placements == 0, _SINGLE_DIGIT[hidden], placements)
+        placements[current != 0] = 0
+        changed = placements.any(axis=1)
+        if not changed.any():
+            break
+        boards[active] = np.where(placements != 0, placements, current)
+        active = active[changed]
+    masks, conflicts = candidates(boards)
+    return boards, masks, conflicts
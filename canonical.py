@@ -0,0 +1,278 @@
+"""
+Canonical form of 9x9 puzzles under the sudoku symmetries.
+
+Relabeling the digits, permuting the bands or the stacks, permuting the rows
+inside a band or the columns inside a stack and transposing the grid all map
+a puzzle onto an equivalent one with the same number of solutions and the
+same difficulty. canonicalize() picks one representative of every such
+class of puzzles, so equivalent puzzles share a cache entry.
+
+The representative is the transformed puzzle whose clue pattern (filled
+cells in reading order, empty first) is smallest, ties broken by the smallest
+digit sequence after relabeling the digits in order of first appearance.
+Instead of trying all 3,359,232 grid transformations the pattern is built
+row by row: each step keeps only the row choices giving the smallest row,
+and the column permutations that still give it are kept as an ordered
+partition of the columns, which is refined by every new row. Only the few
+transformations left at the end are relabeled and compared.
+"""
+
+import sys
+import time
+from itertools import permutations, product
+from operator import itemgetter
+
+from board import NUM_CELLS, SIZE, Board
+from solver import parse_givens
+
+# canonicalize gives up (returns None) on puzzles with more equivalent
+# transformations than this, e.g. nearly empty or full grids
+MAX_TRANSFORMS = 2048
+# the three stacks, each a single part holding the bitmask of its three columns
+_INITIAL_COLUMNS = ((0o7,), (0o70,), (0o700,))
+# smallest 3 bit stack pattern with k filled cells, indexed by k
+_STACK_MIN = (0b000, 0b001, 0b011, 0b111)
+_POPCOUNT = tuple(bin(mask).count("1") for mask in range(1 << SIZE))
+# the row pattern of k filled cells after the empty ones, indexed by k
+_ONES = tuple((1 << k) - 1 for k in range(SIZE + 1))
+# "0" for blanks and "1" for digits, the rows are read backwards into bitmasks
+_FILLED = b"0" + b"1" * 255
+# canonical digits as characters
+_ASCII = b"0123456789" + bytes(246)
+# columns of a column bitmask
+_MASK_COLUMNS = tuple(tuple(c for c in range(SIZE) if mask >> c & 1) for mask in range(1 << SIZE))
+
+
+class Transform:
+    """
+    A symmetry mapping a puzzle onto its canonical form: cells[k] is the
+    input cell ending up in canonical cell k and labels maps every input
+    digit to its canonical digit.
+    """
+
+    __slots__ = ("cells", "labels", "_gather", "_scatter", "_to_labels", "_to_digits")
+
+    def __init__(self, cells: tuple, labels: dict) -> None:
+        self.cells = cells
+        self.labels = labels
+        inverse = [0] * NUM_CELLS
+        for position, idx in enumerate(cells):
+            inverse[idx] = position
+        self._gather = itemgetter(*cells)
+        self._scatter = itemgetter(*inverse)
+        # bytes.translate tables, blanks stay 0
+        to_labels = bytearray(256)
+        to_digits = bytearray(256)
+        for digit, label in labels.items():
+            to_labels[digit] = label
+            to_digits[label] = digit
+        self._to_labels = bytes(to_labels)
+        self._to_digits = bytes(to_digits)
+
+    def to_canonical(self, digits) -> bytes:
+        """Maps 81 input digits (0 for blanks), e.g. a solution, onto the canonical grid."""
+        return bytes(self._gather(digits)).translate(self._to_labels)
+
+    def from_canonical(self, digits) -> bytes:
+        """Maps 81 canonical digits back onto the input grid."""
+        return bytes(self._scatter(digits)).translate(self._to_digits)
+
+
+def _row_value(columns: tuple, filled: int) -> int:
+    """The value of the smallest arrangement of a row, see _refine."""
+    popcount = _POPCOUNT
+    ones = _ONES
+    value = 0
+    for group in columns:
+        if len(group) == 1:
+            for part in group[0]:
+                value = value << popcount[part] | ones[popcount[part & filled]]
+            continue
+        patterns = []
+        for stack in group:
+            bits = 0
+            for part in stack:
+                bits = bits << popcount[part] | ones[popcount[part & filled]]
+            patterns.append(bits)
+        patterns.sort()
+        for bits in patterns:
+            value = value << 3 | bits
+    return value
+
+
+def _refine(columns: tuple, filled: int) -> tuple:
+    """
+    Returns (row value, refined columns) for the smallest arrangement of a row
+    whose filled cells are the bitmask filled (bit c for column c).
+
+    columns is a tuple of groups of stacks; the stacks of a group can still be
+    put in any order and every stack is a tuple of parts, bitmasks of columns
+    that can be put in any order. Putting the empty cells of each part first
+    and sorting the stacks of every group by their pattern gives the smallest
+    row; stacks with equal patterns stay interchangeable.
+    """
+    popcount = _POPCOUNT
+    value = 0
+    refined = []
+    for group in columns:
+        keyed = []
+        for stack in group:
+            bits = 0
+            parts = []
+            for part in stack:
+                empty = part & ~filled
+                if empty:
+                    bits <<= popcount[empty]
+                    parts.append(empty)
+                full = part & filled
+                if full:
+                    width = popcount[full]
+                    bits = bits << width | (1 << width) - 1
+                    parts.append(full)
+            keyed.append((bits, tuple(parts)))
+        if len(keyed) == 1:
+            bits, parts = keyed[0]
+            value = value << 3 | bits
+            refined.append((parts,))
+            continue
+        keyed.sort()
+        start = 0
+        for end in range(1, len(keyed) + 1):
+            if end == len(keyed) or keyed[end][0] != keyed[start][0]:
+                refined.append(tuple(parts for _, parts in keyed[start:end]))
+                start = end
+        for bits, _ in keyed:
+            value = value << 3 | bits
+    return value, tuple(refined)
+
+
+def _column_orders(columns: tuple):
+    """Yields every column order allowed by a refined column structure."""
+    choices = []
+    for group in columns:
+        orders = []
+        for stacks in permutations(group):
+            for parts in product(*(permutations(_MASK_COLUMNS[part]) for stack in stacks for part in stack)):
+                orders.append(sum(parts, ()))
+        choices.append(orders)
+    for parts in product(*choices):
+        yield sum(parts, ())
+
+
+def _count_orders(columns: tuple) -> int:
+    count = 1
+    for group in columns:
+        for factor in range(2, len(group) + 1):
+            count *= factor
+        for stack in group:
+            for part in stack:
+                for factor in range(2, _POPCOUNT[part] + 1):
+                    count *= factor
+    return count
+
+
+def canonicalize(givens):
+    """
+    Returns (canonical puzzle as an 81 character string, Transform from the
+    input), or None when the puzzle has too many equivalent transformations
+    to be worth it or has killer cages, which the symmetries would have to
+    move too. See solver.parse_givens for the accepted inputs.
+    """
+    if isinstance(givens, Board) and givens.geometry.cages:
+        return None
+    digits = parse_givens(givens)
+    grids = (
+        tuple(tuple(digits[r * SIZE:(r + 1) * SIZE]) for r in range(SIZE)),
+        tuple(tuple(digits[c::SIZE]) for c in range(SIZE)),
+    )
+    # filled cells of every row of both grids as column bitmasks
+    filled = bytes(digits).translate(_FILLED)
+    masks = (
+        tuple(int(filled[r * SIZE:(r + 1) * SIZE][::-1], 2) for r in range(SIZE)),
+        tuple(int(filled[c::SIZE][::-1], 2) for c in range(SIZE)),
+    )
+
+    # first row: its value only depends on the filled cells per stack
+    best = None
+    states = []
+    for transposed, grid in enumerate(grids):
+        for r, mask in enumerate(masks[transposed]):
+            value = 0
+            for pattern in sorted(_STACK_MIN[_POPCOUNT[mask >> shift & 0o7]] for shift in (0, 3, 6)):
+                value = value << 3 | pattern
+            if best is None or value < best:
+                best = value
+                states = [(transposed, (r,))]
+            elif value == best:
+                states.append((transposed, (r,)))
+    states = [
+        (transposed, rows, _refine((_INITIAL_COLUMNS,), masks[transposed][rows[0]])[1])
+        for transposed, rows in states
+    ]
+
+    for position in range(1, SIZE):
+        best = None
+        survivors = []
+        for transposed, rows, columns in states:
+            row_masks = masks[transposed]
+            if position % 3:
+                band = rows[-1] // 3 * 3
+                candidates = [r for r in range(band, band + 3) if r not in rows]
+            else:
+                used = {r // 3 for r in rows}
+                candidates = [r for r in range(SIZE) if r // 3 not in used]
+            for r in candidates:
+                value = _row_value(columns, row_masks[r])
+                if best is None or value < best:
+                    best = value
+                    survivors = [(transposed, rows + (r,), columns)]
+                elif value == best:
+                    survivors.append((transposed, rows + (r,), columns))
+        if len(survivors) > MAX_TRANSFORMS:
+            return None
+        # only the winning rows refine their column structures
+        states = [
+            (transposed, rows, _refine(columns, masks[transposed][rows[-1]])[1])
+            for transposed, rows, columns in survivors
+        ]
+
+    if sum(_count_orders(columns) for _, _, columns in states) > MAX_TRANSFORMS:
+        return None
+    best = None
+    for transposed, rows, columns in states:
+        grid = grids[transposed]
+        for cols in _column_orders(columns):
+            pick = itemgetter(*cols)
+            clues = [digit for r in rows for digit in pick(grid[r]) if digit]
+            # dicts keep insertion order, so this numbers the digits by first appearance
+            labels = {digit: label for label, digit in enumerate(dict.fromkeys(clues), 1)}
+            sequence = bytes(map(labels.__getitem__, clues))
+            if best is None or sequence < best[0]:
+                best = (sequence, transposed, rows, cols, labels)
+
+    _, transposed, rows, cols, labels = best
+    if transposed:
+        cells = tuple(c * SIZE + r for r in rows for c in cols)
+    else:
+        cells = tuple(r * SIZE + c for r in rows for c in cols)
+    # digits missing from the puzzle take the remaining labels in order
+    for digit in range(1, SIZE + 1):
+        if digit not in labels:
+            labels[digit] = len(labels) + 1
+    transform = Transform(cells, labels)
+    return transform.to_canonical(digits).translate(_ASCII).decode(), transform
+
+
+def benchmark(puzzles: list) -> float:
+    """Returns the average seconds per canonicalize call over the puzzles."""
+    start = time.perf_counter()
+    for puzzle in puzzles:
+        canonicalize(puzzle)
+    return (time.perf_counter() - start) / len(puzzles)
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "benchmarks/puzzles.txt"
+    with open(path) as stream:
+        corpus = [line.strip() for line in stream if line.strip()]
+    print(f"{benchmark(corpus) * 1e6:.1f} us per puzzle")
@@ -0,0 +1,404 @@
+"""
+Packed binary puzzle corpus.
+
+A corpus file stores puzzles of one grid size as fixed size records after a
+32 byte header:
+
+    magic "SUDC", version, grid size, planes, record size (uint32),
+    puzzle count (uint64), reserved
+
+Every record starts with the givens plane, one 4 bit digit per cell (two
+cells per byte, the first in the low nibble, 0 for a blank), so a 9x9
+puzzle takes 41 bytes where its text line takes 82. The planes flags add:
+
+    CANDIDATES  a size bit mask per cell, packed little-endian; a single
+                digit mask on a cell without a given is a placed digit,
+                the convention of the 162 character format
+    SOLUTIONS   the solution as one more 4 bit plane, all blanks if unknown
+
+All records of a file have the same layout, so the offset index is
+implicit: record n starts at HEADER_SIZE + n * record size, and reading a
+puzzle by number is one slice of the memory mapped file. Grid sizes up to
+15x15 fit the 4 bit planes.
+"""
+
+import mmap
+import os
+import struct
+import sys
+import time
+
+from board import MIN_SIZE, Board, square_geometry
+from codec import decode_bytes, decode_values, encode_bytes, encode_values
+
+MAGIC = b"SUDC"
+VERSION = 1
+EXTENSION = ".sudc"
+# planes
+CANDIDATES = 1
+SOLUTIONS = 2
+# 4 bit digits
+MAX_CORPUS_SIZE = 15
+
+# magic, version, grid size, planes, record size, puzzle count
+_HEADER = struct.Struct("<4sBBBxIQ12x")
+HEADER_SIZE = _HEADER.size
+# puzzles written between two rewrites of the header's count
+HEADER_INTERVAL = 4096
+
+# packed byte -> its low and its high digit
+_LOW = bytes(byte & 15 for byte in range(256))
+_HIGH = bytes(byte >> 4 for byte in range(256))
+_PLACED_FLAG = b"0" + b"1" * 255
+
+
+def nibble_size(num_cells: int) -> int:
+    return (num_cells + 1) // 2
+
+
+def record_size(size: int, planes: int) -> int:
+    """Bytes per puzzle of a corpus of size x size grids with the given planes."""
+    num_cells = size * size
+    length = nibble_size(num_cells)
+    if planes & CANDIDATES:
+        length += (num_cells * size + 7) // 8
+    if planes & SOLUTIONS:
+        length += nibble_size(num_cells)
+    return length
+
+
+def pack_digits(values: bytes) -> bytes:
+    """Packs one digit from 0 to 15 per cell into half a byte each."""
+    length = nibble_size(len(values))
+    # no byte of either half is over 15, so adding the shifted high digits never carries
+    low = int.from_bytes(values[0::2], "little")
+    high = int.from_bytes(values[1::2], "little")
+    return (low + (high << 4)).to_bytes(length, "little")
+
+
+def unpack_digits(packed: bytes, num_cells: int) -> bytes:
+    values = bytearray(2 * len(packed))
+    values[0::2] = packed.translate(_LOW)
+    values[1::2] = packed.translate(_HIGH)
+    del values[num_cells:]
+    return bytes(values)
+
+
+def pack_masks(masks, size: int) -> bytes:
+    value = 0
+    for mask in reversed(masks):
+        value = value << size | mask
+    return value.to_bytes((len(masks) * size + 7) // 8, "little")
+
+
+def unpack_masks(packed: bytes, size: int, num_cells: int) -> list:
+    value = int.from_bytes(packed, "little")
+    all_digits = (1 << size) - 1
+    return [value >> (size * idx) & all_digits for idx in range(num_cells)]
+
+
+def board_planes(board: Board, candidates: bool) -> tuple:
+    """
+    (givens, masks) of a board: its given digits, and with candidates its
+    centermarks and its other placed digits as single digit masks, else None.
+    """
+    given = board.given
+    givens = bytes(value if given >> idx & 1 else 0 for idx, value in enumerate(board.values))
+    if not candidates:
+        return givens, None
+    masks = [
+        0 if given >> idx & 1 else (1 << (value - 1) if value else mask)
+        for idx, (value, mask) in enumerate(zip(board.values, board.candidates))
+    ]
+    return givens, masks
+
+
+def read_header(data) -> tuple:
+    """Returns (grid size, planes, record size, count) of a corpus's first bytes; raises ValueError."""
+    if len(data) < HEADER_SIZE:
+        raise ValueError("not a puzzle corpus, the file is too short")
+    magic, version, size, planes, length, count = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a puzzle corpus")
+    if version != VERSION:
+        raise ValueError(f"unsupported corpus version {version}")
+    if not MIN_SIZE <= size <= MAX_CORPUS_SIZE or length != record_size(size, planes):
+        raise ValueError("corrupt corpus header")
+    return size, planes, length, count
+
+
+def is_corpus(path: str) -> bool:
+    with open(path, "rb") as stream:
+        return stream.read(len(MAGIC)) == MAGIC
+
+
+class Corpus:
+    """
+    The puzzles of the corpus file at path, read through a memory map. len()
+    is the number of puzzles and corpus[row] returns a puzzle as a text line,
+    like a PuzzleFile; record(row) is the raw record, givens(row) and
+    solution(row) its digits and board(row) the decoded Board.
+    """
+
+    __slots__ = ("path", "stream", "data", "size", "planes", "stride", "count")
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.stream = open(path, "rb")
+        try:
+            size, planes, stride, count = read_header(self.stream.read(HEADER_SIZE))
+            file_size = self.stream.seek(0, 2)
+            if file_size < HEADER_SIZE + count * stride:
+                raise ValueError(f"corpus of {count} puzzles is truncated")
+            self.data = mmap.mmap(self.stream.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            self.stream.close()
+            raise
+        self.size = size
+        self.planes = planes
+        self.stride = stride
+        self.count = count
+
+    def __enter__(self) -> "Corpus":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.data.close()
+        self.stream.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def record(self, row: int) -> bytes:
+        if not 0 <= row < self.count:
+            raise IndexError(f"puzzle {row} out of range")
+        start = HEADER_SIZE + row * self.stride
+        return self.data[start:start + self.stride]
+
+    def givens(self, row: int) -> bytes:
+        """The given digit of every cell, 0 for blanks."""
+        if not 0 <= row < self.count:
+            raise IndexError(f"puzzle {row} out of range")
+        num_cells = self.size * self.size
+        # the givens plane leads the record, only it is sliced from the map
+        start = HEADER_SIZE + row * self.stride
+        return unpack_digits(self.data[start:start + nibble_size(num_cells)], num_cells)
+
+    def solution(self, row: int):
+        """The solution's digit of every cell, None if the corpus holds none for the puzzle."""
+        if not self.planes & SOLUTIONS:
+            return None
+        num_cells = self.size * self.size
+        packed = self.record(row)[-nibble_size(num_cells):]
+        return unpack_digits(packed, num_cells) if any(packed) else None
+
+    def board(self, row: int) -> Board:
+        size = self.size
+        num_cells = size * size
+        record = self.record(row)
+        values = bytearray(unpack_digits(record[:nibble_size(num_cells)], num_cells))
+        given = int(values[::-1].translate(_PLACED_FLAG), 2)
+        masks = [0] * num_cells
+        if self.planes & CANDIDATES:
+            start = nibble_size(num_cells)
+            masks = unpack_masks(record[start:start + (num_cells * size + 7) // 8], size, num_cells)
+            for idx, mask in enumerate(masks):
+                if mask and not mask & (mask - 1) and not values[idx]:
+                    values[idx] = mask.bit_length()
+                    masks[idx] = 0
+        return Board.from_cells(values, masks, given, square_geometry(size))
+
+    def __getitem__(self, row: int) -> bytes:
+        """The puzzle as a text line: 162 characters for 9x9 boards with candidates, else one symbol per cell."""
+        if self.planes & CANDIDATES and self.size == 9:
+            return encode_bytes(self.board(row))
+        return encode_values(self.givens(row))
+
+
+def open_puzzles(path: str):
+    """A Corpus for corpus files, a PuzzleFile of text lines for anything else."""
+    if is_corpus(path):
+        return Corpus(path)
+    from puzzle_file import PuzzleFile
+
+    return PuzzleFile(path)
+
+
+class CorpusWriter:
+    """
+    Writes puzzles to the corpus at path, a new one of size x size grids with
+    the given planes unless append is set and the file exists, in which case
+    the puzzles are added to it in its own layout.
+
+    The count in the header is rewritten every HEADER_INTERVAL puzzles and
+    by close(). Reopening a file truncates it to the count in its header, so
+    a writer that is not closed, e.g. after a crash, loses at most the
+    puzzles written since the last rewrite.
+    """
+
+    __slots__ = ("path", "stream", "size", "planes", "count")
+
+    def __init__(self, path: str, size: int = 9, planes: int = 0, append: bool = False) -> None:
+        self.path = path
+        if append and os.path.exists(path):
+            self.stream = open(path, "r+b")
+            try:
+                size, planes, stride, count = read_header(self.stream.read(HEADER_SIZE))
+            except BaseException:
+                self.stream.close()
+                raise
+            # a torn record from an interrupted write is dropped
+            self.stream.seek(HEADER_SIZE + count * stride)
+            self.stream.truncate()
+        else:
+            if not MIN_SIZE <= size <= MAX_CORPUS_SIZE:
+                raise ValueError(f"a corpus holds grids from {MIN_SIZE}x{MIN_SIZE} to 15x15, not {size}x{size}")
+            count = 0
+            self.stream = open(path, "wb")
+        self.size = size
+        self.planes = planes
+        self.count = count
+        self._write_header()
+        self.stream.seek(0, 2)
+
+    def __enter__(self) -> "CorpusWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _write_header(self) -> None:
+        self.stream.seek(0)
+        self.stream.write(
+            _HEADER.pack(MAGIC, VERSION, self.size, self.planes, record_size(self.size, self.planes), self.count)
+        )
+
+    def write_values(self, givens: bytes, masks=None, solution=None) -> None:
+        """
+        Appends a puzzle from the given digit of every cell and, for the
+        planes of the corpus, the candidate mask and solution digit of every cell.
+        """
+        parts = [pack_digits(givens)]
+        if self.planes & CANDIDATES:
+            parts.append(pack_masks(masks or [0] * len(givens), self.size))
+        if self.planes & SOLUTIONS:
+            parts.append(pack_digits(solution or bytes(len(givens))))
+        self.stream.write(b"".join(parts))
+        self.count += 1
+        if not self.count % HEADER_INTERVAL:
+            # seeking flushes the records before the header counting them
+            self._write_header()
+            self.stream.seek(0, 2)
+
+    def write(self, board: Board, solution=None) -> None:
+        """Appends the board, whose placed digits that are not givens go to the candidates plane."""
+        if board.geometry != square_geometry(self.size):
+            raise ValueError(f"the corpus holds {self.size}x{self.size} grids with regular boxes only")
+        givens, masks = board_planes(board, self.planes & CANDIDATES)
+        self.write_values(givens, masks, solution)
+
+    def close(self) -> None:
+        if self.stream.closed:
+            return
+        self._write_header()
+        self.stream.close()
+
+
+def pack_lines(lines, writer: CorpusWriter, solutions=None) -> tuple:
+    """
+    Writes the puzzle of every non blank text line to writer. solutions, if
+    given, is an iterator of one line per non blank input line as written by
+    batch solving: the solution, or anything else for none. Returns
+    (written, invalid lines).
+    """
+    size = writer.size
+    num_cells = size * size
+    candidates = writer.planes & CANDIDATES
+    written = invalid = 0
+    for line in lines:
+        line = line.strip()
+        if not line:
+            # batch solving skips blank lines too, so they have no solution line
+            continue
+        solution = next(solutions, b"").strip() if solutions is not None else b""
+        try:
+            if len(line) == num_cells and not candidates:
+                # no board is built for plain givens
+                givens = decode_values(line, size)
+                masks = None
+            else:
+                board = decode_bytes(line)
+                if board.geometry.size != size:
+                    raise ValueError(f"a {board.geometry.size}x{board.geometry.size} board")
+                givens, masks = board_planes(board, candidates)
+        except ValueError:
+            invalid += 1
+            continue
+        try:
+            solution = decode_values(solution, size) if solution else None
+        except ValueError:
+            solution = None
+        writer.write_values(givens, masks, solution)
+        written += 1
+    return written, invalid
+
+
+def unpack_lines(corpus: Corpus, sink, solutions: bool = False) -> None:
+    """Writes every puzzle of the corpus to the binary sink as a text line, or its solution if solutions is set."""
+    for row in range(len(corpus)):
+        if solutions:
+            solution = corpus.solution(row)
+            sink.write(encode_values(solution) if solution is not None else b"no solution")
+        else:
+            sink.write(corpus[row])
+        sink.write(b"\n")
+
+
+def benchmark(path: str, count: int = 1_000_000) -> dict:
+    """Packs count copies of the sample puzzles and times packing and random access."""
+    import random
+
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "puzzles.txt"), "rb") as stream:
+        samples = [line for line in stream.read().split(b"\n") if line.strip()]
+    start = time.perf_counter()
+    with CorpusWriter(path) as writer:
+        pack_lines((samples[row % len(samples)] for row in range(count)), writer)
+    pack_time = time.perf_counter() - start
+
+    rng = random.Random(0)
+    rows = [rng.randrange(count) for _ in range(100_000)]
+    with Corpus(path) as corpus:
+        start = time.perf_counter()
+        for row in rows:
+            corpus.record(row)
+        record_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for row in rows:
+            corpus.givens(row)
+        givens_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for row in rows[:10_000]:
+            corpus.board(row)
+        board_time = time.perf_counter() - start
+    return {
+        "bytes": os.path.getsize(path),
+        "pack": pack_time / count,
+        "record": record_time / len(rows),
+        "givens": givens_time / len(rows),
+        "board": board_time / 10_000,
+    }
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as directory:
+        result = benchmark(os.path.join(directory, "puzzles" + EXTENSION), count)
+    print(f"{count} puzzles: {result['bytes'] / 1e6:.1f} MB ({result['bytes'] / count:.1f} bytes each), "
+          f"packed at {result['pack'] * 1e6:.2f} us each")
+    print(f"random access: record {result['record'] * 1e6:.2f} us, givens {result['givens'] * 1e6:.2f} us, "
+          f"board {result['board'] * 1e6:.1f} us")
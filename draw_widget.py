@@ -1,4 +1,4 @@
-import bisect
+import math
 
 from PySide6.QtWidgets import ( 
     QWidget,
@@ -9,111 +9,304 @@ from PySide6.QtGui import (
     QPainter, 
     QPen, 
     QFont, 
+    QColor,
+    QPixmap,
+    QRegion,
 )
 from PySide6.QtCore import (
     Qt, 
-    QRect
+    QPoint,
+    QPointF,
+    QRect,
+    QRectF,
+    QSize,
+    QTimer,
+    Signal,
 )
 
-NUM_BOXES_X = 9
-NUM_BOXES_Y = 9
+from board import Board, bitmap_cells, digit_bit, mask_digits
+from history import History
+from profiling import PROFILER, traced
+
+HIGHLIGHT_COLOR = QColor(255, 240, 170)
+# highlight digit mode: cells holding the digit, and cells with it as a centermark
+DIGIT_COLOR = QColor(150, 200, 255)
+DIGIT_CANDIDATE_COLOR = QColor(215, 235, 255)
+MODIFIER_KEYS = (Qt.Key_Control, Qt.Key_Shift, Qt.Key_Alt, Qt.Key_Meta)
+# rendered centermark sets kept, see drawCellContents
+CENTERMARK_CACHE_SIZE = 4096
+# pixels a cell's repaint rect extends past the cell, for the selection outline
+CELL_PADDING = 3
+# area and refresh interval of the profiling overlay
+PROFILE_OVERLAY_RECT = QRect(4, 4, 280, 220)
+PROFILE_OVERLAY_INTERVAL_MS = 250
+# killer cage outline inset and total font size, relative to the cell size
+CAGE_INSET = 0.08
+CAGE_FONT_SCALE = 0.2
+
+
+def _cage_end(edge, outward, along, diagonal):
+    """
+    Where a cage outline running along a cell edge ends: at the edge when the
+    neighbour along the line is in the cage, outward (the signed inset) past it
+    when the diagonal one is too, so the line meets the next one around the
+    corner, else inset back from the edge.
+    """
+    if along:
+        return edge + outward if diagonal else edge
+    return edge - outward
+
 
 class DrawWidget(QWidget):
+    # indices of the cells changed by an edit, undo or redo
+    edited = Signal(list)
+    # self.data was replaced by a board of another layout
+    replaced = Signal()
+
     def __init__(self, parent=None) -> None:
         super().__init__(parent)
-        self.data = [[{} for _ in range(NUM_BOXES_Y)] for _ in range(NUM_BOXES_X)]
-        self.numBoxes_x = NUM_BOXES_X
-        self.numBoxes_y = NUM_BOXES_Y
-        self.point = None
+        self.data = Board()
+        self.numBoxes_x = self.data.geometry.size
+        self.numBoxes_y = self.data.geometry.size
         self.square = None
+        # (cell, centermark, digit) of the last digit key, continued by the next one on grids over 9x9
+        self.pending_digit = None
         self.clipboard = None
         self.previous_geometry = None
         self.auto_clear = False
-        self.autofill_centermarks = False
+        # undo / redo of every board edit, stored as per cell deltas
+        self.history = History()
+        self.highlighted_cells = ()
+        # with highlight_digit on, the last digit typed is shown everywhere it is placed or marked
+        self.highlight_digit = False
+        self.highlighted_digit = 0
+        # the static grid is rendered once into a pixmap per size / DPI
+        self.grid_cache = None
+        self.grid_cache_key = None
+        self.font_resolution = 96.0
+        self.fonts = {}
+        # (centermarks, red centermarks) -> pixmap, valid for the cached grid's cell size
+        self.centermark_cache = {}
+        # (digit, colour) -> pixmap of a placed digit, valid for the same cell size
+        self.digit_cache = {}
+        # cell index -> cellLook of the cell when it was last painted
+        self.painted_looks = {}
 
         self.setFocusPolicy(Qt.StrongFocus)
 
-        self.regions = [
-            [
-                [0, 0], [0, 1], [0, 2],
-                [1, 0], [1, 1], [1, 2],
-                [2, 0], [2, 1], [2, 2]
-            ],
-            [
-                [0, 3], [0, 4], [0, 5],
-                [1, 3], [1, 4], [1, 5],
-                [2, 3], [2, 4], [2, 5]
-            ],
-            [
-                [0, 6], [0, 7], [0, 8],
-                [1, 6], [1, 7], [1, 8],
-                [2, 6], [2, 7], [2, 8]
-            ],
-            [
-                [3, 0], [3, 1], [3, 2],
-                [4, 0], [4, 1], [4, 2],
-                [5, 0], [5, 1], [5, 2]
-            ],
-            [
-                [3, 3], [3, 4], [3, 5],
-                [4, 3], [4, 4], [4, 5],
-                [5, 3], [5, 4], [5, 5]
-            ],
-            [
-                [3, 6], [3, 7], [3, 8],
-                [4, 6], [4, 7], [4, 8],
-                [5, 6], [5, 7], [5, 8]
-            ],
-            [
-                [6, 0], [6, 1], [6, 2],
-                [7, 0], [7, 1], [7, 2],
-                [8, 0], [8, 1], [8, 2]
-            ],
-            [
-                [6, 3], [6, 4], [6, 5],
-                [7, 3], [7, 4], [7, 5],
-                [8, 3], [8, 4], [8, 5]
-            ],
-            [
-                [6, 6], [6, 7], [6, 8],
-                [7, 6], [7, 7], [7, 8],
-                [8, 6], [8, 7], [8, 8]
-            ]
-        ]
+        # repaints the profiling overlay while profiling is on
+        self.profile_timer = QTimer(self)
+        self.profile_timer.setInterval(PROFILE_OVERLAY_INTERVAL_MS)
+        self.profile_timer.timeout.connect(lambda: self.update(PROFILE_OVERLAY_RECT))
+        self.setProfiling(PROFILER.enabled)
 
     def update_data(self, data):
-        self.data = data
+        if data.geometry != self.data.geometry:
+            # edits of a grid with another layout cannot be replayed on this one
+            self.history.clear()
+            self.data = data
+            self.setGridGeometry()
+            self.checkDoubles()
+            self.replaced.emit()
+        else:
+            before = self.history.capture(self.data)
+            self.data = data
+            self.checkDoubles()
+            self.recordEdit(before)
         self.update()
+
+    def setGridGeometry(self) -> None:
+        """Adapts the widget to the size and regions of self.data."""
+        size = self.data.geometry.size
+        self.numBoxes_x = size
+        self.numBoxes_y = size
+        self.square = None
+        self.pending_digit = None
+        self.highlighted_cells = ()
+        self.highlighted_digit = 0
+        self.grid_cache_key = None
+
+    def cellIndex(self, i, j) -> int:
+        """Converts (column, row) into the flat cell index of self.data."""
+        return j * self.numBoxes_x + i
     
+    @traced("paintEvent", frame=True)
     def paintEvent(self, event):
         painter = QPainter(self)
         pen = QPen(Qt.black, 5, Qt.SolidLine)
         painter.setPen(pen)
 
-        width = self.width()
-        height = self.height()
-        minimum_size = min(width, height)
-        
-        step = minimum_size / (self.numBoxes_x + 2)
-        maxSide_x = step + (self.numBoxes_x * step)
-        maxSide_y = step + (self.numBoxes_y * step)
+        step, maxSide_x, maxSide_y = self.gridMetrics()
 
-        self.checkDoubles()
+        grid = self.gridPixmap(maxSide_x, maxSide_y, step)
+        grid_rect = QRect(QPoint(0, 0), grid.deviceIndependentSize().toSize())
+        # blitting each rect under a plain clip rect is faster than one blit clipped to a complex region
+        region = event.region()
+        for rect in region:
+            grid_area = rect.intersected(grid_rect)
+            if region.rectCount() > 1:
+                painter.setClipRect(grid_area)
+            painter.drawPixmap(grid_area, grid, self.gridSourceRect(grid_area))
+        painter.setClipping(False)
 
-        self.drawBoundaries(maxSide_x, maxSide_y, step, painter, pen)
+        self.drawHighlights(step, painter)
 
         self.drawSelectedBox(maxSide_x, maxSide_y, step, painter, pen)
 
-        self.drawText(maxSide_x, maxSide_y, step, painter, pen)
-        
+        self.drawText(maxSide_x, maxSide_y, step, painter, pen, event.region())
+
+        if PROFILER.enabled:
+            self.drawProfile(painter)
+
+    def setProfiling(self, enabled: bool) -> None:
+        PROFILER.enabled = enabled
+        if enabled:
+            self.profile_timer.start()
+        else:
+            self.profile_timer.stop()
+        self.update()
+
+    def drawProfile(self, painter: QPainter) -> None:
+        """Draws the profiler's frame time, repaint count and stage timings of the last frame."""
+        painter.setFont(self.cellFont(11))
+        line_height = painter.fontMetrics().height()
+        lines = PROFILER.summary()[:PROFILE_OVERLAY_RECT.height() // line_height]
+        painter.fillRect(
+            PROFILE_OVERLAY_RECT.adjusted(0, 0, 0, line_height * len(lines) + 8 - PROFILE_OVERLAY_RECT.height()),
+            QColor(0, 0, 0, 170),
+        )
+        painter.setPen(Qt.white)
+        for row, line in enumerate(lines):
+            painter.drawText(
+                PROFILE_OVERLAY_RECT.left() + 6, PROFILE_OVERLAY_RECT.top() + 4 + line_height * row,
+                PROFILE_OVERLAY_RECT.width() - 12, line_height, Qt.AlignLeft | Qt.AlignVCenter, line
+            )
+
+    def gridMetrics(self):
+        """Returns (step, maxSide_x, maxSide_y) for the current widget size."""
+        minimum_size = min(self.width(), self.height())
+        step = minimum_size / (self.numBoxes_x + 2)
+        maxSide_x = step + (self.numBoxes_x * step)
+        maxSide_y = step + (self.numBoxes_y * step)
+        return step, maxSide_x, maxSide_y
+
+    def gridPixmap(self, maxSide_x, maxSide_y, step) -> QPixmap:
+        """
+        Returns the grid lines and region boundaries rendered into a cached
+        pixmap. The cache is rebuilt only when the size or DPI changes.
+        """
+        ratio = self.devicePixelRatioF()
+        font_resolution = self.window().windowHandle().screen().logicalDotsPerInch()
+        key = (self.width(), self.height(), ratio, font_resolution)
+        if key != self.grid_cache_key:
+            if font_resolution != self.font_resolution:
+                self.fonts = {}
+                self.font_resolution = font_resolution
+            # only the grid itself is cached, the margin around it stays the widget background
+            grid_size = QSize(math.ceil(maxSide_x) + 3, math.ceil(maxSide_y) + 3)
+            pixmap = QPixmap(grid_size * ratio)
+            pixmap.setDevicePixelRatio(ratio)
+            # opaque, so blitting it needs no blending
+            pixmap.fill(self.palette().window().color())
+            painter = QPainter(pixmap)
+            self.drawBoundaries(maxSide_x, maxSide_y, step, painter, QPen(Qt.black, 5, Qt.SolidLine))
+            painter.end()
+            self.grid_cache = pixmap
+            self.grid_cache_key = key
+            self.centermark_cache = {}
+            self.digit_cache = {}
+        return self.grid_cache
+
+    def gridSourceRect(self, rect: QRect) -> QRect:
+        """Maps a widget rect to the matching device pixel rect of the grid pixmap."""
+        ratio = self.grid_cache.devicePixelRatio()
+        return QRectF(rect.x() * ratio, rect.y() * ratio, rect.width() * ratio, rect.height() * ratio).toRect()
+
+    def cellFont(self, font_size_in_dip: float) -> QFont:
+        pixel_size = int(font_size_in_dip * (self.font_resolution / 96.0))
+        font = self.fonts.get(pixel_size)
+        if font is None:
+            font = QFont()
+            font.setFamily("Arial")
+            font.setWeight(QFont.Bold)
+            font.setPixelSize(pixel_size)
+            self.fonts[pixel_size] = font
+        return font
+
+    def cellRect(self, i, j, padded=True) -> QRect:
+        """The widget area of the cell, padded by default to include the selection outline."""
+        step = self.gridMetrics()[0]
+        rect = QRectF(step + (i * step), step + (j * step), step, step).toAlignedRect()
+        if not padded:
+            return rect
+        return rect.adjusted(-CELL_PADDING, -CELL_PADDING, CELL_PADDING, CELL_PADDING)
+
+    def updateCells(self, cells) -> None:
+        """Schedules a repaint of just the given (column, row) cells."""
+        for cell in cells:
+            if cell is not None:
+                self.update(self.cellRect(cell[0], cell[1]))
+
+    def cellLook(self, idx: int) -> tuple:
+        """Everything the drawing of a cell depends on besides the grid, selection and highlights."""
+        board = self.data
+        candidates = board.candidates[idx]
+        return (
+            board.values[idx], candidates, board.given >> idx & 1, board.conflicts >> idx & 1,
+            board.seen_mask(idx) & candidates if candidates else 0,
+        )
+
+    def updateChangedCells(self, cells) -> None:
+        """
+        Schedules a repaint of the edited cells and of those of their peers
+        that would now be drawn differently than when they were last painted,
+        e.g. because a conflict appeared or a centermark turned red.
+        """
+        peers = self.data.geometry.peers
+        affected = set(cells)
+        for idx in cells:
+            affected.update(peers[idx])
+        painted = self.painted_looks
+        size = self.numBoxes_x
+        for idx in affected:
+            if painted.get(idx) != self.cellLook(idx):
+                cell = (idx % size, idx // size)
+                # only the selected cell has an outline reaching past its edges
+                self.update(self.cellRect(*cell, padded=cell == self.square))
+
+    def resizeEvent(self, event) -> None:
+        self.grid_cache_key = None
+        super().resizeEvent(event)
+
     def mousePressEvent(self, event: QMouseEvent) -> None:
+        if PROFILER.enabled:
+            PROFILER.mark_input()
         if event.button() == Qt.LeftButton:
             pos = event.position()
-            self.point = (pos.x(), pos.y())
-            self.update() 
-
+            previous = self.square
+            self.square = self.cellAt(pos.x(), pos.y())
+            self.updateCells((previous, self.square))
+
+    def cellAt(self, point_x, point_y):
+        """Returns the (column, row) under the point, or None outside the grid."""
+        step, maxSide_x, maxSide_y = self.gridMetrics()
+        if point_x < step or point_y < step or point_x > maxSide_x or point_y > maxSide_y:
+            return None
+        start_x = min(int(point_x // step) - 1, self.numBoxes_x - 1)
+        start_y = min(int(point_y // step) - 1, self.numBoxes_y - 1)
+        return (start_x, start_y)
+
+    @traced("keyPressEvent")
     def keyPressEvent(self, event: QKeyEvent) -> None:
+        if PROFILER.enabled:
+            PROFILER.mark_input()
+        if not Qt.Key_0 <= event.key() <= Qt.Key_9 and event.key() not in MODIFIER_KEYS:
+            self.pending_digit = None
+        if self.checkUndoRedo(event):
+            return
         if self.square == None:
+            if self.highlight_digit and Qt.Key_1 <= event.key() <= Qt.Key_9:
+                self.setHighlightedDigit(self.keyToNum(event.key()))
             return
         key_combo = event.keyCombination()
         if key_combo.keyboardModifiers() != Qt.NoModifier and key_combo.keyboardModifiers() != Qt.KeypadModifier:
@@ -122,11 +315,29 @@ class DrawWidget(QWidget):
         i = self.square[0]
         j = self.square[1]
         key = event.key()
+        idx = self.cellIndex(i, j)
+        previous = self.square
         if Qt.Key_0 <= key <= Qt.Key_9:
-            if self.data[i][j] == {} or self.data[i][j].get("given", False) == False:
-                self.data[i][j] = {"given": False, "value": self.keyToNum(key)}
+            if not self.data.is_given(idx):
+                num, _ = self.typedDigit(idx, self.keyToNum(key), False)
+                if num > self.numBoxes_x:
+                    return
+                if num and self.highlight_digit:
+                    self.setHighlightedDigit(num)
+                before = self.history.capture(self.data, self.editedCells(idx))
+                if num:
+                    self.data.set_value(idx, num)
+                else:
+                    self.data.clear_cell(idx)
+                self.cellEdited(idx)
+                self.recordEdit(before)
+                self.updateChangedCells((idx,))
         elif Qt.Key_Backspace == key or key == Qt.Key_Delete:
-            self.data[i][j] = {}
+            if not self.data.is_given(idx):
+                before = self.history.capture(self.data, (idx,))
+                self.data.clear_cell(idx)
+                self.recordEdit(before)
+                self.updateChangedCells((idx,))
         elif Qt.Key_Left == key:
             self.square = ((i - 1) % self.numBoxes_x, j)
         elif Qt.Key_Right == key or Qt.Key_Tab == key:
@@ -145,30 +356,37 @@ class DrawWidget(QWidget):
                 current_geometry = self.parentWidget().geometry()
                 self.parentWidget().setGeometry(self.previous_geometry)
                 self.previous_geometry = current_geometry
-        self.update()
+        if self.square != previous:
+            self.updateCells((previous, self.square))
     
-    def keyToNum(self, key: Qt.Key) -> str:
-        if Qt.Key_0 == key:
-            return "0"
-        if Qt.Key_1 == key:
-            return "1"
-        if Qt.Key_2 == key:
-            return "2"
-        if Qt.Key_3 == key:
-            return "3"
-        if Qt.Key_4 == key:
-            return "4"
-        if Qt.Key_5 == key:
-            return "5"
-        if Qt.Key_6 == key:
-            return "6"
-        if Qt.Key_7 == key:
-            return "7"
-        if Qt.Key_8 == key:
-            return "8"
-        if Qt.Key_9 == key:
-            return "9"
-        return ""
+    def keyToNum(self, key: Qt.Key) -> int:
+        if Qt.Key_0 <= key <= Qt.Key_9:
+            return key - Qt.Key_0
+        return 0
+
+    def typedDigit(self, idx: int, num: int, centermark: bool) -> tuple:
+        """
+        Combines consecutive digit keys in the same cell into one number on
+        grids larger than 9x9, so 1 then 2 enters 12. Returns (digit, replaced)
+        where replaced is the digit entered by the first key, 0 if none.
+        """
+        pending = self.pending_digit
+        self.pending_digit = None
+        digit, replaced = num, 0
+        if pending is not None and pending[:2] == (idx, centermark) and pending[2] * 10 + num <= self.numBoxes_x:
+            digit, replaced = pending[2] * 10 + num, pending[2]
+        if digit and digit * 10 <= self.numBoxes_x:
+            self.pending_digit = (idx, centermark, digit)
+        return digit, replaced
+
+    def editedCells(self, idx: int) -> tuple:
+        """The cells a single cell edit can change, for the undo history."""
+        return (idx,) + self.data.geometry.peers[idx] if self.auto_clear else (idx,)
+
+    def cellEdited(self, idx: int) -> None:
+        """Keeps centermarks in line with the auto clear option after a single cell edit."""
+        if self.auto_clear:
+            self.data.auto_clear_cell(idx)
 
     def checkModified(self, event: QKeyEvent) -> None:
         key = event.key()
@@ -177,32 +395,117 @@ class DrawWidget(QWidget):
         j = self.square[1]
 
         if modifiers == Qt.ControlModifier or modifiers == Qt.ControlModifier|Qt.KeypadModifier:
+            idx = self.cellIndex(i, j)
             if key == Qt.Key_C:
-                self.clipboard = self.data[self.square[0]][self.square[1]].copy()
-                if self.clipboard != {}:
-                    self.clipboard["given"] = False
+                value, candidates, _ = self.data.cell_state(idx)
+                self.clipboard = (value, candidates, False)
             if key == Qt.Key_V:
-                self.data[self.square[0]][self.square[1]] = self.clipboard
-                self.update() 
+                if self.clipboard != None and not self.data.is_given(idx):
+                    before = self.history.capture(self.data, self.editedCells(idx))
+                    self.data.set_cell_state(idx, self.clipboard)
+                    self.cellEdited(idx)
+                    self.recordEdit(before)
+                    self.updateChangedCells((idx,))
             if Qt.Key_0 <= key <= Qt.Key_9:
-                cell = self.data[i][j]
-                if cell == {} or cell["given"] == False:
-                    num = self.keyToNum(key)
-                    if cell != {} and "centermarks" in cell:
-                        if num in cell["centermarks"]:
-                            self.data[i][j]["centermarks"].remove(num)
-                        else:
-                            position = bisect.bisect(cell["centermarks"], num)
-                            self.data[i][j]["centermarks"].insert(position, num)
+                if not self.data.is_given(idx):
+                    num, replaced = self.typedDigit(idx, self.keyToNum(key), True)
+                    if not num or num > self.numBoxes_x:
+                        return
+                    if self.highlight_digit:
+                        self.setHighlightedDigit(num)
+                    before = self.history.capture(self.data, self.editedCells(idx))
+                    if self.data.values[idx]:
+                        self.data.set_candidates(idx, digit_bit(num))
+                        self.updateChangedCells((idx,))
                     else:
-                        self.data[i][j] = {"given": False, "centermarks": [num]}
-                    self.update()
+                        # undo the centermark of the first key when it becomes the first digit of num
+                        if replaced:
+                            self.data.toggle_candidate(idx, replaced)
+                        # centermarks never change how the other cells are drawn
+                        self.data.toggle_candidate(idx, num)
+                        self.updateCells(((i, j),))
+                    self.cellEdited(idx)
+                    self.recordEdit(before)
         elif modifiers == Qt.ShiftModifier:
             if key == Qt.Key_Backtab:
-                self.square = ((self.square[0] - 1) % self.numBoxes, self.square[1])
-                self.update()
+                previous = self.square
+                self.square = ((self.square[0] - 1) % self.numBoxes_x, self.square[1])
+                self.updateCells((previous, self.square))
 
 
+    def checkUndoRedo(self, event: QKeyEvent) -> bool:
+        """Handles Ctrl+Z, Ctrl+Y and Ctrl+Shift+Z; returns True if the key was one of them."""
+        key = event.key()
+        modifiers = event.modifiers() & ~Qt.KeypadModifier
+        if modifiers == Qt.ControlModifier and key == Qt.Key_Z:
+            self.undo()
+        elif (modifiers == Qt.ControlModifier and key == Qt.Key_Y) or (
+            modifiers == Qt.ControlModifier | Qt.ShiftModifier and key == Qt.Key_Z
+        ):
+            self.redo()
+        else:
+            return False
+        return True
+
+    def recordEdit(self, before: list) -> None:
+        """Stores the edit of the cells captured in before in the undo history."""
+        cells = self.history.record(self.data, before)
+        if cells:
+            self.edited.emit(cells)
+
+    def undo(self) -> None:
+        self.updateEdited(self.history.undo(self.data))
+
+    def redo(self) -> None:
+        self.updateEdited(self.history.redo(self.data))
+
+    def updateEdited(self, cells) -> None:
+        """Repaints the cells changed by an undo or redo together with the peers whose colouring changed with them."""
+        if cells:
+            self.edited.emit(cells)
+        if len(cells) > self.numBoxes_x:
+            self.update()
+            return
+        self.updateChangedCells(cells)
+
+    def highlight_cells(self, cells) -> None:
+        """Shades the given cell indices, e.g. the pattern of a hint."""
+        self.highlighted_cells = tuple(cells)
+        self.update()
+
+    def setHighlightDigit(self, enabled: bool) -> None:
+        """Turns the highlight digit mode on or off."""
+        self.highlight_digit = enabled
+        if not enabled:
+            self.setHighlightedDigit(0)
+
+    def setHighlightedDigit(self, digit: int) -> None:
+        """Shows where digit is placed and marked, 0 for no digit; the whole grid is repainted only when it changes."""
+        if digit != self.highlighted_digit:
+            self.highlighted_digit = digit
+            self.update()
+
+    def drawHighlights(self, step, painter: QPainter):
+        # multiplying keeps the grid lines below the highlight black
+        painter.setCompositionMode(QPainter.CompositionMode_Multiply)
+        for idx in self.highlighted_cells:
+            i = idx % self.numBoxes_x
+            j = idx // self.numBoxes_x
+            painter.fillRect(QRectF(step + (i * step), step + (j * step), step, step), HIGHLIGHT_COLOR)
+        digit = self.highlighted_digit
+        if digit and digit <= self.data.geometry.size:
+            # straight from the board's digit index, no cell is visited that does not hold the digit
+            for cells, color in (
+                (self.data.placements(digit), DIGIT_COLOR),
+                (self.data.positions(digit), DIGIT_CANDIDATE_COLOR),
+            ):
+                for idx in bitmap_cells(cells):
+                    i = idx % self.numBoxes_x
+                    j = idx // self.numBoxes_x
+                    painter.fillRect(QRectF(step + (i * step), step + (j * step), step, step), color)
+        painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+
+    @traced("drawBoundaries")
     def drawBoundaries(self, maxSide_x, maxSide_y, step, painter: QPainter, pen: QPen):
         
         painter.drawRect(step, step, maxSide_x - step, maxSide_y - step)
@@ -219,29 +522,107 @@ class DrawWidget(QWidget):
         pen.setWidth(4)
         painter.setPen(pen)
 
-        for region in self.regions:
-            seen_x = set()
-            seen_y = set()  
-            for cell in region:
-                if cell[0] not in seen_x:
-                    seen_x.add(cell[0])
-                if cell[1] not in seen_y:
-                    seen_y.add(cell[1])
-        
-            start_x = (min(seen_x) + 1) * step
-            start_y = (min(seen_y) + 1) * step
-            length_x = len(seen_x) * step
-            length_y = len(seen_y) * step
-
-            painter.drawRect(start_x, start_y, length_x, length_y)
-
-    def drawText(self, maxSide_x, maxSide_y, step, painter: QPainter, pen: QPen):
-        for i in range(len(self.data)):
-            for j in range(len(self.data[i])):
-                self.drawCellContents(maxSide_x, maxSide_y, step, painter, pen, i, j)
+        # thick lines wherever two neighbouring cells belong to different regions,
+        # which also draws irregular (jigsaw) regions
+        geometry = self.data.geometry
+        for j in range(self.numBoxes_y):
+            for i in range(self.numBoxes_x):
+                region = geometry.region_of(self.cellIndex(i, j))
+                x = step + (step * (i + 1))
+                y = step + (step * (j + 1))
+                if i + 1 < self.numBoxes_x and geometry.region_of(self.cellIndex(i + 1, j)) != region:
+                    painter.drawLine(x, y - step, x, y)
+                if j + 1 < self.numBoxes_y and geometry.region_of(self.cellIndex(i, j + 1)) != region:
+                    painter.drawLine(x - step, y, x, y)
+
+        if geometry.cages:
+            self.drawCages(step, painter)
+
+    def drawCages(self, step, painter: QPainter) -> None:
+        """
+        Draws every killer cage as a dashed outline inset into its cells, with
+        its total in the corner of its first cell.
+        """
+        geometry = self.data.geometry
+        size = self.numBoxes_x
+        inset = step * CAGE_INSET
+        painter.setPen(QPen(Qt.black, 1, Qt.DashLine))
+        painter.setFont(self.cellFont(step * CAGE_FONT_SCALE))
+        for cage in geometry.cages:
+            cells = set(cage.cells)
+
+            def inside(i, j) -> bool:
+                return 0 <= i < size and 0 <= j < size and j * size + i in cells
+
+            for idx in cage.cells:
+                i = idx % size
+                j = idx // size
+                left = step + (i * step)
+                top = step + (j * step)
+                right = left + step
+                bottom = top + step
+                # each open side is inset; its line runs on into a caged neighbour
+                # and one inset further where the outline turns a concave corner
+                if not inside(i, j - 1):
+                    painter.drawLine(
+                        QPointF(_cage_end(left, -inset, inside(i - 1, j), inside(i - 1, j - 1)), top + inset),
+                        QPointF(_cage_end(right, inset, inside(i + 1, j), inside(i + 1, j - 1)), top + inset),
+                    )
+                if not inside(i, j + 1):
+                    painter.drawLine(
+                        QPointF(_cage_end(left, -inset, inside(i - 1, j), inside(i - 1, j + 1)), bottom - inset),
+                        QPointF(_cage_end(right, inset, inside(i + 1, j), inside(i + 1, j + 1)), bottom - inset),
+                    )
+                if not inside(i - 1, j):
+                    painter.drawLine(
+                        QPointF(left + inset, _cage_end(top, -inset, inside(i, j - 1), inside(i - 1, j - 1))),
+                        QPointF(left + inset, _cage_end(bottom, inset, inside(i, j + 1), inside(i - 1, j + 1))),
+                    )
+                if not inside(i + 1, j):
+                    painter.drawLine(
+                        QPointF(right - inset, _cage_end(top, -inset, inside(i, j - 1), inside(i + 1, j - 1))),
+                        QPointF(right - inset, _cage_end(bottom, inset, inside(i, j + 1), inside(i + 1, j + 1))),
+                    )
+
+            if cage.total is not None:
+                # the first cell in reading order is the top-left one of the cage
+                first = cage.cells[0]
+                label = QRectF(step + (first % size * step), step + (first // size * step), step, step)
+                label = painter.boundingRect(
+                    label.adjusted(inset / 2, inset / 2, 0, 0), Qt.AlignLeft | Qt.AlignTop, str(cage.total)
+                )
+                painter.fillRect(label, self.palette().window().color())
+                painter.drawText(label, Qt.AlignLeft | Qt.AlignTop, str(cage.total))
+
+    def drawText(self, maxSide_x, maxSide_y, step, painter: QPainter, pen: QPen, dirty: QRegion):
+        # only the cells inside the repainted region need their text drawn
+        cells = set()
+        for rect in dirty:
+            first_x = self.cellAtPixel(rect.left(), step)
+            last_x = min(self.cellAtPixel(rect.right(), step), self.numBoxes_x - 1)
+            first_y = self.cellAtPixel(rect.top(), step)
+            last_y = min(self.cellAtPixel(rect.bottom(), step), self.numBoxes_y - 1)
+            for i in range(max(first_x, 0), last_x + 1):
+                for j in range(max(first_y, 0), last_y + 1):
+                    cells.add((i, j))
+        # a clip rect per cell keeps the raster engine off its slow path for a region of several rects
+        clip = dirty.rectCount() > 1
+        for i, j in cells:
+            self.drawCellContents(maxSide_x, maxSide_y, step, painter, pen, i, j, clip)
+        painter.setClipping(False)
     
 
-    def drawCellContents(self, maxSide_x, maxSide_y, step, painter: QPainter, pen: QPen, i, j) -> None:
+    @staticmethod
+    def cellAtPixel(pixel, step) -> int:
+        """The cell whose drawn text covers a pixel column or row, the one before it in a gap between cells."""
+        # text is drawn from round(step + index * step), see drawCellContents
+        index = int((pixel + 0.5) // step) - 1
+        if round(step + index * step) > pixel:
+            index -= 1
+        return index
+
+    @traced("drawCellContents")
+    def drawCellContents(self, maxSide_x, maxSide_y, step, painter: QPainter, pen: QPen, i, j, clip=False) -> None:
         """
         Draws the text within the cell.
         
@@ -249,75 +630,90 @@ class DrawWidget(QWidget):
         step (float): the length of a side of a cell.
         painter (QPainter): the painter object used to draw.
         pen (QPen): the pen object used to draw.
-        i (int): the row index of the cell.
-        j (int): the column index of the cell.
+        i (int): the column index of the cell.
+        j (int): the row index of the cell.
+        clip (bool): whether to clip the painter to the cell first.
         """
-        # Get cell data and if it is empty, return
-        cell = self.data[i][j]
-        if cell == {}:
+        # Get cell data, remember how it is drawn, and if it is empty, return
+        idx = self.cellIndex(i, j)
+        look = self.cellLook(idx)
+        self.painted_looks[idx] = look
+        value, candidates, given, conflict, double_centermarks = look
+        if not value and not candidates:
             return
-        
-        # Set up the font
-        screen = self.window().windowHandle().screen()
-        font_resolution = screen.logicalDotsPerInch()
-        font = QFont()
-        font.setFamily("Arial")
-        font.setWeight(QFont.Bold)
-        
-        # Determine pen color
-        if cell.get("given", False) and "value" in cell:
-            pen.setColor(Qt.black)
-        elif cell.get("double", False): 
-            pen.setColor(Qt.red)
-        else:
-            pen.setColor(Qt.blue)
-        painter.setPen(pen)
-
-        # If the cell is a given or does not have centermarks, draw the number
-        if cell.get("given", False) or "centermarks" not in cell:
-            num = cell.get("value", "")
-            font_size_in_dip = step / 1.25
-            font.setPixelSize(int(font_size_in_dip * (font_resolution / 96.0)))
-            painter.setFont(font)
-
-            # Define the text rectangle and draw the text
-            cell_center_x = (i + 1.5) * step
-            cell_center_y = (j + 1.5) * step
-            buffer = step * 0.1
-            text_rect = QRect(
-                cell_center_x - (step / 2) + buffer,
-                cell_center_y - (step / 2) + buffer, 
-                step - (2 * buffer), 
-                step - (2 * buffer)
-            )
-            painter.drawText(text_rect, Qt.AlignCenter | Qt.TextWordWrap, num)
-            return
-        
-        # If the cell has centermarks, handle each centermark separately
-        if "centermarks" not in cell or len(cell["centermarks"]) == 0:
+        # the cached pixmaps are floor(step) wide, from the rounded corner they stay inside the cell's pixels
+        origin = QPoint(round(step + (i * step)), round(step + (j * step)))
+        if clip:
+            side = math.floor(step)
+            painter.setClipRect(QRect(origin, QSize(side, side)))
+
+        # A placed digit is rendered once per colour and reused
+        if value:
+            color = Qt.black if given else Qt.red if conflict else Qt.blue
+            pixmap = self.digit_cache.get((value, color))
+            if pixmap is None:
+                pixmap = self.digitPixmap(step, pen, value, color)
+                self.digit_cache[(value, color)] = pixmap
+            painter.drawPixmap(origin, pixmap)
             return
-        centermarks = cell.get("centermarks", [])
-        max_marks_per_row = 3  # Adjust this for layout
+
+        # Otherwise draw the centermarks. A set of marks is rendered once per
+        # colouring and reused, a 25x25 grid can hold over 15000 of them
+        key = (candidates, double_centermarks)
+        pixmap = self.centermark_cache.get(key)
+        if pixmap is None:
+            if len(self.centermark_cache) >= CENTERMARK_CACHE_SIZE:
+                self.centermark_cache = {}
+            pixmap = self.centermarkPixmap(step, pen, mask_digits(candidates), double_centermarks)
+            self.centermark_cache[key] = pixmap
+        painter.drawPixmap(origin, pixmap)
+
+    def digitPixmap(self, step, pen: QPen, value: int, color) -> QPixmap:
+        """Renders a placed digit in the given colour, centred in a cell."""
+        ratio = self.devicePixelRatioF()
+        pixmap = QPixmap(QSize(math.floor(step), math.floor(step)) * ratio)
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        pen.setColor(color)
+        painter.setPen(pen)
+        painter.setFont(self.cellFont(step / (1.25 if value < 10 else 2)))
+        buffer = step * 0.1
+        painter.drawText(
+            QRectF(buffer, buffer, step - (2 * buffer), step - (2 * buffer)),
+            Qt.AlignCenter | Qt.TextWordWrap,
+            str(value),
+        )
+        painter.end()
+        return pixmap
+
+    def centermarkPixmap(self, step, pen: QPen, centermarks, double_centermarks) -> QPixmap:
+        """Renders the centermarks of one cell, those in double_centermarks in red."""
+        ratio = self.devicePixelRatioF()
+        pixmap = QPixmap(QSize(math.floor(step), math.floor(step)) * ratio)
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+
+        # 3 per row on 9x9, 4 on 16x16, 5 on 25x25
+        max_marks_per_row = math.isqrt(self.numBoxes_x - 1) + 1
         rows = (len(centermarks) + max_marks_per_row - 1) // max_marks_per_row
-        font_size_in_dip = step / (3.75 if len(centermarks) > 6 else 3)
-        font.setPixelSize(int(font_size_in_dip * (font_resolution / 96.0)))
-        painter.setFont(font)
+        font_size_in_dip = step / (max_marks_per_row * (1.25 if rows > 2 else 1))
+        if self.numBoxes_x > 9:
+            # two digit marks need room for both
+            font_size_in_dip /= 1.6
+        painter.setFont(self.cellFont(font_size_in_dip))
 
-        # Define starting point for centermarks
-        cell_center_x = (i + 1.5) * step
-        cell_center_y = (j + 1.5) * step
         text_width = step / max_marks_per_row
         text_height = step / rows
 
-        for idx, mark in enumerate(centermarks):
+        for mark_idx, mark in enumerate(centermarks):
             # Determine position for the current mark
-            row = idx // max_marks_per_row
-            col = idx % max_marks_per_row
-            mark_x = cell_center_x - step / 2 + col * text_width + text_width / 2
-            mark_y = cell_center_y - step / 2 + row * text_height + text_height / 2
+            row = mark_idx // max_marks_per_row
+            col = mark_idx % max_marks_per_row
 
             # Set pen color for the specific mark
-            if mark in cell.get("double_centermarks", []):
+            if double_centermarks & digit_bit(mark):
                 pen.setColor(Qt.red)
             else:
                 pen.setColor(Qt.blue)
@@ -325,45 +721,20 @@ class DrawWidget(QWidget):
 
             # Draw the centermark
             painter.drawText(
-                QRect(
-                    mark_x - text_width / 2,
-                    mark_y - text_height / 2,
-                    text_width,
-                    text_height,
-                ),
+                QRectF(col * text_width, row * text_height, text_width, text_height),
                 Qt.AlignCenter,
-                mark
+                str(mark)
             )
+        painter.end()
+        return pixmap
 
 
     def drawSelectedBox(self, maxSide_x, maxSide_y, step, painter: QPainter, pen: QPen):
         """draws the box around the selected cell"""
-        if self.point != None:
-            if self.point[0] < step or self.point[1] < step or self.point[0] > maxSide_x or self.point[1] > maxSide_y:
-                self.point = None
-                self.square = None
-            else:
-                point_x = self.point[0]
-                point_y = self.point[1]
-                start_x = 0
-                start_y = 0
-                for i in range(1, self.numBoxes_x):
-                    if point_x < step + (i * step):
-                        break
-                    start_x = i
-                for i in range(1, self.numBoxes_y):
-                    if point_y < step + (i * step):
-                        break
-                    start_y = i
-
-                pen.setColor(Qt.red)
-                painter.setPen(pen)
-                painter.drawRect(step + (start_x * step), step + (start_y * step), step, step)
-                self.point = None
-                self.square = (start_x, start_y)
-        elif self.square != None:
+        if self.square != None:
             start_x = self.square[0]
             start_y = self.square[1]
+            pen.setWidth(4)
             pen.setColor(Qt.red)
             painter.setPen(pen)
             painter.drawRect(step + (start_x * step), step + (start_y * step), step, step)
@@ -374,110 +745,27 @@ class DrawWidget(QWidget):
     """
 
     def add_all_centermarks(self) -> None:
-        self.autofill_centermarks = True
+        before = self.history.capture(self.data)
+        self.data.update_candidates(fill=True)
         self.auto_clear = True
+        self.checkDoubles()
+        self.recordEdit(before)
         self.update()
 
     def auto_clear_centermarks(self):
+        before = self.history.capture(self.data)
         self.auto_clear = not self.auto_clear
+        self.checkDoubles()
+        self.recordEdit(before)
         self.update()
 
-    def resetDoubles(self):
-        for i in range(self.numBoxes_x):
-            for j in range(self.numBoxes_y):
-                cell = self.data[i][j]
-                if cell == {}:
-                    continue
-                cell["double"] = False
-                cell["double_centermarks"] = []
-
-
+    @traced("checkDoubles")
     def checkDoubles(self):
         """
-        Checks for duplicate values in rows, columns, and regions, and marks them.
-        Also checks for duplicate centermarks and handles autofill and autoclear options.
+        Rebuilds the duplicate tracking for the whole board, e.g. after a new
+        board was loaded. Single cell edits keep it up to date incrementally.
+        Also clears seen centermarks when auto clear is on.
         """
-        # Reset all double flags and double centermarks before checking for new doubles
-        self.resetDoubles()
-        horizontal_value_to_cell_dict = {}
-        vertical_value_to_cell_dict = {}
-        regional_value_to_cell_dict = {}
-
-        for i in range(self.numBoxes_x):
-            for j in range(self.numBoxes_y):
-                cell = self.data[i][j]
-
-                if cell == {} or "value" not in cell:
-                    continue
-
-                cell_value = cell["value"]
-                # check horizontal
-                if i not in horizontal_value_to_cell_dict:
-                    horizontal_value_to_cell_dict[i] = {}
-                if cell_value in horizontal_value_to_cell_dict[i]:
-                    other_cell = horizontal_value_to_cell_dict[i][cell_value]
-                    self.data[i][j]["double"] = True
-                    self.data[other_cell[0]][other_cell[1]]["double"] = True
-                else:
-                    horizontal_value_to_cell_dict[i][cell_value] = (i, j)
-                
-                # check vertical
-                if j not in vertical_value_to_cell_dict:
-                    vertical_value_to_cell_dict[j] = {}
-                if cell_value in vertical_value_to_cell_dict[j]:
-                    other_cell = vertical_value_to_cell_dict[j][cell_value]
-                    self.data[i][j]["double"] = True
-                    self.data[other_cell[0]][other_cell[1]]["double"] = True
-                else:
-                    vertical_value_to_cell_dict[j][cell_value] = (i, j)
-
-                # check regions
-                region = (i // 3) * 3 + (j // 3)
-                if region not in regional_value_to_cell_dict:
-                    regional_value_to_cell_dict[region] = {}
-                if cell_value in regional_value_to_cell_dict[region]:
-                    other_cell = regional_value_to_cell_dict[region][cell_value]
-                    self.data[i][j]["double"] = True
-                    self.data[other_cell[0]][other_cell[1]]["double"] = True
-                else:
-                    regional_value_to_cell_dict[region][cell_value] = (i, j)
-
-        ## check for doubles in centermarks
-        for i in range(self.numBoxes_x):
-            for j in range(self.numBoxes_y):
-                cell = self.data[i][j]
-
-                if self.autofill_centermarks:
-                    if "value" in cell:
-                        continue
-                    cell["centermarks"] = [str(x) for x in range(1, 10)]
-
-                if "centermarks" not in cell:
-                    continue
-
-                to_remove = set()
-                for centermark in cell["centermarks"]:
-                    # check horizontal
-                    if centermark in horizontal_value_to_cell_dict.get(i, {}):
-                        if self.auto_clear:
-                            to_remove.add(centermark)
-                        else:
-                            self.data[i][j]["double_centermarks"].append(centermark)
-                    # check vertical
-                    if centermark in vertical_value_to_cell_dict.get(j, {}):
-                        if self.auto_clear:
-                            to_remove.add(centermark)
-                        else:
-                            self.data[i][j]["double_centermarks"].append(centermark)
-                    # check regions
-                    region = (i // 3) * 3 + (j // 3)
-                    if centermark in regional_value_to_cell_dict.get(region, {}):
-                        if self.auto_clear:
-                            to_remove.add(centermark)
-                        else:
-                            self.data[i][j]["double_centermarks"].append(centermark)
-                    
-                for mark in to_remove:
-                    self.data[i][j]["centermarks"].remove(mark)
-
-        self.autofill_centermarks = False
+        self.data.check_conflicts()
+        if self.auto_clear:
+            self.data.update_candidates(fill=False)
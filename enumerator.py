@@ -0,0 +1,286 @@
+"""
+Lazy, resumable enumeration of all solutions of a puzzle.
+
+SolutionEnumerator walks the same search tree as solve: at every node the
+cell with the fewest candidates is branched on, its digits in increasing
+order. The walk is iterative and keeps one candidate list per level, so
+memory stays bounded by the depth of the tree however many solutions are
+yielded.
+
+Because the tree only depends on the puzzle, a position in it is the list
+of the branches taken from the root. cursor() encodes that list, together
+with a fingerprint of the puzzle and the number of solutions so far, as a
+short URL safe token; passing the token back resumes the walk right after
+the last solution, in this process or another one.
+
+split(givens, parts) expands the top of the tree into disjoint subtrees
+that together hold every solution, one cursor each. An enumerator started
+from such a cursor never leaves its subtree, so count_parallel hands the
+subtrees to worker processes and adds up their counts.
+"""
+
+import base64
+import hashlib
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from board import MASK_DIGITS
+from solver import (
+    BIT_DIGIT,
+    PROGRESS_INTERVAL,
+    initial_candidates,
+    killer_rules,
+    parse_givens,
+    propagate,
+    select_cell,
+)
+
+CURSOR_VERSION = 1
+# what the cursor's path means
+FRESH = 0  # the walk starts at the node the path leads to
+ADVANCE = 1  # the branch at the end of the path is done, the walk continues after it
+DONE = 2
+# version, state, length of the fixed prefix, puzzle fingerprint, solutions so far
+_CURSOR = struct.Struct("<BBB4sQ")
+
+
+def fingerprint(digits: list, killer=None) -> bytes:
+    """A short hash of the puzzle, so a cursor is not resumed on another one."""
+    data = bytes(digits) + (repr(killer.sums).encode() if killer is not None else b"")
+    return hashlib.blake2b(data, digest_size=4).digest()
+
+
+def encode_cursor(state: int, fixed: int, print_: bytes, count: int, path) -> str:
+    # positions are stored one up, a level entered without a branch taken yet is -1
+    data = _CURSOR.pack(CURSOR_VERSION, state, fixed, print_, count) + bytes(position + 1 for position in path)
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+class SolutionEnumerator:
+    """
+    Iterator over the solutions of givens (see solver.parse_givens), each a
+    bytearray of the 81 digits. cursor, from cursor() or split(), resumes an
+    earlier walk or restricts it to a subtree.
+
+    progress, when given, is called with the node count every
+    PROGRESS_INTERVAL nodes; returning True stops the iteration early, with
+    cancelled set and cursor() still valid.
+    """
+
+    __slots__ = (
+        "digits", "killer", "fingerprint", "path", "fixed", "state", "count", "nodes", "backtracks",
+        "progress", "cancelled", "walker",
+    )
+
+    def __init__(self, givens, cursor=None, progress=None) -> None:
+        self.digits = parse_givens(givens)
+        self.killer = killer_rules(givens)
+        self.fingerprint = fingerprint(self.digits, self.killer)
+        self.path = []
+        self.fixed = 0
+        self.state = FRESH
+        self.count = 0
+        if cursor is not None:
+            self._load(cursor)
+        self.nodes = 0
+        self.backtracks = 0
+        self.progress = progress
+        self.cancelled = False
+        self.walker = None
+
+    def __iter__(self) -> "SolutionEnumerator":
+        return self
+
+    def __next__(self) -> bytearray:
+        if self.walker is None:
+            self.walker = self._walk()
+        return next(self.walker)
+
+    @property
+    def done(self) -> bool:
+        return self.state == DONE
+
+    def cursor(self) -> str:
+        """Token of the current position, resuming after the last solution returned."""
+        return encode_cursor(self.state, self.fixed, self.fingerprint, self.count, self.path)
+
+    def _load(self, cursor: str) -> None:
+        try:
+            data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            version, state, fixed, print_, count = _CURSOR.unpack_from(data)
+        except (ValueError, struct.error):
+            raise ValueError("invalid cursor") from None
+        if version != CURSOR_VERSION:
+            raise ValueError(f"unsupported cursor version {version}")
+        if print_ != self.fingerprint:
+            raise ValueError("the cursor belongs to another puzzle")
+        path = [position - 1 for position in data[_CURSOR.size:]]
+        if state not in (FRESH, ADVANCE, DONE) or fixed > len(path) or any(p < 0 for p in path[:-1]):
+            raise ValueError("invalid cursor")
+        self.state = state
+        self.fixed = fixed
+        self.path = path
+        self.count = count
+
+    def _replay(self):
+        """Rebuilds the levels of the search along self.path; returns (levels, node at its end)."""
+        killer = self.killer
+        node = initial_candidates(self.digits, killer)
+        levels = []
+        for position in self.path:
+            if node is None:
+                raise ValueError("the cursor does not match the puzzle's search")
+            idx = select_cell(node)
+            if idx < 0:
+                raise ValueError("the cursor does not match the puzzle's search")
+            digits = MASK_DIGITS[node[idx]]
+            levels.append((node, idx, digits))
+            if position < 0:
+                # only the last level can have no branch taken
+                return levels, None
+            if position >= len(digits):
+                raise ValueError("the cursor does not match the puzzle's search")
+            branch = node[:]
+            branch[idx] = 1 << (digits[position] - 1)
+            node = branch if propagate(branch, [idx], killer) else None
+        return levels, node
+
+    def _walk(self):
+        if self.state == DONE:
+            return
+        levels, node = self._replay()
+        path = self.path
+        killer = self.killer
+        if self.state == FRESH and node is None:
+            # the givens contradict each other, or a subtree's prefix leads nowhere
+            self.state = DONE
+            return
+        if self.state == ADVANCE:
+            node = None
+        while True:
+            if node is not None:
+                idx = select_cell(node)
+                if idx < 0:
+                    self.count += 1
+                    self.state = ADVANCE
+                    yield bytearray(BIT_DIGIT[mask] for mask in node)
+                else:
+                    levels.append((node, idx, MASK_DIGITS[node[idx]]))
+                    path.append(-1)
+                    # a level entered but not branched on yet resumes the same way
+                    self.state = ADVANCE
+                node = None
+            # the next untried branch, backing up through finished levels
+            while node is None:
+                if len(path) == self.fixed:
+                    self.state = DONE
+                    return
+                parent, idx, digits = levels[-1]
+                position = path[-1] + 1
+                if position == len(digits):
+                    levels.pop()
+                    path.pop()
+                    continue
+                self.nodes += 1
+                if (
+                    self.progress is not None
+                    and not self.nodes & (PROGRESS_INTERVAL - 1)
+                    and self.progress(self.nodes)
+                ):
+                    self.nodes -= 1
+                    self.cancelled = True
+                    return
+                path[-1] = position
+                branch = parent[:]
+                branch[idx] = 1 << (digits[position] - 1)
+                if propagate(branch, [idx], killer):
+                    node = branch
+                else:
+                    self.backtracks += 1
+
+
+def split(givens, parts: int) -> list:
+    """
+    Cursors of disjoint subtrees holding every solution between them, at
+    least parts of them unless the tree is smaller. The tree is expanded a
+    level at a time, so the subtrees are of similar depth.
+    """
+    digits = parse_givens(givens)
+    killer = killer_rules(givens)
+    print_ = fingerprint(digits, killer)
+    root = initial_candidates(digits, killer)
+    if root is None:
+        return []
+    # (path, node) of every subtree, nodes without a free cell cannot be split further
+    frontier = [((), root)]
+    while len(frontier) < parts:
+        expanded = []
+        grew = False
+        for path, node in frontier:
+            idx = select_cell(node)
+            if idx < 0:
+                expanded.append((path, node))
+                continue
+            grew = True
+            for position, digit in enumerate(MASK_DIGITS[node[idx]]):
+                branch = node[:]
+                branch[idx] = 1 << (digit - 1)
+                if propagate(branch, [idx], killer):
+                    expanded.append((path + (position,), branch))
+        frontier = expanded
+        if not grew:
+            break
+    return [encode_cursor(FRESH, len(path), print_, 0, path) for path, _ in frontier]
+
+
+def count_subtree(givens, cursor=None, limit=None, progress=None) -> tuple:
+    """
+    Returns (solutions, nodes) of the walk from cursor, stopping after limit
+    solutions. Only the count is kept, however many solutions are walked
+    through. progress cancels the walk as for SolutionEnumerator.
+    """
+    enumerator = SolutionEnumerator(givens, cursor, progress)
+    for _ in enumerator:
+        if limit is not None and enumerator.count >= limit:
+            break
+    return enumerator.count, enumerator.nodes
+
+
+def count_parallel(givens, jobs: int = 1, parts=None, limit=None) -> list:
+    """
+    Counts the solutions of every subtree of split(givens, parts), parts
+    defaulting to 8 per job, over jobs worker processes. limit caps the count
+    of each subtree. Returns the (solutions, nodes) of every subtree in
+    order; the puzzle's count is their sum.
+    """
+    cursors = split(givens, parts or 8 * jobs)
+    if jobs <= 1:
+        return [count_subtree(givens, cursor, limit) for cursor in cursors]
+    with ProcessPoolExecutor(jobs) as pool:
+        return list(pool.map(count_subtree, [givens] * len(cursors), cursors, [limit] * len(cursors)))
+
+
+def benchmark(givens, limit: int = 100_000) -> dict:
+    """Times enumerating limit solutions, and resuming the walk from a cursor."""
+    enumerator = SolutionEnumerator(givens)
+    start = time.perf_counter()
+    for _ in enumerator:
+        if enumerator.count >= limit:
+            break
+    enumerate_time = time.perf_counter() - start
+    cursor = enumerator.cursor()
+    start = time.perf_counter()
+    next(SolutionEnumerator(givens, cursor), None)
+    resume_time = time.perf_counter() - start
+    return {"solutions": enumerator.count, "enumerate": enumerate_time, "resume": resume_time, "cursor": cursor}
+
+
+if __name__ == "__main__":
+    # the top row of a grid fixed, about 5e12 solutions below it
+    puzzle = sys.argv[1] if len(sys.argv) > 1 else "123456789" + "0" * 72
+    result = benchmark(puzzle, int(sys.argv[2]) if len(sys.argv) > 2 else 100_000)
+    print(f"{result['solutions']} solutions in {result['enumerate']:.2f} s "
+          f"({result['solutions'] / result['enumerate']:.0f} per second), "
+          f"resumed in {result['resume'] * 1000:.2f} ms from a {len(result['cursor'])} character cursor")
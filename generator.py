@@ -0,0 +1,156 @@
+"""
+Puzzle generation.
+
+A random full grid is built with the solver's propagation, then clues are
+removed one symmetry orbit at a time as long as the puzzle stays unique. The
+result is graded with the logical solver into one of BANDS. Many candidates
+can be generated in parallel with a process pool until enough puzzles of the
+wanted band were found.
+"""
+
+import random
+import time
+
+from board import MASK_DIGITS, NUM_CELLS, SIZE
+from logic import TECHNIQUES, LogicSolver, LogicState
+from solver import BIT_DIGIT, count_solutions, initial_candidates, propagate, select_cell
+
+SYMMETRIES = ("none", "rotational", "mirror")
+BANDS = ("easy", "medium", "hard", "expert")
+
+_TECHNIQUE_NAMES = [name for name, _ in TECHNIQUES]
+# hardest technique index allowed in each band, expert puzzles need search
+_BAND_LIMITS = (
+    ("easy", _TECHNIQUE_NAMES.index("hidden single")),
+    ("medium", _TECHNIQUE_NAMES.index("hidden pair")),
+    ("hard", len(TECHNIQUES) - 1),
+)
+
+
+def symmetry_orbits(symmetry: str) -> list:
+    """Groups the cells into orbits that are kept or removed together."""
+    if symmetry not in SYMMETRIES:
+        raise ValueError(f"unknown symmetry {symmetry!r}, expected one of {SYMMETRIES}")
+    orbits = []
+    seen = set()
+    for idx in range(NUM_CELLS):
+        if idx in seen:
+            continue
+        if symmetry == "rotational":
+            orbit = {idx, NUM_CELLS - 1 - idx}
+        elif symmetry == "mirror":
+            row, col = divmod(idx, SIZE)
+            orbit = {idx, row * SIZE + SIZE - 1 - col}
+        else:
+            orbit = {idx}
+        seen |= orbit
+        orbits.append(tuple(sorted(orbit)))
+    return orbits
+
+
+def random_grid(rng: random.Random) -> bytearray:
+    """Returns a random complete and valid grid."""
+
+    def fill(cands):
+        idx = select_cell(cands)
+        if idx < 0:
+            return cands
+        digits = list(MASK_DIGITS[cands[idx]])
+        rng.shuffle(digits)
+        for digit in digits:
+            branch = cands[:]
+            branch[idx] = 1 << (digit - 1)
+            if propagate(branch, [idx]):
+                result = fill(branch)
+                if result is not None:
+                    return result
+        return None
+
+    return bytearray(BIT_DIGIT[mask] for mask in fill(initial_candidates([0] * NUM_CELLS)))
+
+
+def grade(puzzle) -> str:
+    """Returns the difficulty band of a unique puzzle."""
+    result = LogicSolver().solve(LogicState.from_givens(puzzle))
+    if not result.solved:
+        return "expert"
+    for band, limit in _BAND_LIMITS:
+        if result.hardest <= limit:
+            return band
+    return "expert"
+
+
+def generate(symmetry: str = "rotational", rng=None) -> bytearray:
+    """Generates a puzzle with a unique solution and the given clue symmetry."""
+    rng = rng or random.Random()
+    puzzle = random_grid(rng)
+    orbits = symmetry_orbits(symmetry)
+    rng.shuffle(orbits)
+    for orbit in orbits:
+        removed = [puzzle[idx] for idx in orbit]
+        for idx in orbit:
+            puzzle[idx] = 0
+        if count_solutions(puzzle, limit=2).count != 1:
+            for idx, digit in zip(orbit, removed):
+                puzzle[idx] = digit
+    return puzzle
+
+
+def generate_attempt(symmetry: str, seed: int) -> tuple:
+    """One generation attempt; returns (puzzle string, band, seconds taken)."""
+    start = time.perf_counter()
+    puzzle = generate(symmetry, random.Random(seed))
+    band = grade(puzzle)
+    return "".join(map(str, puzzle)), band, time.perf_counter() - start
+
+
+class BandStats:
+    __slots__ = ("puzzles", "time")
+
+    def __init__(self) -> None:
+        self.puzzles = 0
+        self.time = 0.0
+
+
+def generate_many(count: int, symmetry: str = "rotational", band=None, jobs: int = 1, seed=None, stats=None):
+    """
+    Yields count puzzle strings of the wanted band (any band if band is None),
+    generating candidates on jobs worker processes. When given, stats is a
+    dict that collects a BandStats per band for every attempt.
+    """
+    if band is not None and band not in BANDS:
+        raise ValueError(f"unknown band {band!r}, expected one of {BANDS}")
+    stats = stats if stats is not None else {}
+    seeds = random.Random(seed)
+
+    def accept(result):
+        puzzle, puzzle_band, elapsed = result
+        band_stats = stats.setdefault(puzzle_band, BandStats())
+        band_stats.puzzles += 1
+        band_stats.time += elapsed
+        return band is None or puzzle_band == band
+
+    produced = 0
+    if jobs <= 1:
+        while produced < count:
+            result = generate_attempt(symmetry, seeds.getrandbits(64))
+            if accept(result):
+                produced += 1
+                yield result[0]
+        return
+
+    # multiprocessing is slow to import and only needed here
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = set()
+        while produced < count:
+            while len(pending) < 2 * jobs:
+                pending.add(pool.submit(generate_attempt, symmetry, seeds.getrandbits(64)))
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                result = future.result()
+                if accept(result) and produced < count:
+                    produced += 1
+                    yield result[0]
+        pool.shutdown(cancel_futures=True)
@@ -0,0 +1,186 @@
+"""
+Undo / redo history for a Board.
+
+An edit is stored as the cells it changed, each packed into one 64 bit word
+holding the cell index and its state before and after the edit. All words
+live in a single array with a second array marking where each edit ends, so
+a single cell edit costs 12 bytes of history and undoing or redoing an edit
+only touches the cells it changed.
+"""
+
+import sys
+import time
+from array import array
+
+from board import MAX_SIZE, PEERS, Board
+
+# a cell holds either a placed digit or centermarks, so its state packs into
+# value << 2 | given << 1 | 1 or candidates << 1, at most MAX_SIZE + 1 bits
+_STATE_BITS = MAX_SIZE + 1
+_STATE_MASK = (1 << _STATE_BITS) - 1
+
+
+def pack_state(board: Board, idx: int) -> int:
+    value = board.values[idx]
+    if value:
+        return value << 2 | (board.given >> idx & 1) << 1 | 1
+    return board.candidates[idx] << 1
+
+
+def unpack_state(state: int) -> tuple:
+    """Returns the (value, candidates, given) tuple used by Board.set_cell_state."""
+    if state & 1:
+        return (state >> 2, 0, bool(state & 2))
+    return (0, state >> 1, False)
+
+
+class History:
+    """
+    Linear undo / redo history. Call capture before changing a board and
+    record afterwards with the same cells; undo and redo return the indices
+    of the cells they changed so only those have to be repainted.
+    """
+
+    __slots__ = ("changes", "ends", "position")
+
+    def __init__(self) -> None:
+        # (idx << 52) | (before << 26) | after for every changed cell, idx < 625 fits in 64 bits
+        self.changes = array("Q")
+        # end offset into changes of every edit
+        self.ends = array("I")
+        # number of edits currently applied
+        self.position = 0
+
+    def capture(self, board: Board, cells=None) -> list:
+        """Returns the packed state of cells (all by default), to be passed to record after the edit."""
+        if cells is None:
+            cells = range(board.geometry.num_cells)
+        return [(idx, pack_state(board, idx)) for idx in cells]
+
+    def record(self, board: Board, before: list) -> list:
+        """
+        Stores the cells of before whose state differs on board as one edit and
+        drops anything that could have been redone. Returns the indices of the
+        changed cells, empty when nothing changed and no edit was stored.
+        """
+        changed = [
+            idx << 2 * _STATE_BITS | old << _STATE_BITS | new
+            for idx, old in before
+            if (new := pack_state(board, idx)) != old
+        ]
+        if not changed:
+            return []
+        if self.position < len(self.ends):
+            del self.ends[self.position:]
+            del self.changes[self.ends[-1] if self.ends else 0:]
+        self.changes.extend(changed)
+        self.ends.append(len(self.changes))
+        self.position += 1
+        return [change >> 2 * _STATE_BITS for change in changed]
+
+    def can_undo(self) -> bool:
+        return self.position > 0
+
+    def can_redo(self) -> bool:
+        return self.position < len(self.ends)
+
+    def _edit(self, position: int) -> array:
+        start = self.ends[position - 1] if position else 0
+        return self.changes[start:self.ends[position]]
+
+    def undo(self, board: Board) -> list:
+        """Reverts the last applied edit; returns the changed cell indices."""
+        if not self.can_undo():
+            return []
+        self.position -= 1
+        edit = self._edit(self.position)
+        cells = []
+        for change in reversed(edit):
+            idx = change >> 2 * _STATE_BITS
+            board.set_cell_state(idx, unpack_state(change >> _STATE_BITS & _STATE_MASK))
+            cells.append(idx)
+        return cells
+
+    def redo(self, board: Board) -> list:
+        """Re-applies the next undone edit; returns the changed cell indices."""
+        if not self.can_redo():
+            return []
+        edit = self._edit(self.position)
+        self.position += 1
+        cells = []
+        for change in edit:
+            idx = change >> 2 * _STATE_BITS
+            board.set_cell_state(idx, unpack_state(change & _STATE_MASK))
+            cells.append(idx)
+        return cells
+
+    def clear(self) -> None:
+        self.changes = array("Q")
+        self.ends = array("I")
+        self.position = 0
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the stored edits."""
+        return self.changes.itemsize * len(self.changes) + self.ends.itemsize * len(self.ends)
+
+
+def benchmark(count: int = 10_000) -> dict:
+    """
+    Records count centermark toggles and digit entries with auto clear, then
+    undoes and redoes all of them. Returns the history size and timings.
+    """
+    import random
+
+    from codec import parse_board
+
+    rng = random.Random(0)
+    board = parse_board("4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......")
+    board.fill_candidates()
+    board.clear_seen_candidates()
+    start_board = board.copy()
+    history = History()
+    free = [idx for idx in range(board.geometry.num_cells) if not board.is_given(idx)]
+
+    start = time.perf_counter()
+    for _ in range(count):
+        idx = rng.choice(free)
+        if rng.random() < 0.9:
+            before = history.capture(board, (idx,))
+            board.toggle_candidate(idx, rng.randint(1, 9))
+        else:
+            before = history.capture(board, (idx,) + PEERS[idx])
+            board.set_value(idx, rng.randint(1, 9))
+            board.auto_clear_cell(idx)
+        history.record(board, before)
+    record_time = time.perf_counter() - start
+    end_board = board.copy()
+
+    start = time.perf_counter()
+    while history.can_undo():
+        history.undo(board)
+    undo_time = time.perf_counter() - start
+    if board != start_board:
+        raise RuntimeError("undoing every edit did not restore the starting board")
+
+    start = time.perf_counter()
+    while history.can_redo():
+        history.redo(board)
+    redo_time = time.perf_counter() - start
+    if board != end_board:
+        raise RuntimeError("redoing every edit did not restore the final board")
+
+    return {
+        "edits": len(history.ends),
+        "bytes": history.nbytes,
+        "record": record_time,
+        "undo": undo_time,
+        "redo": redo_time,
+    }
+
+
+if __name__ == "__main__":
+    stats = benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
+    print(f"{stats['edits']} edits in {stats['bytes'] / 1024:.0f} KB")
+    for name in ("record", "undo", "redo"):
+        print(f"{name}: {stats[name] * 1e6 / stats['edits']:.1f} us/edit")
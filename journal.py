@@ -0,0 +1,282 @@
+"""
+Crash-safe autosave of the board as an append-only journal.
+
+The file starts with a checkpoint, a full snapshot of the board, followed by
+one 64 bit little-endian word per changed cell:
+
+    END_FLAG (last cell of an edit) | idx << 26 | state
+
+where state is history.pack_state of the cell after the edit. Edits are
+buffered and written by flush(), which the GUI calls from a timer, so typing
+never waits for the disk. Every CHECKPOINT_INTERVAL edits, and whenever the
+board is replaced, a new file holding only a checkpoint atomically replaces
+the journal. recover() loads the checkpoint and replays the complete edits
+after it; a torn last edit from a crash is ignored.
+"""
+
+import os
+import struct
+import sys
+import time
+from array import array
+
+from board import MAX_SIZE, Board, Geometry, square_geometry
+from cages import Cage
+from history import pack_state
+
+MAGIC = b"SUDJ"
+VERSION = 1
+# edits between two checkpoints, bounds the replay work and the file size
+CHECKPOINT_INTERVAL = 10_000
+# buffered words that trigger a write before the next flush
+BUFFER_WORDS = 4096
+
+END_FLAG = 1 << 63
+_STATE_BITS = MAX_SIZE + 1
+_STATE_MASK = (1 << _STATE_BITS) - 1
+_IDX_MASK = (1 << 10) - 1
+# magic, version, grid size, layout flags
+_HEADER = struct.Struct("<4sBBB")
+_JIGSAW = 1
+_CAGES = 2
+# cage count; then per cage its cell count and total (0 for none)
+_COUNT = struct.Struct("<H")
+_CAGE = struct.Struct("<BH")
+
+
+def encode_checkpoint(board: Board) -> bytes:
+    """
+    Snapshot of the board: header, region of every cell for jigsaw layouts,
+    cages, values, candidates and givens.
+    """
+    geometry = board.geometry
+    num_cells = geometry.num_cells
+    jigsaw = not geometry.is_square()
+    parts = [_HEADER.pack(MAGIC, VERSION, geometry.size, jigsaw * _JIGSAW | bool(geometry.cages) * _CAGES)]
+    if jigsaw:
+        parts.append(bytes(geometry.region_of(idx) for idx in range(num_cells)))
+    if geometry.cages:
+        parts.append(_COUNT.pack(len(geometry.cages)))
+        for cage in geometry.cages:
+            parts.append(_CAGE.pack(len(cage.cells), cage.total or 0))
+            parts.append(struct.pack(f"<{len(cage.cells)}H", *cage.cells))
+    parts.append(bytes(board.values))
+    candidates = array("I", board.candidates)
+    if sys.byteorder == "big":
+        candidates.byteswap()
+    parts.append(candidates.tobytes())
+    parts.append(board.given.to_bytes((num_cells + 7) // 8, "little"))
+    return b"".join(parts)
+
+
+def decode_checkpoint(data) -> tuple:
+    """Returns (board, offset of the first edit word) for a journal's contents."""
+    if len(data) < _HEADER.size:
+        raise ValueError("journal too short")
+    magic, version, size, flags = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a sudoku journal")
+    num_cells = size * size
+    offset = _HEADER.size
+    regions = None
+    if flags & _JIGSAW:
+        region_of = data[offset:offset + num_cells]
+        offset += num_cells
+        regions = [[] for _ in range(size)]
+        for idx, region in enumerate(region_of):
+            regions[region].append(idx)
+    cages = []
+    if flags & _CAGES:
+        (count,) = _COUNT.unpack_from(data, offset)
+        offset += _COUNT.size
+        for _ in range(count):
+            length, total = _CAGE.unpack_from(data, offset)
+            offset += _CAGE.size
+            cages.append(Cage(struct.unpack_from(f"<{length}H", data, offset), total or None))
+            offset += 2 * length
+    geometry = Geometry(size, regions, cages) if regions or cages else square_geometry(size)
+    end = offset + num_cells + 4 * num_cells + (num_cells + 7) // 8
+    if len(data) < end:
+        raise ValueError("journal checkpoint is incomplete")
+    values = data[offset:offset + num_cells]
+    offset += num_cells
+    candidates = array("I")
+    candidates.frombytes(data[offset:offset + 4 * num_cells])
+    if sys.byteorder == "big":
+        candidates.byteswap()
+    offset += 4 * num_cells
+    given = int.from_bytes(data[offset:end], "little")
+    return Board.from_cells(values, candidates, given, geometry), end
+
+
+def recover(path: str):
+    """
+    Returns the board saved in the journal at path, or None if there is none.
+    Raises ValueError if the file is not a journal or its checkpoint is damaged.
+    """
+    try:
+        with open(path, "rb") as stream:
+            data = stream.read()
+    except FileNotFoundError:
+        return None
+    try:
+        return _replay(data)
+    except (struct.error, IndexError, OverflowError) as error:
+        raise ValueError(f"damaged journal: {error}") from None
+
+
+def _replay(data) -> Board:
+    """The board of the checkpoint in data with the complete edits after it applied."""
+    board, offset = decode_checkpoint(data)
+    words = array("Q")
+    words.frombytes(data[offset:offset + (len(data) - offset) // 8 * 8])
+    if sys.byteorder == "big":
+        words.byteswap()
+    # a crash may have cut the last edit short
+    end = len(words)
+    while end and not words[end - 1] & END_FLAG:
+        end -= 1
+    if not end:
+        return board
+    # only the last state of each cell matters
+    del words[end:]
+    final = {word >> _STATE_BITS & _IDX_MASK: word & _STATE_MASK for word in words}
+    values = board.values
+    candidates = board.candidates
+    given = board.given
+    for idx, state in final.items():
+        if state & 1:
+            values[idx] = state >> 2
+            candidates[idx] = 0
+            if state & 2:
+                given |= 1 << idx
+            else:
+                given &= ~(1 << idx)
+        else:
+            values[idx] = 0
+            candidates[idx] = state >> 1
+            given &= ~(1 << idx)
+    board.given = given
+    board.check_conflicts()
+    board.index_candidates()
+    return board
+
+
+def _fsync_directory(directory: str) -> None:
+    """Makes a rename in directory durable, where the platform allows opening directories."""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    descriptor = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+class Journal:
+    """
+    Writer of the journal at path. Call checkpoint with the board first, then
+    append after every edit; flush writes the buffered edits.
+    """
+
+    __slots__ = ("path", "checkpoint_interval", "buffer", "edits", "stream")
+
+    def __init__(self, path: str, checkpoint_interval: int = CHECKPOINT_INTERVAL) -> None:
+        self.path = path
+        self.checkpoint_interval = checkpoint_interval
+        self.buffer = array("Q")
+        # edits since the last checkpoint
+        self.edits = 0
+        self.stream = None
+
+    def checkpoint(self, board: Board) -> None:
+        """Replaces the journal with a snapshot of board, dropping everything before it."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.stream is not None:
+            self.stream.close()
+        temporary = self.path + ".tmp"
+        with open(temporary, "wb") as stream:
+            stream.write(encode_checkpoint(board))
+            # the snapshot must be on disk before it replaces the journal
+            stream.flush()
+            os.fsync(stream.fileno())
+        os.replace(temporary, self.path)
+        _fsync_directory(directory or ".")
+        self.stream = open(self.path, "ab")
+        del self.buffer[:]
+        self.edits = 0
+
+    def append(self, board: Board, cells) -> None:
+        """Records the current state of the cells changed by one edit."""
+        if not cells:
+            return
+        self.edits += 1
+        if self.edits >= self.checkpoint_interval:
+            self.checkpoint(board)
+            return
+        buffer = self.buffer
+        for idx in cells:
+            buffer.append(idx << _STATE_BITS | pack_state(board, idx))
+        buffer[-1] |= END_FLAG
+        if len(buffer) >= BUFFER_WORDS:
+            self.flush()
+
+    def flush(self) -> None:
+        """Hands the buffered edits to the operating system."""
+        if not self.buffer or self.stream is None:
+            return
+        if sys.byteorder == "big":
+            self.buffer.byteswap()
+        self.stream.write(self.buffer.tobytes())
+        self.stream.flush()
+        del self.buffer[:]
+
+    def close(self) -> None:
+        self.flush()
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+
+def benchmark(path: str, count: int = 100_000) -> dict:
+    """Journals count single cell edits on a 9x9 board and times writing and recovering them."""
+    import random
+
+    from codec import parse_board
+
+    rng = random.Random(0)
+    board = parse_board("4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......")
+    free = [idx for idx in range(board.geometry.num_cells) if not board.is_given(idx)]
+    # no checkpoint in between, every edit is replayed
+    journal = Journal(path, checkpoint_interval=count + 1)
+    journal.checkpoint(board)
+    edits = [(rng.choice(free), rng.randint(0, 9)) for _ in range(count)]
+
+    start = time.perf_counter()
+    for idx, digit in edits:
+        if digit:
+            board.set_value(idx, digit)
+        else:
+            board.toggle_candidate(idx, rng.randint(1, 9))
+        journal.append(board, (idx,))
+    journal.close()
+    write_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    recovered = recover(path)
+    recover_time = time.perf_counter() - start
+    if recovered != board:
+        raise RuntimeError("the recovered board differs from the journaled one")
+    return {"bytes": os.path.getsize(path), "write": write_time, "recover": recover_time}
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as directory:
+        result = benchmark(os.path.join(directory, "session.journal"), count)
+    print(f"{count} edits: {result['bytes'] / 1024:.0f} KB, "
+          f"written in {result['write'] * 1000:.0f} ms, recovered in {result['recover'] * 1000:.1f} ms")
@@ -0,0 +1,457 @@
+"""
+Human style logical solving.
+
+Every deduction is returned as a Step so the GUI can show or apply it as a
+hint. Techniques run in TECHNIQUES order, cheapest first, and the first one
+that finds something produces the next step. Each technique's call count,
+hit count and run time are collected in LogicSolver.stats.
+"""
+
+import time
+from itertools import combinations
+
+from board import (
+    ALL_DIGITS,
+    BOX_CELLS,
+    CELL_UNITS,
+    COL_CELLS,
+    MASK_DIGITS,
+    NUM_CELLS,
+    PEERS,
+    ROW_CELLS,
+    SIZE,
+    STANDARD,
+    UNIT_CELLS,
+    Board,
+    box_of,
+    digit_bit,
+)
+from solver import POPCOUNT, parse_givens
+
+PEER_SETS = tuple(frozenset(peers) for peers in PEERS)
+
+
+def cell_name(idx: int) -> str:
+    return f"r{idx // SIZE + 1}c{idx % SIZE + 1}"
+
+
+class Step:
+    """
+    One logical deduction.
+
+    placements is a tuple of (cell, digit), eliminations a tuple of
+    (cell, mask) with the candidates removed from each cell, and cells the
+    cells forming the pattern, for highlighting.
+    """
+
+    __slots__ = ("technique", "placements", "eliminations", "cells")
+
+    def __init__(self, technique: str, placements=(), eliminations=(), cells=()) -> None:
+        self.technique = technique
+        self.placements = tuple(placements)
+        self.eliminations = tuple(eliminations)
+        self.cells = tuple(cells)
+
+    def __str__(self) -> str:
+        parts = [self.technique]
+        if self.cells:
+            parts.append("on " + ", ".join(cell_name(idx) for idx in self.cells))
+        if self.placements:
+            parts.append("places " + ", ".join(f"{cell_name(idx)}={digit}" for idx, digit in self.placements))
+        if self.eliminations:
+            parts.append(
+                "removes "
+                + ", ".join(
+                    f"{''.join(str(d) for d in MASK_DIGITS[mask])} from {cell_name(idx)}"
+                    for idx, mask in self.eliminations
+                )
+            )
+        return " ".join(parts)
+
+    def __repr__(self) -> str:
+        return f"Step({self})"
+
+
+class LogicState:
+    """values holds placed digits (0 if unsolved), cands the candidate masks of unsolved cells."""
+
+    __slots__ = ("values", "cands")
+
+    def __init__(self, values, cands) -> None:
+        self.values = list(values)
+        self.cands = list(cands)
+
+    @classmethod
+    def from_givens(cls, givens) -> "LogicState":
+        """Unsolved cells start with all nine candidates."""
+        values = parse_givens(givens)
+        return cls(values, [0 if digit else ALL_DIGITS for digit in values])
+
+    @classmethod
+    def from_board(cls, board: Board) -> "LogicState":
+        """
+        Uses the board's centermarks, empty cells without centermarks get all
+        nine. Killer cages are ignored, every deduction still holds with them.
+        """
+        if board.geometry.without_cages() != STANDARD:
+            raise ValueError("logical solving needs the standard 9x9 layout")
+        values = list(board.values)
+        cands = [
+            0 if values[idx] else (board.candidates[idx] or ALL_DIGITS)
+            for idx in range(NUM_CELLS)
+        ]
+        return cls(values, cands)
+
+    @property
+    def solved(self) -> bool:
+        return all(self.values)
+
+    def apply(self, step: Step) -> None:
+        for idx, mask in step.eliminations:
+            self.cands[idx] &= ~mask
+        for idx, digit in step.placements:
+            self.values[idx] = digit
+            self.cands[idx] = 0
+
+
+def _placement(technique: str, state: LogicState, idx: int, digit: int, cells=()) -> Step:
+    """A placement step, including the removal of digit from the cell's peers."""
+    bit = digit_bit(digit)
+    cands = state.cands
+    eliminations = [(peer, bit) for peer in PEERS[idx] if cands[peer] & bit]
+    return Step(technique, [(idx, digit)], eliminations, cells or (idx,))
+
+
+def _positions(cands: list, unit, bit: int) -> list:
+    return [idx for idx in unit if cands[idx] & bit]
+
+
+def basic_elimination(state: LogicState):
+    """Removes candidates that are already placed in the cell's row, column or box."""
+    values = state.values
+    cands = state.cands
+    unit_masks = [0] * len(UNIT_CELLS)
+    for idx in range(NUM_CELLS):
+        if values[idx]:
+            bit = digit_bit(values[idx])
+            for unit in CELL_UNITS[idx]:
+                unit_masks[unit] |= bit
+    eliminations = []
+    for idx in range(NUM_CELLS):
+        if cands[idx]:
+            row, col, box = CELL_UNITS[idx]
+            seen = cands[idx] & (unit_masks[row] | unit_masks[col] | unit_masks[box])
+            if seen:
+                eliminations.append((idx, seen))
+    if eliminations:
+        return Step("basic elimination", eliminations=eliminations)
+    return None
+
+
+def naked_single(state: LogicState):
+    cands = state.cands
+    for idx in range(NUM_CELLS):
+        mask = cands[idx]
+        if mask and not mask & (mask - 1):
+            return _placement("naked single", state, idx, MASK_DIGITS[mask][0])
+    return None
+
+
+def hidden_single(state: LogicState):
+    cands = state.cands
+    for unit in UNIT_CELLS:
+        once = twice = 0
+        for idx in unit:
+            twice |= once & cands[idx]
+            once |= cands[idx]
+        hidden = once & ~twice
+        if not hidden:
+            continue
+        for idx in unit:
+            mask = cands[idx] & hidden
+            if mask:
+                digit = MASK_DIGITS[mask][0]
+                return _placement("hidden single", state, idx, digit, unit)
+    return None
+
+
+def _naked_subset(state: LogicState, size: int, technique: str):
+    cands = state.cands
+    for unit in UNIT_CELLS:
+        open_cells = [idx for idx in unit if cands[idx]]
+        if len(open_cells) <= size:
+            continue
+        small = [idx for idx in open_cells if POPCOUNT[cands[idx]] <= size]
+        for subset in combinations(small, size):
+            union = 0
+            for idx in subset:
+                union |= cands[idx]
+            if POPCOUNT[union] != size:
+                continue
+            eliminations = [
+                (idx, cands[idx] & union)
+                for idx in open_cells
+                if idx not in subset and cands[idx] & union
+            ]
+            if eliminations:
+                return Step(technique, eliminations=eliminations, cells=subset)
+    return None
+
+
+def _hidden_subset(state: LogicState, size: int, technique: str):
+    cands = state.cands
+    for unit in UNIT_CELLS:
+        open_cells = [idx for idx in unit if cands[idx]]
+        if len(open_cells) <= size:
+            continue
+        # cell positions of each digit still open in the unit
+        positions = {}
+        for digit in range(1, SIZE + 1):
+            cells = _positions(cands, open_cells, digit_bit(digit))
+            if 2 <= len(cells) <= size:
+                positions[digit] = cells
+        for digits in combinations(positions, size):
+            cells = set()
+            for digit in digits:
+                cells.update(positions[digit])
+            if len(cells) != size:
+                continue
+            keep = 0
+            for digit in digits:
+                keep |= digit_bit(digit)
+            eliminations = [(idx, cands[idx] & ~keep) for idx in sorted(cells) if cands[idx] & ~keep]
+            if eliminations:
+                return Step(technique, eliminations=eliminations, cells=sorted(cells))
+    return None
+
+
+def naked_pair(state: LogicState):
+    return _naked_subset(state, 2, "naked pair")
+
+
+def naked_triple(state: LogicState):
+    return _naked_subset(state, 3, "naked triple")
+
+
+def hidden_pair(state: LogicState):
+    return _hidden_subset(state, 2, "hidden pair")
+
+
+def hidden_triple(state: LogicState):
+    return _hidden_subset(state, 3, "hidden triple")
+
+
+def pointing(state: LogicState):
+    """A digit confined to one row or column inside a box is removed from the rest of that line."""
+    cands = state.cands
+    for box in BOX_CELLS:
+        for digit in range(1, SIZE + 1):
+            bit = digit_bit(digit)
+            cells = _positions(cands, box, bit)
+            if len(cells) < 2:
+                continue
+            for lines, line_of in ((ROW_CELLS, lambda idx: idx // SIZE), (COL_CELLS, lambda idx: idx % SIZE)):
+                line = line_of(cells[0])
+                if any(line_of(idx) != line for idx in cells):
+                    continue
+                eliminations = [
+                    (idx, bit) for idx in lines[line] if idx not in box and cands[idx] & bit
+                ]
+                if eliminations:
+                    return Step("pointing", eliminations=eliminations, cells=cells)
+    return None
+
+
+def claiming(state: LogicState):
+    """A digit confined to one box inside a row or column is removed from the rest of that box."""
+    cands = state.cands
+    for line in ROW_CELLS + COL_CELLS:
+        for digit in range(1, SIZE + 1):
+            bit = digit_bit(digit)
+            cells = _positions(cands, line, bit)
+            if len(cells) < 2:
+                continue
+            box = box_of(cells[0])
+            if any(box_of(idx) != box for idx in cells):
+                continue
+            eliminations = [
+                (idx, bit) for idx in BOX_CELLS[box] if idx not in line and cands[idx] & bit
+            ]
+            if eliminations:
+                return Step("claiming", eliminations=eliminations, cells=cells)
+    return None
+
+
+def _fish(state: LogicState, size: int, technique: str):
+    cands = state.cands
+    orientations = (
+        (ROW_CELLS, COL_CELLS, lambda idx: idx // SIZE, lambda idx: idx % SIZE),
+        (COL_CELLS, ROW_CELLS, lambda idx: idx % SIZE, lambda idx: idx // SIZE),
+    )
+    for base, cover, base_of, cross in orientations:
+        for digit in range(1, SIZE + 1):
+            bit = digit_bit(digit)
+            # for each base line, the mask of cover lines the digit can go in
+            lines = []
+            for number, line in enumerate(base):
+                mask = 0
+                for idx in line:
+                    if cands[idx] & bit:
+                        mask |= 1 << cross(idx)
+                if 2 <= POPCOUNT[mask] <= size:
+                    lines.append((number, mask))
+            for subset in combinations(lines, size):
+                union = 0
+                for _, mask in subset:
+                    union |= mask
+                if POPCOUNT[union] != size:
+                    continue
+                base_numbers = {number for number, _ in subset}
+                eliminations = []
+                pattern = []
+                for cover_number in MASK_DIGITS[union]:
+                    for idx in cover[cover_number - 1]:
+                        if not cands[idx] & bit:
+                            continue
+                        if base_of(idx) in base_numbers:
+                            pattern.append(idx)
+                        else:
+                            eliminations.append((idx, bit))
+                if eliminations:
+                    return Step(technique, eliminations=eliminations, cells=sorted(pattern))
+    return None
+
+
+def x_wing(state: LogicState):
+    return _fish(state, 2, "x-wing")
+
+
+def swordfish(state: LogicState):
+    return _fish(state, 3, "swordfish")
+
+
+def xy_wing(state: LogicState):
+    """
+    A bivalue pivot AB with bivalue pincers AC and BC among its peers: any
+    cell seeing both pincers cannot be C.
+    """
+    cands = state.cands
+    bivalue = [idx for idx in range(NUM_CELLS) if POPCOUNT[cands[idx]] == 2]
+    for pivot in bivalue:
+        pivot_mask = cands[pivot]
+        wings = [
+            idx for idx in bivalue
+            if idx in PEER_SETS[pivot] and POPCOUNT[cands[idx] & pivot_mask] == 1
+        ]
+        for first, second in combinations(wings, 2):
+            first_mask = cands[first]
+            second_mask = cands[second]
+            if first_mask == second_mask or (first_mask | second_mask) & pivot_mask != pivot_mask:
+                continue
+            common = first_mask & second_mask & ~pivot_mask
+            if not common:
+                continue
+            eliminations = [
+                (idx, common)
+                for idx in PEER_SETS[first] & PEER_SETS[second]
+                if idx != pivot and cands[idx] & common
+            ]
+            if eliminations:
+                return Step("xy-wing", eliminations=sorted(eliminations), cells=(pivot, first, second))
+    return None
+
+
+# (name, function) in the order they are tried, roughly easiest first
+TECHNIQUES = (
+    ("basic elimination", basic_elimination),
+    ("naked single", naked_single),
+    ("hidden single", hidden_single),
+    ("pointing", pointing),
+    ("claiming", claiming),
+    ("naked pair", naked_pair),
+    ("hidden pair", hidden_pair),
+    ("naked triple", naked_triple),
+    ("hidden triple", hidden_triple),
+    ("x-wing", x_wing),
+    ("swordfish", swordfish),
+    ("xy-wing", xy_wing),
+)
+
+
+class TechniqueStats:
+    __slots__ = ("calls", "hits", "time")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.hits = 0
+        self.time = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.calls if self.calls else 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f"TechniqueStats(calls={self.calls}, hits={self.hits}, "
+            f"hit_rate={self.hit_rate:.2f}, time={self.time * 1000:.3f}ms)"
+        )
+
+
+class LogicResult:
+    __slots__ = ("state", "steps", "elapsed")
+
+    def __init__(self, state: LogicState, steps: list, elapsed: float) -> None:
+        self.state = state
+        self.steps = steps
+        self.elapsed = elapsed
+
+    @property
+    def solved(self) -> bool:
+        return self.state.solved
+
+    @property
+    def hardest(self):
+        """Index into TECHNIQUES of the hardest technique used, -1 if no step was needed."""
+        names = [name for name, _ in TECHNIQUES]
+        return max((names.index(step.technique) for step in self.steps), default=-1)
+
+
+class LogicSolver:
+    """Runs a technique stack and keeps per-technique profiling stats across calls."""
+
+    def __init__(self, techniques=TECHNIQUES) -> None:
+        self.techniques = techniques
+        self.stats = {name: TechniqueStats() for name, _ in techniques}
+
+    def next_step(self, state: LogicState):
+        """Returns the first step found by the technique stack, or None if it is stuck."""
+        perf_counter = time.perf_counter
+        for name, technique in self.techniques:
+            stats = self.stats[name]
+            start = perf_counter()
+            step = technique(state)
+            stats.time += perf_counter() - start
+            stats.calls += 1
+            if step is not None:
+                stats.hits += 1
+                return step
+        return None
+
+    def solve(self, state: LogicState) -> LogicResult:
+        """Applies steps until the board is solved or no technique applies; modifies state."""
+        start = time.perf_counter()
+        steps = []
+        while not state.solved:
+            step = self.next_step(state)
+            if step is None:
+                break
+            state.apply(step)
+            steps.append(step)
+        return LogicResult(state, steps, time.perf_counter() - start)
+
+    def format_stats(self) -> str:
+        return "\n".join(f"{name:>18}: {stats!r}" for name, stats in self.stats.items())
+
+
+def solve_logically(givens) -> LogicResult:
+    return LogicSolver().solve(LogicState.from_givens(givens))
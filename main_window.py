@@ -0,0 +1,565 @@
+from PySide6.QtWidgets import (
+    QMainWindow, 
+    QWidgetAction, 
+    QMessageBox,
+    QFileDialog,
+    QInputDialog,
+)
+from PySide6.QtGui import QKeySequence
+from PySide6.QtCore import QStandardPaths, Qt, QTimer
+
+from draw_widget import DrawWidget
+from solver import CountResult, count_solutions, solve
+from logic import LogicSolver, LogicState
+from codec import parse_board
+from board import MAX_SIZE, MIN_SIZE, STANDARD, Board, square_geometry
+from sudoku_maker import load_puzzle, save_puzzle
+from workers import TaskRunner
+from profiling import PROFILER
+from puzzle_cache import PuzzleCache
+from journal import Journal, recover
+# dialogs, the puzzle list and the generator are imported when first used,
+# so startup only loads what showing the board needs
+
+import os
+import random
+import sqlite3
+
+CACHE_FILE = "puzzles.sqlite"
+JOURNAL_FILE = "session.journal"
+# the journal is written at least this often, edits in between only live in memory
+JOURNAL_FLUSH_MS = 1000
+
+
+def setting_path(variable: str, location, filename: str):
+    """
+    Path of filename in the standard location, or the path in the environment
+    variable; None when the variable is 0.
+    """
+    setting = os.environ.get(variable, "")
+    if setting == "0":
+        return None
+    return setting or os.path.join(QStandardPaths.writableLocation(location), filename)
+
+
+def open_cache():
+    """
+    Opens the puzzle cache in the user's cache directory, or at the path in
+    SUDOKU_CACHE; SUDOKU_CACHE=0 or a cache that cannot be opened disables it.
+    """
+    path = setting_path("SUDOKU_CACHE", QStandardPaths.CacheLocation, CACHE_FILE)
+    if path is None:
+        return None
+    try:
+        return PuzzleCache(path)
+    except (OSError, sqlite3.Error):
+        return None
+
+
+class MainWindow(QMainWindow):
+    def __init__(self):
+        super().__init__()
+
+        self.setWindowTitle("TESTING!")
+        self.setGeometry(100, 100, 550, 550)
+
+        self.central_widget = DrawWidget(self)
+        self.setCentralWidget(self.central_widget) 
+
+        menu_bar = self.menuBar()
+
+        new_grid_action = QWidgetAction(self)
+        new_grid_action.setText("new grid")
+        new_grid_action.triggered.connect(self.new_grid)
+        menu_bar.addAction(new_grid_action)
+
+        input_given_action = QWidgetAction(self)
+        input_given_action.setText("input givens")
+        input_given_action.triggered.connect(self.input_given)
+        menu_bar.addAction(input_given_action)
+
+        open_json_action = QWidgetAction(self)
+        open_json_action.setText("open json")
+        open_json_action.triggered.connect(self.open_json)
+        menu_bar.addAction(open_json_action)
+
+        save_json_action = QWidgetAction(self)
+        save_json_action.setText("save json")
+        save_json_action.triggered.connect(self.save_json)
+        menu_bar.addAction(save_json_action)
+
+        open_list_action = QWidgetAction(self)
+        open_list_action.setText("open list")
+        open_list_action.triggered.connect(self.open_puzzle_list)
+        menu_bar.addAction(open_list_action)
+
+        save_corpus_action = QWidgetAction(self)
+        save_corpus_action.setText("add to corpus")
+        save_corpus_action.triggered.connect(self.save_corpus)
+        menu_bar.addAction(save_corpus_action)
+
+        output_action = QWidgetAction(self)
+        output_action.setText("output board")
+        output_action.triggered.connect(self.output_board)
+        menu_bar.addAction(output_action)
+
+        auto_clear_centermarks_action = QWidgetAction(self)
+        auto_clear_centermarks_action.setText("auto clear centermarks")
+        auto_clear_centermarks_action.triggered.connect(self.central_widget.auto_clear_centermarks)
+        menu_bar.addAction(auto_clear_centermarks_action)
+
+        add_all_centermarks_action = QWidgetAction(self)
+        add_all_centermarks_action.setText("add all centermarks")
+        add_all_centermarks_action.triggered.connect(self.central_widget.add_all_centermarks)
+        menu_bar.addAction(add_all_centermarks_action)
+
+        highlight_digit_action = QWidgetAction(self)
+        highlight_digit_action.setText("highlight digit")
+        highlight_digit_action.setCheckable(True)
+        highlight_digit_action.toggled.connect(self.central_widget.setHighlightDigit)
+        menu_bar.addAction(highlight_digit_action)
+
+        solve_action = QWidgetAction(self)
+        solve_action.setText("solve")
+        solve_action.triggered.connect(self.solve_board)
+        menu_bar.addAction(solve_action)
+
+        self.logic_solver = LogicSolver()
+        hint_action = QWidgetAction(self)
+        hint_action.setText("hint")
+        hint_action.triggered.connect(self.hint)
+        menu_bar.addAction(hint_action)
+
+        generate_action = QWidgetAction(self)
+        generate_action.setText("generate")
+        generate_action.triggered.connect(self.generate_puzzle)
+        menu_bar.addAction(generate_action)
+
+        next_solution_action = QWidgetAction(self)
+        next_solution_action.setText("next solution")
+        next_solution_action.triggered.connect(self.next_solution)
+        menu_bar.addAction(next_solution_action)
+        # (puzzle, cursor, board shown) of the last solution shown by next solution
+        self.enumeration = None
+
+        count_action = QWidgetAction(self)
+        count_action.setText("count solutions")
+        count_action.triggered.connect(self.count_board)
+        menu_bar.addAction(count_action)
+
+        profile_action = QWidgetAction(self)
+        profile_action.setText("profiling")
+        profile_action.setCheckable(True)
+        profile_action.setChecked(PROFILER.enabled)
+        profile_action.toggled.connect(self.toggle_profiling)
+        menu_bar.addAction(profile_action)
+
+        # searches run on a thread pool, the window keeps painting meanwhile
+        self.tasks = TaskRunner(self)
+        self.cache = open_cache()
+        # only enabled while a search runs, so Escape otherwise still deselects the cell
+        self.cancel_action = QWidgetAction(self)
+        self.cancel_action.setText("cancel")
+        self.cancel_action.setShortcut(QKeySequence(Qt.Key_Escape))
+        self.cancel_action.setEnabled(False)
+        self.cancel_action.triggered.connect(self.cancel_task)
+        menu_bar.addAction(self.cancel_action)
+        self.tasks.running_changed.connect(self.cancel_action.setEnabled)
+
+        self.journal = None
+        self.open_journal()
+
+        # created when the first puzzle file is opened
+        self.puzzle_list = None
+        # row of the puzzle list the board was loaded from
+        self.puzzle_row = None
+        self.central_widget.edited.connect(self.check_list_puzzle_solved)
+
+
+    def open_journal(self) -> None:
+        """
+        Restores the board of the last session from the autosave journal in
+        the user's data directory (or at SUDOKU_JOURNAL, 0 disables it) and
+        starts journaling every edit.
+        """
+        path = setting_path("SUDOKU_JOURNAL", QStandardPaths.AppDataLocation, JOURNAL_FILE)
+        if path is None:
+            return
+        try:
+            board = recover(path)
+        except (OSError, ValueError) as error:
+            board = None
+            self.statusBar().showMessage(f"could not restore the last session: {error}")
+        if board is not None:
+            self.central_widget.update_data(board)
+            # the restored board is the starting point, not an edit to undo
+            self.central_widget.history.clear()
+        try:
+            self.journal = Journal(path)
+            self.journal.checkpoint(self.central_widget.data)
+        except OSError as error:
+            self.journal = None
+            self.statusBar().showMessage(f"autosave disabled: {error}")
+            return
+        self.central_widget.edited.connect(self.journal_edit)
+        self.central_widget.replaced.connect(self.journal_checkpoint)
+        self.journal_timer = QTimer(self)
+        self.journal_timer.setInterval(JOURNAL_FLUSH_MS)
+        self.journal_timer.timeout.connect(self.journal_flush)
+        self.journal_timer.start()
+
+    def journal_edit(self, cells) -> None:
+        if self.journal is None:
+            return
+        try:
+            self.journal.append(self.central_widget.data, cells)
+        except OSError as error:
+            self.disable_journal(error)
+
+    def journal_checkpoint(self) -> None:
+        if self.journal is None:
+            return
+        try:
+            self.journal.checkpoint(self.central_widget.data)
+        except OSError as error:
+            self.disable_journal(error)
+
+    def journal_flush(self) -> None:
+        if self.journal is None:
+            return
+        try:
+            self.journal.flush()
+        except OSError as error:
+            self.disable_journal(error)
+
+    def disable_journal(self, error: OSError) -> None:
+        """Stops autosaving after the journal could not be written, the board itself is unaffected."""
+        self.journal_timer.stop()
+        journal, self.journal = self.journal, None
+        if journal.stream is not None:
+            try:
+                journal.stream.close()
+            except OSError:
+                pass
+        self.statusBar().showMessage(f"autosave disabled: {error}")
+
+    def new_grid(self) -> None:
+        size, ok = QInputDialog.getInt(
+            self, "New grid", f"Grid size ({MIN_SIZE} to {MAX_SIZE}):", self.central_widget.data.geometry.size, MIN_SIZE, MAX_SIZE
+        )
+        if not ok:
+            return
+        try:
+            geometry = square_geometry(size)
+        except ValueError as error:
+            QMessageBox.information(self, "Invalid Size", str(error))
+            return
+        self.recieve_data(Board(geometry))
+
+    def input_given(self) -> None:
+        from input_output_dialogs import InputDialog
+
+        dialog = InputDialog(self)
+        dialog.exec()
+    
+    def recieve_data(self, data, highlighted=()):
+        self.puzzle_row = None
+        self.central_widget.update_data(data)
+        self.central_widget.highlight_cells(highlighted)
+
+    def start_task(self, verb: str, function, board, on_finished, standard_only: bool = True) -> None:
+        """
+        Runs function(board copy) in the background. The result is only
+        applied if the board was not edited in the meantime. Unless
+        standard_only is cleared, boards of other layouts are refused.
+        """
+        if standard_only and board.geometry.without_cages() != STANDARD:
+            QMessageBox.information(self, "Not Supported", "The solvers only handle the standard 9x9 layout")
+            return
+        snapshot = board.copy()
+
+        def finished(result) -> None:
+            if self.cache is not None:
+                self.cache.flush()
+            if self.central_widget.data != snapshot:
+                self.statusBar().showMessage(f"the board changed while {verb}, result discarded")
+                return
+            on_finished(snapshot, result)
+
+        def progress(nodes: int, elapsed: float) -> None:
+            self.statusBar().showMessage(f"{verb}... {nodes} nodes, {elapsed:.1f} s (Esc to cancel)")
+
+        def failed(error: str) -> None:
+            QMessageBox.warning(self, "Error", f"{verb} failed:\n{error}")
+
+        self.statusBar().showMessage(f"{verb}... (Esc to cancel)")
+        self.tasks.start(function, snapshot.copy(), on_finished=finished, on_progress=progress, on_failed=failed)
+
+    def cancel_task(self) -> None:
+        if self.tasks.cancel():
+            self.statusBar().showMessage("cancelled")
+
+    def solve_board(self) -> None:
+        function = solve if self.cache is None else self.cache.solve
+        self.start_task("solving", function, self.central_widget.data, self.apply_solution)
+
+    def apply_solution(self, board, result) -> None:
+        if not result.solved:
+            QMessageBox.information(self, "No Solution", "The current board has no solution")
+            return
+        solved = board.copy()
+        for cell, digit in enumerate(result.solution):
+            if not solved.values[cell]:
+                solved.set_value(cell, digit)
+        self.central_widget.update_data(solved)
+        self.statusBar().showMessage(
+            f"solved in {result.elapsed * 1000:.2f} ms, "
+            f"{result.nodes} nodes, {result.backtracks} backtracks"
+        )
+
+    def count_board(self) -> None:
+        function = count_solutions if self.cache is None else self.cache.count
+        self.start_task("counting", function, self.central_widget.data, self.show_count)
+
+    def show_count(self, board, result) -> None:
+        self.central_widget.highlight_cells(result.differing_cells())
+        self.statusBar().showMessage(
+            f"{result.status}, {result.nodes} nodes in {result.elapsed * 1000:.0f} ms"
+            + (", the highlighted cells differ between two solutions" if result.count > 1 else "")
+        )
+
+    def next_solution(self) -> None:
+        """
+        Shows a solution of the board; repeated on the solution it showed, it
+        shows the puzzle's next one. The position is kept as a cursor, so each
+        step starts a fresh enumerator that resumes where the last one stopped.
+        """
+        from enumerator import SolutionEnumerator
+
+        board = self.central_widget.data
+        if self.enumeration is not None and self.enumeration[2] == board:
+            puzzle, cursor, _ = self.enumeration
+        else:
+            puzzle, cursor = board.copy(), None
+
+        def walk(snapshot, progress=None):
+            enumerator = SolutionEnumerator(puzzle, cursor, progress)
+            return enumerator, next(enumerator, None)
+
+        self.start_task(
+            "enumerating", walk, board, lambda snapshot, result: self.show_next_solution(puzzle, *result)
+        )
+
+    def show_next_solution(self, puzzle, enumerator, solution) -> None:
+        if solution is None:
+            self.enumeration = None
+            self.statusBar().showMessage(
+                f"no more solutions, {enumerator.count} in all" if enumerator.count else "no solution"
+            )
+            return
+        solved = puzzle.copy()
+        for cell, digit in enumerate(solution):
+            if not solved.values[cell]:
+                solved.set_value(cell, digit)
+        self.central_widget.update_data(solved)
+        self.enumeration = (puzzle, enumerator.cursor(), solved.copy())
+        self.statusBar().showMessage(f"solution {enumerator.count}, {enumerator.nodes} nodes")
+
+    def hint(self) -> None:
+        self.start_task("finding a hint", self.next_step, self.central_widget.data, self.apply_hint)
+
+    def next_step(self, board, progress=None):
+        """Returns (state, step) for the board; the logical techniques do not report progress."""
+        state = LogicState.from_board(board)
+        return state, self.logic_solver.next_step(state)
+
+    def apply_hint(self, board, result) -> None:
+        state, step = result
+        if step is None:
+            self.central_widget.highlight_cells(())
+            self.statusBar().showMessage("no logical step found")
+            return
+        state.apply(step)
+        hinted = board.copy()
+        for cell, _ in step.eliminations:
+            if not hinted.values[cell]:
+                hinted.set_candidates(cell, state.cands[cell])
+        for cell, digit in step.placements:
+            hinted.set_value(cell, digit)
+        self.central_widget.update_data(hinted)
+        self.central_widget.highlight_cells(step.cells)
+        self.statusBar().showMessage(str(step))
+
+    def generate_puzzle(self) -> None:
+        from generator import generate_attempt
+
+        seed = random.getrandbits(64)
+
+        def generate(snapshot, progress=None):
+            # the generator cannot be interrupted, a cancelled puzzle is dropped once it is done
+            return generate_attempt("rotational", seed)
+
+        self.start_task(
+            "generating", generate, self.central_widget.data, self.show_generated_puzzle, standard_only=False
+        )
+
+    def show_generated_puzzle(self, board, result) -> None:
+        puzzle, band, elapsed = result
+        self.recieve_data(parse_board(puzzle))
+        self.statusBar().showMessage(f"generated {band} puzzle in {elapsed * 1000:.0f} ms")
+
+    def show_validation(self, board, validation: CountResult) -> None:
+        """Highlights the cells that differ between two solutions and reports a puzzle that is not unique."""
+        self.central_widget.highlight_cells(validation.differing_cells())
+        if validation.status == "unique":
+            self.statusBar().showMessage("the puzzle has a unique solution")
+            return
+        self.statusBar().clearMessage()
+        QMessageBox.information(self, "Validation", self.validation_message(validation))
+
+    def validation_message(self, validation: CountResult) -> str:
+        if validation.status == "no solution":
+            return "The puzzle has no solution"
+        if validation.status == "multiple":
+            first, second = ("".join(map(str, solution)) for solution in validation.solutions[:2])
+            return (
+                "The puzzle has multiple solutions, for example:\n"
+                f"{first}\n{second}\n"
+                "The cells that differ are highlighted"
+            )
+        return (
+            f"Gave up checking the puzzle after {validation.nodes} nodes "
+            f"({validation.elapsed * 1000:.0f} ms), it may not have a unique solution"
+        )
+
+    def open_json(self) -> None:
+        path, _ = QFileDialog.getOpenFileName(self, "Open Sudoku Maker puzzle", "", "JSON files (*.json)")
+        if not path:
+            return
+        try:
+            board = load_puzzle(path)
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            QMessageBox.information(self, "Invalid File", f"Could not read {path}: {error}")
+            return
+        self.recieve_data(board)
+
+    def open_puzzle_list(self) -> None:
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Open puzzle list", "", "Puzzle files (*.txt *.sudc);;All files (*)"
+        )
+        if not path:
+            return
+        if self.puzzle_list is None:
+            from puzzle_list import PuzzleListDock
+
+            self.puzzle_list = PuzzleListDock(self)
+            self.puzzle_list.puzzle_selected.connect(self.load_list_puzzle)
+            self.addDockWidget(Qt.LeftDockWidgetArea, self.puzzle_list)
+        try:
+            self.puzzle_list.open_file(path)
+        except (OSError, ValueError) as error:
+            QMessageBox.information(self, "Invalid File", f"Could not read {path}: {error}")
+            return
+        self.puzzle_list.show()
+
+    def load_list_puzzle(self, row: int, board) -> None:
+        if board is None:
+            self.statusBar().showMessage(f"line {row + 1} holds no valid board")
+            return
+        self.recieve_data(board)
+        self.puzzle_row = row
+        self.check_list_puzzle_solved()
+
+    def check_list_puzzle_solved(self, cells=()) -> None:
+        """Marks the list row of the board as solved once it is filled in without conflicts."""
+        board = self.central_widget.data
+        if self.puzzle_row is not None and not board.conflicts and all(board.values):
+            from puzzle_list import SOLVED
+
+            self.puzzle_list.set_status(self.puzzle_row, SOLVED)
+
+    def save_json(self) -> None:
+        path, _ = QFileDialog.getSaveFileName(self, "Save Sudoku Maker puzzle", "", "JSON files (*.json)")
+        if path:
+            save_puzzle(self.central_widget.data, path)
+
+    def save_corpus(self) -> None:
+        """Appends the board to a packed puzzle corpus, creating one with a candidates plane if needed."""
+        from corpus import CANDIDATES, HEADER_SIZE, MAX_CORPUS_SIZE, CorpusWriter, read_header
+
+        board = self.central_widget.data
+        size = board.geometry.size
+        # checked before the file is created, a refused board leaves no empty corpus behind
+        if size > MAX_CORPUS_SIZE or board.geometry != square_geometry(size):
+            QMessageBox.information(
+                self, "Not Saved",
+                f"A puzzle corpus holds grids up to {MAX_CORPUS_SIZE}x{MAX_CORPUS_SIZE} with regular boxes only",
+            )
+            return
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Add to puzzle corpus", "", "Puzzle corpus (*.sudc)", options=QFileDialog.DontConfirmOverwrite
+        )
+        if not path:
+            return
+        try:
+            if os.path.exists(path):
+                with open(path, "rb") as stream:
+                    _, planes, _, _ = read_header(stream.read(HEADER_SIZE))
+                given = board.given
+                if not planes & CANDIDATES and any(
+                    (value and not given >> idx & 1) or mask
+                    for idx, (value, mask) in enumerate(zip(board.values, board.candidates))
+                ):
+                    answer = QMessageBox.question(
+                        self, "Add to puzzle corpus",
+                        f"{path} only stores givens, the other placed digits and the centermarks "
+                        "of the board would be left out. Add the givens anyway?",
+                    )
+                    if answer != QMessageBox.Yes:
+                        return
+            with CorpusWriter(path, size, CANDIDATES, append=True) as writer:
+                writer.write(board)
+        except (OSError, ValueError) as error:
+            QMessageBox.information(self, "Not Saved", f"Could not add the board to {path}: {error}")
+            return
+        self.statusBar().showMessage(f"added as puzzle {writer.count} of {path}")
+
+    def output_board(self) -> None:
+        from input_output_dialogs import OutputDialog
+
+        dialog = OutputDialog(self, self.central_widget.data)
+        dialog.exec()
+
+    def toggle_profiling(self, enabled: bool) -> None:
+        """Starts a fresh profile, or stops it and writes the Chrome trace."""
+        if enabled:
+            PROFILER.reset()
+            self.central_widget.setProfiling(True)
+            return
+        self.central_widget.setProfiling(False)
+        self.write_trace()
+
+    def write_trace(self) -> None:
+        try:
+            path = PROFILER.dump()
+        except OSError as error:
+            QMessageBox.information(self, "Profiling", f"Could not write the trace: {error}")
+            return
+        self.statusBar().showMessage(f"trace of {len(PROFILER.events)} events written to {path}")
+
+    def closeEvent(self, event) -> None:
+        self.tasks.cancel()
+        self.tasks.wait()
+        if self.cache is not None:
+            self.cache.close()
+        if self.journal is not None:
+            try:
+                self.journal.close()
+            except OSError:
+                # the window closes either way, the journal keeps what reached the disk
+                pass
+        if self.puzzle_list is not None:
+            self.puzzle_list.close_file()
+        if PROFILER.enabled:
+            PROFILER.dump()
+        super().closeEvent(event)
@@ -0,0 +1,140 @@
+"""
+Lightweight instrumentation of the GUI hot paths.
+
+Functions decorated with traced(name) are timed while PROFILER is enabled;
+when it is disabled the wrapper only checks one flag. Every call is kept as
+a Chrome trace_event "complete" event, so dump() writes a file that
+chrome://tracing or https://ui.perfetto.dev can open, and the totals of the
+last frame feed the overlay drawn by DrawWidget.
+
+Set SUDOKU_PROFILE=1 to start with profiling enabled, or
+SUDOKU_PROFILE=path.json to also choose where the trace is written.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+DEFAULT_TRACE_PATH = "sudoku_trace.json"
+MAX_EVENTS = 200_000
+# name of the span from a key press to the end of the next paint
+INPUT_TO_PAINT = "input to paint"
+
+
+class Profiler:
+    __slots__ = (
+        "enabled", "trace_path", "events", "stage_totals", "last_frame", "frames", "frame_times",
+        "input_start", "input_latency",
+    )
+
+    def __init__(self, trace_path: str = DEFAULT_TRACE_PATH) -> None:
+        self.enabled = False
+        self.trace_path = trace_path
+        # (name, start ns, end ns, thread id), oldest dropped first
+        self.events = deque(maxlen=MAX_EVENTS)
+        # name -> [total ns, calls] of the frame being painted
+        self.stage_totals = {}
+        self.last_frame = {}
+        self.frames = 0
+        self.frame_times = deque(maxlen=60)
+        self.input_start = None
+        self.input_latency = None
+
+    def record(self, name: str, start: int, end: int) -> None:
+        self.events.append((name, start, end, threading.get_ident()))
+        totals = self.stage_totals.get(name)
+        if totals is None:
+            self.stage_totals[name] = [end - start, 1]
+        else:
+            totals[0] += end - start
+            totals[1] += 1
+
+    def mark_input(self) -> None:
+        """Remembers the first unpainted input so end_frame can record the input to paint latency."""
+        if self.input_start is None:
+            self.input_start = time.perf_counter_ns()
+
+    def end_frame(self, start: int, end: int) -> None:
+        if self.input_start is not None:
+            self.record(INPUT_TO_PAINT, self.input_start, end)
+            self.input_latency = end - self.input_start
+            self.input_start = None
+        self.last_frame = self.stage_totals
+        self.stage_totals = {}
+        self.frames += 1
+        self.frame_times.append(end - start)
+
+    def reset(self) -> None:
+        self.events.clear()
+        self.stage_totals = {}
+        self.last_frame = {}
+        self.frames = 0
+        self.frame_times.clear()
+        self.input_start = None
+        self.input_latency = None
+
+    def summary(self) -> list:
+        """Overlay lines: frame time, repaint count, input latency and the last frame's stages."""
+        lines = []
+        if self.frame_times:
+            last = self.frame_times[-1] / 1e6
+            average = sum(self.frame_times) / len(self.frame_times) / 1e6
+            lines.append(f"frame {last:.2f} ms (avg {average:.2f} ms)")
+        lines.append(f"repaints {self.frames}")
+        if self.input_latency is not None:
+            lines.append(f"{INPUT_TO_PAINT} {self.input_latency / 1e6:.2f} ms")
+        for name, (total, calls) in sorted(self.last_frame.items(), key=lambda item: -item[1][0]):
+            if name != INPUT_TO_PAINT:
+                lines.append(f"{name} {total / 1e6:.2f} ms x{calls}")
+        return lines
+
+    def trace_events(self) -> list:
+        pid = os.getpid()
+        return [
+            {"name": name, "ph": "X", "ts": start / 1e3, "dur": (end - start) / 1e3, "pid": pid, "tid": tid}
+            for name, start, end, tid in self.events
+        ]
+
+    def dump(self, path=None) -> str:
+        """Writes the recorded events as Chrome trace_event JSON; returns the path."""
+        path = path or self.trace_path
+        with open(path, "w") as stream:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, stream)
+        return path
+
+
+PROFILER = Profiler()
+
+_setting = os.environ.get("SUDOKU_PROFILE", "")
+if _setting and _setting != "0":
+    PROFILER.enabled = True
+    if _setting != "1":
+        PROFILER.trace_path = _setting
+
+
+def traced(name: str, frame: bool = False):
+    """
+    Decorator timing every call while PROFILER is enabled. With frame the
+    call is treated as one painted frame and closes the per frame totals.
+    """
+
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                end = time.perf_counter_ns()
+                PROFILER.record(name, start, end)
+                if frame:
+                    PROFILER.end_frame(start, end)
+
+        return wrapper
+
+    return decorate
@@ -0,0 +1,209 @@
+"""
+Persistent cache of solved puzzles.
+
+Entries live in a SQLite file and are keyed by the canonical form of the
+puzzle (see canonical.py), so a puzzle that is a relabeled, permuted or
+transposed copy of one seen before is a hit too. Every entry holds what was
+computed for the puzzle so far: the solution (in canonical digits), the
+solution count of count_solutions(limit=2) and the difficulty band; missing
+fields are computed and filled in on demand. The least recently used entries
+are dropped once the file holds more than max_entries puzzles.
+
+The connection may be used from several threads (the GUI solves on a thread
+pool) and several processes may share the file (batch workers).
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from board import NUM_CELLS
+from canonical import canonicalize
+from solver import CountResult, SolveResult, count_solutions, parse_givens, solve
+
+DEFAULT_MAX_ENTRIES = 1_000_000
+# writes between two commits
+COMMIT_INTERVAL = 256
+
+_TO_ASCII = bytes.maketrans(bytes(range(10)), b"0123456789")
+_FROM_ASCII = bytes.maketrans(b"0123456789", bytes(range(10)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS puzzles (
+    key TEXT PRIMARY KEY,
+    solution TEXT,
+    count INTEGER,
+    band TEXT,
+    used INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS puzzles_used ON puzzles (used);
+"""
+
+
+class PuzzleCache:
+    """
+    SQLite backed LRU cache from canonical puzzles to their solution, solution
+    count and difficulty band. solve, count and rate look the puzzle up first
+    and only run the solver on a miss. hits and misses count the lookups.
+    """
+
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._pending = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._entries = self._db.execute("SELECT count(*) FROM puzzles").fetchone()[0]
+
+    def __enter__(self) -> "PuzzleCache":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT count(*) FROM puzzles").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._commit()
+            self._db.close()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._commit()
+
+    def _commit(self) -> None:
+        self._db.commit()
+        self._pending = 0
+        if self._entries > self.max_entries:
+            # other processes may have added entries too, count them before trimming
+            self._entries = self._db.execute("SELECT count(*) FROM puzzles").fetchone()[0]
+            excess = self._entries - self.max_entries
+            if excess > 0:
+                self._db.execute(
+                    "DELETE FROM puzzles WHERE key IN (SELECT key FROM puzzles ORDER BY used LIMIT ?)", (excess,)
+                )
+                self._db.commit()
+                self._entries -= excess
+
+    def _lookup(self, key: str):
+        """Returns (solution, count, band) of the entry and marks it used, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT solution, count, band FROM puzzles WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._db.execute("UPDATE puzzles SET used = ? WHERE key = ?", (time.time_ns(), key))
+                self._written()
+            return row
+
+    def _store(self, key: str, **fields) -> None:
+        """Inserts the entry or fills in the given fields of the existing one."""
+        columns = ", ".join(fields)
+        updates = ", ".join(f"{name} = excluded.{name}" for name in fields)
+        with self._lock:
+            self._db.execute(
+                f"INSERT INTO puzzles (key, {columns}, used) VALUES (?, {', '.join('?' * len(fields))}, ?) "
+                f"ON CONFLICT (key) DO UPDATE SET {updates}, used = excluded.used",
+                (key, *fields.values(), time.time_ns()),
+            )
+            # an upper bound, updates are counted too; _commit counts before trimming
+            self._entries += 1
+            self._written()
+
+    def _written(self) -> None:
+        self._pending += 1
+        if self._pending >= COMMIT_INTERVAL:
+            self._commit()
+
+    def _count(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def solve(self, givens, progress=None) -> SolveResult:
+        """solver.solve with the cache in front; a hit reports no nodes."""
+        start = time.perf_counter()
+        # givens itself goes on, a Board may carry killer cages its digits do not
+        canonical = canonicalize(givens)
+        if canonical is None:
+            return solve(givens, progress)
+        key, transform = canonical
+        entry = self._lookup(key)
+        if entry is not None and (entry[0] is not None or entry[1] == 0):
+            self._count(True)
+            solution = bytearray(transform.from_canonical(_digits(entry[0]))) if entry[0] else None
+            return SolveResult(solution, 0, 0, time.perf_counter() - start)
+        self._count(False)
+        result = solve(givens, progress)
+        if not result.cancelled:
+            if result.solved:
+                self._store(key, solution=_text(transform.to_canonical(result.solution)))
+            else:
+                self._store(key, count=0)
+        return result
+
+    def count(self, givens, progress=None) -> CountResult:
+        """
+        solver.count_solutions(limit=2) with the cache in front. Hits carry
+        the solution when the puzzle has exactly one, but not the two
+        differing solutions of a puzzle with several, so those are counted
+        again.
+        """
+        start = time.perf_counter()
+        canonical = canonicalize(givens)
+        if canonical is None:
+            return count_solutions(givens, progress=progress)
+        key, transform = canonical
+        entry = self._lookup(key)
+        if entry is not None and entry[1] is not None and entry[1] < 2:
+            self._count(True)
+            solutions = [bytearray(transform.from_canonical(_digits(entry[0])))] if entry[1] else []
+            return CountResult(solutions, 0, False, time.perf_counter() - start)
+        self._count(False)
+        result = count_solutions(givens, progress=progress)
+        if not result.gave_up and not result.cancelled:
+            fields = {"count": result.count}
+            if result.count:
+                fields["solution"] = _text(transform.to_canonical(result.solutions[0]))
+            self._store(key, **fields)
+        return result
+
+    def rate(self, givens) -> str:
+        """generator.grade with the cache in front."""
+        # only rating needs the generator and the logical solver, which are slower to import
+        from generator import grade
+
+        digits = parse_givens(givens)
+        canonical = canonicalize(digits)
+        if canonical is None:
+            return grade(digits)
+        key, _ = canonical
+        entry = self._lookup(key)
+        if entry is not None and entry[2] is not None:
+            self._count(True)
+            return entry[2]
+        self._count(False)
+        band = grade(digits)
+        self._store(key, band=band)
+        return band
+
+
+def _text(digits) -> str:
+    return bytes(digits).translate(_TO_ASCII).decode()
+
+
+def _digits(text: str) -> bytes:
+    if len(text) != NUM_CELLS:
+        raise ValueError(f"corrupt cache entry of {len(text)} digits")
+    return text.encode().translate(_FROM_ASCII)
@@ -0,0 +1,139 @@
+"""
+Random access to the lines of large puzzle files.
+
+A PuzzleFile memory maps a text file of one puzzle per line (81 or 162
+character boards, or the symbol format of other grid sizes) and reads a
+line only when it is asked for, so opening a file of millions of puzzles
+parses none of them.
+
+Files written by batch solving or generation have lines of one length, so
+opening one only checks that every line really has the first line's length,
+with C level passes over the file, and computes the line offsets from it.
+Files with lines of different lengths have the offsets of their lines
+scanned once into a compact array.
+"""
+
+import mmap
+import sys
+import time
+from array import array
+from itertools import accumulate, count
+from operator import add
+
+from codec import decode_bytes
+
+# bytes read at a time when checking or indexing the lines
+SCAN_CHUNK = 1 << 22
+
+
+class PuzzleFile:
+    """
+    The lines of the puzzle file at path, without their line endings.
+    len() is the number of lines, file[row] returns a line as bytes and
+    board(row) decodes it.
+    """
+
+    __slots__ = ("path", "stream", "data", "stride", "count", "starts")
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.stream = open(path, "rb")
+        size = self.stream.seek(0, 2)
+        # mapping an empty file fails, an empty bytes object reads the same
+        self.data = mmap.mmap(self.stream.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        # line length including its newline when all lines have the same length, else starts holds the offsets
+        self.stride = None
+        self.starts = None
+        first = self.data.find(b"\n")
+        stride = first + 1 if first >= 0 else size + 1
+        lines = -(-size // stride)
+        if lines * stride in (size, size + 1) and self._uniform(stride, lines):
+            self.stride = stride
+            self.count = lines
+        else:
+            self._scan()
+
+    def __enter__(self) -> "PuzzleFile":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.stream.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, row: int) -> bytes:
+        if not 0 <= row < self.count:
+            raise IndexError(f"line {row} out of range")
+        if self.stride is not None:
+            start = row * self.stride
+            return self.data[start:start + self.stride - 1].rstrip(b"\r")
+        return self.data[self.starts[row]:self.starts[row + 1] - 1].rstrip(b"\r")
+
+    def board(self, row: int):
+        """Decodes the line; raises ValueError when it holds no valid board."""
+        return decode_bytes(self[row].strip())
+
+    def _uniform(self, stride: int, lines: int) -> bool:
+        """True if the file holds lines lines of stride bytes, the last one possibly without its newline."""
+        size = len(self.data)
+        complete = size // stride
+        newlines = 0
+        # read rather than mapped, so checking does not keep the whole file resident; whole
+        # lines per chunk, so a newline ends every line of every chunk and there are no others
+        self.stream.seek(0)
+        chunk_size = max(SCAN_CHUNK // stride, 1) * stride
+        while chunk := self.stream.read(chunk_size):
+            if chunk[stride - 1::stride].count(b"\n") != len(chunk) // stride:
+                return False
+            newlines += chunk.count(b"\n")
+        return newlines == complete and (complete == lines or self.data[size - 1] != 10)
+
+    def _scan(self) -> None:
+        """Indexes the start of every line, and the end of the last one."""
+        size = len(self.data)
+        starts = array("I" if size < 1 << 32 else "Q", [0])
+        position = 0
+        tail = b""
+        self.stream.seek(0)
+        while block := self.stream.read(SCAN_CHUNK):
+            block = tail + block
+            end = block.rfind(b"\n")
+            if end < 0:
+                tail = block
+                continue
+            # the start after every whole line of the block: its end plus one for each newline so far
+            lengths = map(len, block[:end].split(b"\n"))
+            starts.extend(map(add, accumulate(lengths), count(position + 1)))
+            position += end + 1
+            tail = block[end + 1:]
+        if tail:
+            # a last line without a newline ends at size + 1 like the others
+            starts.append(size + 1)
+        self.starts = starts
+        self.count = len(starts) - 1
+
+
+def benchmark(path: str) -> dict:
+    """Times opening the file and reading and decoding every thousandth line."""
+    start = time.perf_counter()
+    puzzles = PuzzleFile(path)
+    open_time = time.perf_counter() - start
+    rows = range(0, len(puzzles), 1000)
+    start = time.perf_counter()
+    for row in rows:
+        puzzles.board(row)
+    read_time = time.perf_counter() - start
+    puzzles.close()
+    return {"lines": len(puzzles), "open": open_time, "read": read_time / max(len(rows), 1)}
+
+
+if __name__ == "__main__":
+    result = benchmark(sys.argv[1] if len(sys.argv) > 1 else "benchmarks/puzzles.txt")
+    print(f"{result['lines']} lines: opened in {result['open'] * 1000:.2f} ms, "
+          f"{result['read'] * 1e6:.1f} us per decoded line")
@@ -0,0 +1,246 @@
+"""
+Dockable list of the puzzles in a puzzle file.
+
+PuzzleListModel serves the rows of a PuzzleFile, or of a Corpus for packed
+binary files, to a single column
+QTableView without ever materializing them: a row is read from the memory mapped file and decoded
+only when the view paints it, and the delegate keeps the thumbnails of the
+recently painted rows. The only per row state is one status byte, so a file
+of a million puzzles costs about a megabyte on top of the line index.
+QListView is not used because its layout queries the model once per row,
+which takes seconds for a million rows; the table's fixed row height needs
+no per row work.
+"""
+
+import os
+
+from PySide6.QtWidgets import (
+    QAbstractItemView,
+    QDockWidget,
+    QHeaderView,
+    QStyle,
+    QStyledItemDelegate,
+    QTableView,
+)
+from PySide6.QtGui import (
+    QColor,
+    QFont,
+    QPainter,
+    QPen,
+    QPixmap,
+)
+from PySide6.QtCore import (
+    QAbstractListModel,
+    QModelIndex,
+    QRect,
+    QRectF,
+    QSize,
+    Qt,
+    Signal,
+)
+
+from board import Board
+from corpus import open_puzzles
+
+# row status
+UNSOLVED = 0
+SOLVED = 1
+INVALID = 2
+STATUS_TEXT = ("unsolved", "solved", "invalid line")
+STATUS_COLORS = (QColor(110, 110, 110), QColor(30, 140, 50), QColor(200, 40, 40))
+STATUS_ROLE = Qt.UserRole
+
+THUMBNAIL_SIZE = 72
+ROW_PADDING = 4
+# rendered thumbnails kept, a screenful of rows needs a few dozen
+THUMBNAIL_CACHE_SIZE = 512
+
+
+class PuzzleListModel(QAbstractListModel):
+    """The puzzles of a PuzzleFile or Corpus as rows, with a solved / unsolved status per row."""
+
+    def __init__(self, puzzles, parent=None) -> None:
+        super().__init__(parent)
+        self.puzzles = puzzles
+        self.status = bytearray(len(puzzles))
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.puzzles)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        if role == Qt.DisplayRole:
+            return f"#{row + 1}"
+        if role == Qt.ToolTipRole:
+            return self.puzzles[row].decode("ascii", "replace")
+        if role == STATUS_ROLE:
+            return self.status[row]
+        return None
+
+    def board(self, row: int):
+        """The decoded puzzle of the row, None (and the row marked invalid) if the line holds none."""
+        try:
+            return self.puzzles.board(row)
+        except ValueError:
+            self.set_status(row, INVALID)
+            return None
+
+    def set_status(self, row: int, status: int) -> None:
+        if self.status[row] != status:
+            self.status[row] = status
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [STATUS_ROLE])
+
+    def close(self) -> None:
+        self.puzzles.close()
+
+
+def render_thumbnail(board: Board, side: int, ratio: float) -> QPixmap:
+    """Draws a side x side pixel miniature of the board's placed digits and regions."""
+    pixmap = QPixmap(QSize(side, side) * ratio)
+    pixmap.setDevicePixelRatio(ratio)
+    pixmap.fill(Qt.white)
+    painter = QPainter(pixmap)
+    geometry = board.geometry
+    size = geometry.size
+    step = (side - 1) / size
+
+    painter.setPen(QPen(QColor(190, 190, 190), 1))
+    for k in range(1, size):
+        painter.drawLine(round(k * step), 0, round(k * step), side)
+        painter.drawLine(0, round(k * step), side, round(k * step))
+    painter.setPen(QPen(Qt.black, 1))
+    painter.drawRect(0, 0, side - 1, side - 1)
+    for idx in range(geometry.num_cells):
+        x = idx % size
+        y = idx // size
+        region = geometry.region_of(idx)
+        if x + 1 < size and geometry.region_of(idx + 1) != region:
+            painter.drawLine(round((x + 1) * step), round(y * step), round((x + 1) * step), round((y + 1) * step))
+        if y + 1 < size and geometry.region_of(idx + size) != region:
+            painter.drawLine(round(x * step), round((y + 1) * step), round((x + 1) * step), round((y + 1) * step))
+
+    font = QFont()
+    font.setFamily("Arial")
+    font.setPixelSize(max(int(step * 0.8), 1))
+    painter.setFont(font)
+    # digits over 9 would not fit the tiny cells, they are shown as dots
+    dot = max(step / 3, 1)
+    for idx, value in enumerate(board.values):
+        if not value:
+            continue
+        painter.setPen(Qt.black if board.is_given(idx) else Qt.blue)
+        rect = QRect(round(idx % size * step), round(idx // size * step), round(step), round(step))
+        if size <= 9:
+            painter.drawText(rect, Qt.AlignCenter, str(value))
+        else:
+            center = rect.center()
+            painter.fillRect(QRectF(center.x() - dot / 2, center.y() - dot / 2, dot, dot), painter.pen().color())
+    painter.end()
+    return pixmap
+
+
+class PuzzleThumbnailDelegate(QStyledItemDelegate):
+    """Paints a row as the puzzle's thumbnail next to its number and status."""
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        # row -> thumbnail of the current model
+        self.thumbnails = {}
+
+    def clear(self) -> None:
+        self.thumbnails = {}
+
+    def sizeHint(self, option, index) -> QSize:
+        return QSize(THUMBNAIL_SIZE + 120, THUMBNAIL_SIZE + 2 * ROW_PADDING)
+
+    def thumbnail(self, model: PuzzleListModel, row: int, ratio: float):
+        thumbnail = self.thumbnails.get(row)
+        if thumbnail is None:
+            board = model.board(row)
+            if board is None:
+                return None
+            if len(self.thumbnails) >= THUMBNAIL_CACHE_SIZE:
+                self.thumbnails = {}
+            thumbnail = render_thumbnail(board, THUMBNAIL_SIZE, ratio)
+            self.thumbnails[row] = thumbnail
+        return thumbnail
+
+    def paint(self, painter: QPainter, option, index) -> None:
+        rect = option.rect
+        selected = option.state & QStyle.State_Selected
+        if selected:
+            painter.fillRect(rect, option.palette.highlight())
+        model = index.model()
+        row = index.row()
+        ratio = option.widget.devicePixelRatioF() if option.widget is not None else 1.0
+        thumbnail = self.thumbnail(model, row, ratio)
+        if thumbnail is not None:
+            painter.drawPixmap(rect.left() + ROW_PADDING, rect.top() + ROW_PADDING, thumbnail)
+
+        text_rect = rect.adjusted(THUMBNAIL_SIZE + 3 * ROW_PADDING, ROW_PADDING, -ROW_PADDING, -ROW_PADDING)
+        painter.setPen(option.palette.highlightedText().color() if selected else option.palette.text().color())
+        painter.drawText(text_rect, Qt.AlignLeft | Qt.AlignTop, index.data(Qt.DisplayRole))
+        status = model.status[row]
+        painter.setPen(option.palette.highlightedText().color() if selected else STATUS_COLORS[status])
+        painter.drawText(text_rect, Qt.AlignLeft | Qt.AlignBottom, STATUS_TEXT[status])
+
+
+class PuzzleListDock(QDockWidget):
+    """Dock listing the puzzles of a file; selecting a row emits puzzle_selected."""
+
+    # row and board of the selected puzzle, None for a line holding no board
+    puzzle_selected = Signal(int, object)
+
+    def __init__(self, parent=None) -> None:
+        super().__init__("Puzzles", parent)
+        self.setObjectName("puzzle_list")
+        self.model = None
+        self.delegate = PuzzleThumbnailDelegate(self)
+        self.view = QTableView(self)
+        self.view.horizontalHeader().hide()
+        self.view.horizontalHeader().setStretchLastSection(True)
+        # every row has the same height, so the view never measures the rows
+        rows = self.view.verticalHeader()
+        rows.hide()
+        rows.setSectionResizeMode(QHeaderView.Fixed)
+        rows.setDefaultSectionSize(THUMBNAIL_SIZE + 2 * ROW_PADDING)
+        self.view.setShowGrid(False)
+        self.view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.view.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.view.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.view.setItemDelegate(self.delegate)
+        self.setWidget(self.view)
+
+    def open_file(self, path: str) -> None:
+        """
+        Shows the puzzles of the text or corpus file at path instead of the
+        current ones; raises OSError, or ValueError for a corrupt corpus.
+        """
+        model = PuzzleListModel(open_puzzles(path), self)
+        previous = self.model
+        self.model = model
+        self.delegate.clear()
+        self.view.setModel(model)
+        self.view.selectionModel().currentRowChanged.connect(self.select)
+        if previous is not None:
+            previous.close()
+            previous.deleteLater()
+        self.setWindowTitle(f"Puzzles - {os.path.basename(path)} ({len(model.puzzles)})")
+
+    def select(self, current, previous) -> None:
+        if current.isValid():
+            self.puzzle_selected.emit(current.row(), self.model.board(current.row()))
+
+    def set_status(self, row: int, status: int) -> None:
+        if self.model is not None:
+            self.model.set_status(row, status)
+
+    def close_file(self) -> None:
+        if self.model is not None:
+            self.view.setModel(None)
+            self.model.close()
+            self.model.deleteLater()
+            self.model = None
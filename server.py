@@ -0,0 +1,449 @@
+"""
+Local solve service. Does not import PySide6.
+
+    python -m sudokuSolver serve --port 8765 --jobs 4
+    python -m sudokuSolver serve --socket /tmp/sudoku.sock
+
+Clients send one request per line over localhost TCP or a Unix socket and
+get one line back per request, in request order, so requests can be
+pipelined. A line holding a puzzle in a format of the input dialog is
+solved and answered like a line of batch solving: the solution, "no
+solution" or "invalid input". A JSON object selects the operation:
+
+    {"id": 7, "op": "solve", "puzzle": "..."}       -> {"id": 7, "solution": "..."}
+    {"id": 8, "op": "count", "puzzle": "...", "limit": 2}
+                                                    -> {"id": 8, "count": 1, "status": "unique"}
+    {"id": 9, "op": "candidates", "puzzle": "..."}  -> {"id": 9, "candidates": [mask per cell]}
+    {"op": "stats"}                                 -> counters, latency percentiles, throughput
+
+A count's limit is at most MAX_COUNT_LIMIT, and the search stops at the
+node and time caps of solver.validate, answering "gave up" with the count
+so far, so no request can hold on to a worker.
+
+Failed requests are answered with {"error": "..."} and the id. Requests of
+all connections are collected for up to --batch-delay and handed to a
+process pool in batches of up to --batch-size, so many small requests cost
+one inter-process round trip per batch instead of one each. The pool is
+started and warmed up before the service accepts connections.
+
+    python -m sudokuSolver load --port 8765 --connections 8 --requests 20000 puzzles.txt
+
+runs a load generator against a running service and prints the client side
+throughput and latency percentiles together with the service's stats.
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import signal
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from batch import INVALID_INPUT, NO_SOLUTION
+from codec import parse_board
+from enumerator import count_subtree
+from puzzle_cache import DEFAULT_MAX_ENTRIES, PuzzleCache
+from solver import VALIDATION_MAX_NODES, VALIDATION_TIME_LIMIT, count_solutions, solve
+
+OPERATIONS = ("solve", "count", "candidates")
+DEFAULT_PORT = 8765
+# most requests per batch and longest wait for a batch to fill, in seconds
+BATCH_SIZE = 64
+BATCH_DELAY = 0.002
+# latencies of the most recent requests kept for the percentiles
+LATENCY_WINDOW = 10_000
+# unanswered requests per connection before the service stops reading from it
+MAX_PIPELINE = 1024
+# highest limit of a count request; counts are capped like solver.validate as well
+MAX_COUNT_LIMIT = 1000
+
+# puzzle cache of a worker process, see _init_worker
+_cache = None
+
+
+def _init_worker(cache_path, cache_size: int) -> None:
+    global _cache
+    if cache_path is not None:
+        _cache = PuzzleCache(cache_path, cache_size)
+
+
+def _warm_up() -> int:
+    return os.getpid()
+
+
+class _Budget:
+    """
+    progress callback stopping a search after solver.validate's node or time
+    cap; exceeded tells whether it did.
+    """
+
+    __slots__ = ("deadline", "exceeded")
+
+    def __init__(self) -> None:
+        self.deadline = time.perf_counter() + VALIDATION_TIME_LIMIT
+        self.exceeded = False
+
+    def __call__(self, nodes: int) -> bool:
+        self.exceeded = nodes > VALIDATION_MAX_NODES or time.perf_counter() > self.deadline
+        return self.exceeded
+
+
+def _count_status(count: int, gave_up: bool) -> str:
+    """The status of solver.CountResult for a count that may have been capped."""
+    if count > 1:
+        return "multiple"
+    if gave_up:
+        return "gave up"
+    return "unique" if count == 1 else "no solution"
+
+
+def answer(op: str, puzzle: str, limit: int = 2) -> dict:
+    """Runs one request; returns the response without its id."""
+    try:
+        board = parse_board(puzzle)
+    except ValueError as error:
+        return {"error": f"{INVALID_INPUT}: {error}"}
+    try:
+        if op == "solve":
+            result = solve(board) if _cache is None else _cache.solve(board)
+            return {"solution": str(result)} if result.solved else {"status": NO_SOLUTION}
+        if op == "count":
+            if limit > 2:
+                # the solutions are only counted, not kept
+                budget = _Budget()
+                count, _ = count_subtree(board, limit=limit, progress=budget)
+                gave_up = budget.exceeded
+            else:
+                if limit == 2 and _cache is not None:
+                    result = _cache.count(board, progress=_Budget())
+                else:
+                    result = count_solutions(board, limit, VALIDATION_MAX_NODES, VALIDATION_TIME_LIMIT)
+                count, gave_up = result.count, result.gave_up or result.cancelled
+            return {"count": count, "status": _count_status(count, gave_up)}
+        board.update_candidates(fill=True)
+        return {"candidates": list(board.candidates)}
+    except ValueError as error:
+        # e.g. the solver only handles the standard 9x9 layout
+        return {"error": str(error)}
+
+
+def answer_batch(requests: list) -> list:
+    """Answers a batch of (op, puzzle, limit) requests in a worker process."""
+    responses = [answer(*request) for request in requests]
+    if _cache is not None:
+        _cache.flush()
+    return responses
+
+
+class Request:
+    __slots__ = ("op", "puzzle", "limit", "start", "future")
+
+    def __init__(self, op: str, puzzle: str, limit: int, future) -> None:
+        self.op = op
+        self.puzzle = puzzle
+        self.limit = limit
+        self.start = time.perf_counter()
+        self.future = future
+
+
+class Stats:
+    """
+    Counters of the service. requests, errors, throughput and the latencies
+    of the last LATENCY_WINDOW requests only cover requests handed to the
+    pool; rejected requests and stats probes are counted on their own.
+    """
+
+    __slots__ = ("started", "requests", "errors", "rejected", "probes", "batches", "batched", "latencies")
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.probes = 0
+        self.batches = 0
+        self.batched = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def report(self) -> dict:
+        uptime = time.perf_counter() - self.started
+        latencies = sorted(self.latencies)
+        return {
+            "uptime": uptime,
+            "requests": self.requests,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "probes": self.probes,
+            "batches": self.batches,
+            "mean_batch": self.batched / self.batches if self.batches else 0.0,
+            "throughput": self.requests / uptime if uptime else 0.0,
+            "p50_ms": percentile(latencies, 0.5) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+        }
+
+
+def percentile(ordered: list, fraction: float) -> float:
+    """The value below which fraction of the sorted values lie, 0 for none."""
+    if not ordered:
+        return 0.0
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+class SolveService:
+    """
+    Collects the requests of all connections into batches for the worker
+    pool. At most jobs batches are in flight, so under load the waiting
+    requests form larger batches instead of queueing in the pool.
+    """
+
+    def __init__(self, pool: ProcessPoolExecutor, jobs: int, batch_size: int = BATCH_SIZE,
+                 batch_delay: float = BATCH_DELAY) -> None:
+        self.pool = pool
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.stats = Stats()
+        self.queue = asyncio.Queue()
+        self.slots = asyncio.Semaphore(jobs)
+        self.batcher = None
+        # the event loop only keeps weak references to tasks
+        self.dispatching = set()
+
+    def start(self) -> None:
+        self.batcher = asyncio.create_task(self.collect())
+
+    def submit(self, op: str, puzzle: str, limit: int = 2):
+        """Queues a request; returns the future of its response."""
+        self.stats.requests += 1
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait(Request(op, puzzle, limit, future))
+        return future
+
+    async def collect(self) -> None:
+        queue = self.queue
+        while True:
+            batch = [await queue.get()]
+            if queue.qsize() < self.batch_size - 1:
+                # a lone request waits briefly for company
+                await asyncio.sleep(self.batch_delay)
+            await self.slots.acquire()
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            task = asyncio.create_task(self.dispatch(batch))
+            self.dispatching.add(task)
+            task.add_done_callback(self.dispatching.discard)
+
+    async def dispatch(self, batch: list) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            requests = [(request.op, request.puzzle, request.limit) for request in batch]
+            try:
+                responses = await loop.run_in_executor(self.pool, answer_batch, requests)
+            except Exception as error:
+                responses = [{"error": f"worker failed: {error}"}] * len(batch)
+        finally:
+            self.slots.release()
+        stats = self.stats
+        stats.batches += 1
+        stats.batched += len(batch)
+        end = time.perf_counter()
+        for request, response in zip(batch, responses):
+            stats.latencies.append(end - request.start)
+            if "error" in response:
+                stats.errors += 1
+            if not request.future.done():
+                request.future.set_result(response)
+
+    def request(self, line: bytes):
+        """Parses a request line; returns (future of the response, formatter of the response line)."""
+        text = line.strip().decode("ascii", "replace")
+        if not text.startswith("{"):
+            return self.submit("solve", text), _plain_line
+        request_id = None
+        try:
+            message = json.loads(text)
+            if not isinstance(message, dict):
+                raise ValueError("a request must be a JSON object")
+            request_id = message.get("id")
+            op = message.get("op", "solve")
+            if op == "stats":
+                self.stats.probes += 1
+                return _done(self.stats.report()), _json_line(request_id)
+            if op not in OPERATIONS:
+                raise ValueError(f"unknown op {op!r}, expected one of {', '.join(OPERATIONS + ('stats',))}")
+            puzzle = message["puzzle"]
+            limit = int(message.get("limit", 2))
+            if not isinstance(puzzle, str) or not 1 <= limit <= MAX_COUNT_LIMIT:
+                raise ValueError(f"puzzle must be a string and limit from 1 to {MAX_COUNT_LIMIT}")
+        except (ValueError, KeyError, TypeError) as error:
+            self.stats.rejected += 1
+            return _done({"error": f"missing {error}" if isinstance(error, KeyError) else str(error)}), _json_line(request_id)
+        return self.submit(op, puzzle, limit), _json_line(request_id)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serves one connection: reads requests while answering the earlier ones in order."""
+        pending = asyncio.Queue(MAX_PIPELINE)
+
+        async def send() -> None:
+            while True:
+                item = await pending.get()
+                if item is None:
+                    return
+                future, line = item
+                writer.write(line(await future))
+                if pending.empty():
+                    await writer.drain()
+
+        sender = asyncio.create_task(send())
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    await pending.put(self.request(line))
+            await pending.put(None)
+            await sender
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            sender.cancel()
+        finally:
+            writer.close()
+
+
+def _done(response: dict):
+    future = asyncio.get_running_loop().create_future()
+    future.set_result(response)
+    return future
+
+
+def _plain_line(response: dict) -> bytes:
+    if "solution" in response:
+        return response["solution"].encode() + b"\n"
+    if "status" in response:
+        return response["status"].encode() + b"\n"
+    return INVALID_INPUT.encode() + b"\n"
+
+
+def _json_line(request_id):
+    def line(response: dict) -> bytes:
+        if request_id is not None:
+            response = {"id": request_id, **response}
+        return json.dumps(response, separators=(",", ":")).encode() + b"\n"
+    return line
+
+
+async def serve(host: str, port: int, socket_path, jobs: int, batch_size: int, batch_delay: float,
+                cache_path=None, cache_size: int = DEFAULT_MAX_ENTRIES) -> None:
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(cache_path, cache_size)) as pool:
+        # start every worker before the first request instead of during it
+        await asyncio.gather(*(loop.run_in_executor(pool, _warm_up) for _ in range(jobs)))
+        service = SolveService(pool, jobs, batch_size, batch_delay)
+        service.start()
+        if socket_path is not None:
+            server = await asyncio.start_unix_server(service.handle, socket_path)
+            where = socket_path
+        else:
+            server = await asyncio.start_server(service.handle, host, port)
+            where = f"{host}:{server.sockets[0].getsockname()[1]}"
+        print(f"serving on {where} with {jobs} workers", file=sys.stderr)
+        # a terminated service shuts down like an interrupted one, removing its socket
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(signal.SIGTERM, server.close)
+        try:
+            async with server:
+                with contextlib.suppress(asyncio.CancelledError):
+                    await server.serve_forever()
+        finally:
+            if socket_path is not None and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+
+def run_serve(args) -> int:
+    try:
+        asyncio.run(serve(
+            args.host, args.port, args.socket, args.jobs, args.batch_size, args.batch_delay / 1000,
+            args.cache, args.cache_size,
+        ))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+async def _open(args):
+    if args.socket is not None:
+        return await asyncio.open_unix_connection(args.socket)
+    return await asyncio.open_connection(args.host, args.port)
+
+
+async def load(args, puzzles: list) -> dict:
+    """
+    Sends args.requests requests over args.connections connections, each
+    keeping up to args.window requests in flight; returns the client side
+    throughput and latency percentiles and the service's stats.
+    """
+    latencies = []
+    op = args.op
+
+    async def connection(count: int, offset: int) -> None:
+        reader, writer = await _open(args)
+        # send times of the unanswered requests, answers come back in order
+        sent = deque()
+        window = asyncio.Semaphore(args.window)
+
+        async def receive() -> None:
+            for _ in range(count):
+                if not await reader.readline():
+                    raise ConnectionError("the service closed the connection")
+                latencies.append(time.perf_counter() - sent.popleft())
+                window.release()
+
+        receiver = asyncio.create_task(receive())
+        for k in range(count):
+            await window.acquire()
+            puzzle = puzzles[(offset + k) % len(puzzles)]
+            line = puzzle if op == "plain" else json.dumps({"id": k, "op": op, "puzzle": puzzle})
+            sent.append(time.perf_counter())
+            writer.write(line.encode() + b"\n")
+            await writer.drain()
+        await receiver
+        writer.close()
+
+    start = time.perf_counter()
+    share, extra = divmod(args.requests, args.connections)
+    await asyncio.gather(*(
+        connection(share + (k < extra), k * share) for k in range(args.connections)
+    ))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await _open(args)
+    writer.write(b'{"op":"stats"}\n')
+    stats = json.loads(await reader.readline())
+    writer.close()
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "service": stats,
+    }
+
+
+def run_load(args) -> int:
+    with open(args.input) as stream:
+        puzzles = [line.strip() for line in stream if line.strip()]
+    if not puzzles:
+        print("no puzzles in the input", file=sys.stderr)
+        return 1
+    result = asyncio.run(load(args, puzzles))
+    service = result["service"]
+    print(
+        f"{result['requests']} requests in {result['elapsed']:.3f} s ({result['throughput']:.0f} requests/sec), "
+        f"latency p50 {result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms\n"
+        f"  service: {service['requests']} requests, {service['errors']} errors, "
+        f"{service['rejected']} rejected, {service['probes']} stats probes, "
+        f"{service['batches']} batches of {service['mean_batch']:.1f} on average, "
+        f"p50 {service['p50_ms']:.2f} ms, p99 {service['p99_ms']:.2f} ms"
+    )
+    return 0
@@ -0,0 +1,354 @@
+import time
+from functools import lru_cache
+
+from board import ALL_DIGITS, Board, Geometry, MASK_DIGITS, NUM_CELLS, PEERS, STANDARD, UNIT_CELLS
+from cages import cage_table
+
+# number of set bits of each 9 bit candidate mask
+POPCOUNT = tuple(len(digits) for digits in MASK_DIGITS)
+# digit of a single bit mask, indexed by the mask
+BIT_DIGIT = {1 << d: d + 1 for d in range(9)}
+# caps for validate so pathological input never blocks the caller
+VALIDATION_TIME_LIMIT = 0.25
+VALIDATION_MAX_NODES = 20000
+# nodes between two calls of a search's progress callback, a power of two
+PROGRESS_INTERVAL = 256
+
+
+class SolveResult:
+    """
+    Outcome of a solve.
+
+    solution is a bytearray of the 81 digits, or None when the puzzle has no
+    solution or the search was cancelled. nodes counts the guesses made by the
+    search and backtracks the guesses that led to a contradiction.
+    """
+
+    __slots__ = ("solution", "nodes", "backtracks", "elapsed", "cancelled")
+
+    def __init__(self, solution, nodes: int, backtracks: int, elapsed: float, cancelled: bool = False) -> None:
+        self.solution = solution
+        self.nodes = nodes
+        self.backtracks = backtracks
+        self.elapsed = elapsed
+        self.cancelled = cancelled
+
+    @property
+    def solved(self) -> bool:
+        return self.solution is not None
+
+    def __str__(self) -> str:
+        return "".join(str(d) for d in self.solution) if self.solution is not None else ""
+
+    def __repr__(self) -> str:
+        return (
+            f"SolveResult(solved={self.solved}, nodes={self.nodes}, "
+            f"backtracks={self.backtracks}, elapsed={self.elapsed * 1000:.3f}ms)"
+        )
+
+
+def parse_givens(givens) -> list:
+    """
+    Converts givens into a list of 81 digits with 0 for blanks.
+
+    givens may be a standard 9x9 Board, also one with killer cages (all placed
+    digits are used), an 81 character string using 0, *, _ or . for blanks, or
+    any sequence of 81 ints.
+    """
+    if isinstance(givens, Board):
+        if givens.geometry.without_cages() != STANDARD:
+            raise ValueError("the solver needs the standard 9x9 layout")
+        return list(givens.values)
+    if isinstance(givens, str):
+        if len(givens) != NUM_CELLS:
+            raise ValueError(f"expected {NUM_CELLS} characters, got {len(givens)}")
+        return [int(char) if char in "123456789" else 0 for char in givens]
+    digits = list(givens)
+    if len(digits) != NUM_CELLS:
+        raise ValueError(f"expected {NUM_CELLS} cells, got {len(digits)}")
+    return digits
+
+
+class Killer:
+    """
+    Killer cage rules of a 9x9 puzzle for propagate: peers holds each cell's
+    peers including its cage mates and sums the (cells, total) of every cage
+    with a total.
+    """
+
+    __slots__ = ("peers", "sums")
+
+    def __init__(self, geometry: Geometry) -> None:
+        self.peers = geometry.peers
+        self.sums = tuple((cage.cells, cage.total) for cage in geometry.cages if cage.total is not None)
+
+    def prune(self, cands: list, queue: list) -> bool:
+        """
+        Reduces the free cells of every cage to the digits of the combinations
+        that can still complete its total, queueing cells that became single
+        valued. Returns False on a contradiction.
+        """
+        for cells, total in self.sums:
+            placed = placed_sum = available = free = 0
+            for idx in cells:
+                mask = cands[idx]
+                if mask & (mask - 1):
+                    available |= mask
+                    free += 1
+                else:
+                    placed |= mask
+                    placed_sum += BIT_DIGIT[mask]
+            if not free:
+                if placed_sum != total:
+                    return False
+                continue
+            if placed_sum >= total:
+                return False
+            allowed = cage_table(free, total - placed_sum)[available & ~placed]
+            if not allowed:
+                return False
+            for idx in cells:
+                mask = cands[idx]
+                if mask & (mask - 1) and mask & ~allowed:
+                    mask &= allowed
+                    if not mask:
+                        return False
+                    cands[idx] = mask
+                    if not mask & (mask - 1):
+                        queue.append(idx)
+        return True
+
+
+@lru_cache(maxsize=16)
+def _killer(geometry: Geometry) -> Killer:
+    return Killer(geometry)
+
+
+def killer_rules(givens):
+    """The Killer rules of a Board with cages, None for anything else."""
+    if isinstance(givens, Board) and givens.geometry.cages:
+        return _killer(givens.geometry)
+    return None
+
+
+def initial_candidates(digits: list, killer=None):
+    """
+    Returns the propagated candidate masks for the digits, or None if the
+    givens already contradict each other.
+    """
+    cands = [ALL_DIGITS] * NUM_CELLS
+    queue = []
+    for idx, digit in enumerate(digits):
+        if digit:
+            cands[idx] = 1 << (digit - 1)
+            queue.append(idx)
+    if not propagate(cands, queue, killer):
+        return None
+    return cands
+
+
+def propagate(cands: list, queue: list, killer=None) -> bool:
+    """
+    Runs naked and hidden single propagation on cands in place, plus cage
+    pruning for a killer puzzle.
+
+    queue holds the cells that became single valued and still have to be
+    removed from their peers. Returns False on a contradiction.
+    """
+    peers = PEERS if killer is None else killer.peers
+    while True:
+        while queue:
+            idx = queue.pop()
+            bit = cands[idx]
+            for peer in peers[idx]:
+                mask = cands[peer]
+                if mask & bit:
+                    mask ^= bit
+                    if not mask:
+                        return False
+                    cands[peer] = mask
+                    if not mask & (mask - 1):
+                        queue.append(peer)
+
+        for unit in UNIT_CELLS:
+            once = twice = 0
+            for idx in unit:
+                mask = cands[idx]
+                twice |= once & mask
+                once |= mask
+            if once != ALL_DIGITS:
+                return False
+            hidden = once & ~twice
+            if not hidden:
+                continue
+            for idx in unit:
+                mask = cands[idx] & hidden
+                if mask and cands[idx] & (cands[idx] - 1):
+                    if mask & (mask - 1):
+                        return False  # two digits can only go in this one cell
+                    cands[idx] = mask
+                    queue.append(idx)
+        if killer is not None and not queue and not killer.prune(cands, queue):
+            return False
+        if not queue:
+            return True
+
+
+def select_cell(cands: list) -> int:
+    """Returns the unsolved cell with the fewest candidates, or -1 if all are solved."""
+    best = -1
+    best_count = 10
+    for idx in range(NUM_CELLS):
+        count = POPCOUNT[cands[idx]]
+        if 1 < count < best_count:
+            best = idx
+            best_count = count
+            if count == 2:
+                break
+    return best
+
+
+class _Search:
+    """
+    Depth first search collecting up to limit solutions. The search gives up
+    once max_nodes guesses were made or the deadline (a perf_counter time)
+    has passed. progress, when given, is called with the node count every
+    PROGRESS_INTERVAL nodes and cancels the search by returning True.
+    """
+
+    __slots__ = (
+        "nodes", "backtracks", "limit", "max_nodes", "deadline", "progress", "killer", "solutions", "gave_up",
+        "cancelled",
+    )
+
+    def __init__(self, limit: int = 1, max_nodes=None, deadline=None, progress=None, killer=None) -> None:
+        self.nodes = 0
+        self.backtracks = 0
+        self.limit = limit
+        self.max_nodes = max_nodes
+        self.deadline = deadline
+        self.progress = progress
+        self.killer = killer
+        self.solutions = []
+        self.gave_up = False
+        self.cancelled = False
+
+    def run(self, cands: list) -> bool:
+        """Searches below cands; returns True once the search should stop."""
+        idx = select_cell(cands)
+        if idx < 0:
+            self.solutions.append(bytearray(BIT_DIGIT[mask] for mask in cands))
+            return len(self.solutions) >= self.limit
+        for digit in MASK_DIGITS[cands[idx]]:
+            self.nodes += 1
+            if self._over_budget():
+                self.gave_up = True
+                return True
+            branch = cands[:]
+            branch[idx] = 1 << (digit - 1)
+            if propagate(branch, [idx], self.killer):
+                if self.run(branch):
+                    return True
+            else:
+                self.backtracks += 1
+        return False
+
+    def _over_budget(self) -> bool:
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            return True
+        # checking the clock is comparatively slow, only do it every 64 nodes
+        if self.nodes & 63:
+            return False
+        if self.progress is not None and not self.nodes & (PROGRESS_INTERVAL - 1) and self.progress(self.nodes):
+            self.cancelled = True
+            return True
+        return self.deadline is not None and time.perf_counter() > self.deadline
+
+
+def solve(givens, progress=None) -> SolveResult:
+    """
+    Solves the puzzle with constraint propagation and a most-constrained-cell
+    depth first search. See parse_givens for the accepted inputs and _Search
+    for progress.
+    """
+    start = time.perf_counter()
+    digits = parse_givens(givens)
+    killer = killer_rules(givens)
+    search = _Search(progress=progress, killer=killer)
+    cands = initial_candidates(digits, killer)
+    if cands is not None:
+        search.run(cands)
+    solution = search.solutions[0] if search.solutions else None
+    return SolveResult(solution, search.nodes, search.backtracks, time.perf_counter() - start, search.cancelled)
+
+
+class CountResult:
+    """
+    Outcome of count_solutions. count is the number of solutions found (at
+    most the limit), solutions holds them, and gave_up is set when the node or
+    time cap was hit or the search was cancelled before the count was
+    conclusive.
+    """
+
+    __slots__ = ("count", "solutions", "nodes", "gave_up", "elapsed", "cancelled")
+
+    def __init__(self, solutions: list, nodes: int, gave_up: bool, elapsed: float, cancelled: bool = False) -> None:
+        self.count = len(solutions)
+        self.solutions = solutions
+        self.nodes = nodes
+        self.gave_up = gave_up
+        self.elapsed = elapsed
+        self.cancelled = cancelled
+
+    @property
+    def status(self) -> str:
+        """One of "no solution", "unique", "multiple", "gave up" or "cancelled"."""
+        if self.count > 1:
+            return "multiple"
+        if self.cancelled:
+            return "cancelled"
+        if self.gave_up:
+            return "gave up"
+        return "unique" if self.count == 1 else "no solution"
+
+    def differing_cells(self) -> list:
+        """Cell indices where the first two solutions differ."""
+        if self.count < 2:
+            return []
+        first, second = self.solutions[:2]
+        return [idx for idx in range(NUM_CELLS) if first[idx] != second[idx]]
+
+    def __repr__(self) -> str:
+        return (
+            f"CountResult(status={self.status!r}, count={self.count}, nodes={self.nodes}, "
+            f"elapsed={self.elapsed * 1000:.3f}ms)"
+        )
+
+
+def count_solutions(givens, limit: int = 2, max_nodes=None, time_limit=None, progress=None) -> CountResult:
+    """
+    Counts the solutions of the puzzle, stopping as soon as limit solutions
+    were found. max_nodes and time_limit (in seconds) cap the search; when
+    either is exceeded the result reports gave_up. See _Search for progress.
+    """
+    start = time.perf_counter()
+    digits = parse_givens(givens)
+    deadline = start + time_limit if time_limit is not None else None
+    killer = killer_rules(givens)
+    search = _Search(limit, max_nodes, deadline, progress, killer)
+    cands = initial_candidates(digits, killer)
+    if cands is not None:
+        search.run(cands)
+    return CountResult(
+        search.solutions, search.nodes, search.gave_up, time.perf_counter() - start, search.cancelled
+    )
+
+
+def validate(givens, progress=None) -> CountResult:
+    """
+    count_solutions(limit=2) capped by VALIDATION_MAX_NODES and
+    VALIDATION_TIME_LIMIT, quick enough to check every imported puzzle.
+    """
+    return count_solutions(
+        givens, limit=2, max_nodes=VALIDATION_MAX_NODES, time_limit=VALIDATION_TIME_LIMIT, progress=progress
+    )
@@ -0,0 +1,274 @@
+"""
+Import and export of Sudoku Maker JSON puzzles (see test.json).
+
+A file may hold a single puzzle object, a JSON array of puzzle objects or
+one puzzle object per line. iter_puzzles streams through any of these with a
+bounded read buffer, so collections far larger than memory can be read.
+Note that Sudoku Maker spells the key "centremarks" where the Board and the
+GUI speak of centermarks. The grid size follows the cells array and the
+regions list, so other sizes and jigsaw layouts load as well. Killer cages
+are objects with the [row, column] pairs of their "cells" and their total as
+"value", which may be missing for cages without a sum.
+"""
+
+import json
+import sys
+import time
+from functools import lru_cache
+
+from board import Board, Geometry, mask_digits, square_geometry
+from cages import Cage
+
+SOURCE = "SudokuSolver"
+CELL_SIZE = 50
+CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = " \t\r\n"
+# characters that can continue a number
+_NUMBER_CHARS = "0123456789.eE+-"
+
+
+def puzzle_geometry(size: int, regions, cages=()) -> Geometry:
+    """The Geometry of a size x size puzzle with Sudoku Maker regions and cages lists, which may be empty."""
+    if not regions and not cages:
+        return square_geometry(size)
+    regions = tuple(tuple(row * size + col for row, col in region) for region in regions) if regions else None
+    return _region_geometry(size, regions, tuple(_cage(size, cage) for cage in cages or ()))
+
+
+def _cage(size: int, cage: dict) -> Cage:
+    total = cage.get("value")
+    return Cage(
+        (row * size + col for row, col in cage["cells"]), int(total) if total not in (None, "") else None
+    )
+
+
+@lru_cache(maxsize=64)
+def _region_geometry(size: int, regions, cages: tuple = ()) -> Geometry:
+    geometry = Geometry(size, regions, cages)
+    try:
+        square = square_geometry(size)
+    except ValueError:
+        return geometry
+    # share the regular layout, most boards compare their geometry against it
+    return square if geometry == square else geometry
+
+
+@lru_cache(maxsize=64)
+def _puzzle_regions(geometry: Geometry) -> list:
+    size = geometry.size
+    return [[[idx // size, idx % size] for idx in region] for region in geometry.regions]
+
+
+def _puzzle_cages(geometry: Geometry) -> list:
+    size = geometry.size
+    cages = []
+    for cage in geometry.cages:
+        entry = {"cells": [[idx // size, idx % size] for idx in cage.cells]}
+        if cage.total is not None:
+            entry["value"] = cage.total
+        cages.append(entry)
+    return cages
+
+
+def board_from_puzzle(puzzle: dict) -> Board:
+    """Converts a Sudoku Maker puzzle object to a Board; values become givens."""
+    cells = puzzle.get("cells")
+    size = len(cells) if isinstance(cells, list) else 0
+    if not size or any(len(row) != size for row in cells):
+        raise ValueError("expected a square cells array")
+    geometry = puzzle_geometry(size, puzzle.get("regions"), puzzle.get("cages"))
+    values = [0] * geometry.num_cells
+    candidates = [0] * geometry.num_cells
+    given = 0
+    idx = 0
+    for row, row_cells in enumerate(cells, 1):
+        for col, cell in enumerate(row_cells, 1):
+            if cell:
+                if "value" in cell:
+                    values[idx] = _cell_digit(cell["value"], size, row, col)
+                    given |= 1 << idx
+                elif cell.get("centremarks"):
+                    mask = 0
+                    for digit in cell["centremarks"]:
+                        mask |= 1 << (_cell_digit(digit, size, row, col) - 1)
+                    candidates[idx] = mask
+            idx += 1
+    return Board.from_cells(values, candidates, given, geometry)
+
+
+def _cell_digit(digit, size: int, row: int, col: int) -> int:
+    digit = int(digit)
+    if not 1 <= digit <= size:
+        raise ValueError(f"digit {digit} out of range 1-{size} in row {row}, column {col}")
+    return digit
+
+
+def board_to_puzzle(board: Board, puzzle_id: str = "", title: str = "Nameless sudoku") -> dict:
+    """
+    Converts a Board to a Sudoku Maker puzzle object. Placed digits are written
+    as values and centermarks as centremarks.
+    """
+    size = board.geometry.size
+    cells = []
+    for row in range(size):
+        row_cells = []
+        for col in range(size):
+            idx = row * size + col
+            cell = {}
+            if board.values[idx]:
+                cell["value"] = board.values[idx]
+            elif board.candidates[idx]:
+                cell["centremarks"] = list(mask_digits(board.candidates[idx]))
+            row_cells.append(cell)
+        cells.append(row_cells)
+    return {
+        "id": puzzle_id,
+        "metadata": {"source": SOURCE, "title": title},
+        "cages": _puzzle_cages(board.geometry),
+        "cellSize": CELL_SIZE,
+        "cells": cells,
+        "regions": _puzzle_regions(board.geometry),
+    }
+
+
+def iter_json_objects(stream, chunk_size: int = CHUNK_SIZE):
+    """
+    Yields the top level JSON values of a text stream: the elements of a top
+    level array, or each value of a whitespace separated sequence. Only about
+    one value plus one chunk is held in memory at a time.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+    in_array = None
+
+    def fill() -> bool:
+        nonlocal buffer, pos, eof
+        if eof:
+            return False
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            eof = True
+            return False
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    def skip(characters: str) -> bool:
+        """Skips characters; returns False at the end of the input."""
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in characters:
+                pos += 1
+            if pos < len(buffer):
+                return True
+            if not fill():
+                return False
+
+    while True:
+        if not skip(_WHITESPACE + ("," if in_array else "")):
+            if in_array:
+                raise ValueError("unterminated JSON array")
+            return
+        if in_array is None:
+            in_array = buffer[pos] == "["
+            if in_array:
+                pos += 1
+                continue
+        if in_array and buffer[pos] == "]":
+            return
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if fill():
+                    continue
+                raise
+            # a number followed by nothing but what could continue it may be truncated, e.g. "1." of "1.5"
+            if not eof and not isinstance(value, (dict, list, str)) and not buffer[end:].lstrip(_NUMBER_CHARS):
+                if fill():
+                    continue
+            break
+        pos = end
+        yield value
+
+
+def iter_puzzles(path_or_stream, chunk_size: int = CHUNK_SIZE):
+    """Yields a Board for every puzzle in a Sudoku Maker file or open text stream."""
+    if isinstance(path_or_stream, str):
+        with open(path_or_stream, encoding="utf-8") as stream:
+            yield from iter_puzzles(stream, chunk_size)
+        return
+    for puzzle in iter_json_objects(path_or_stream, chunk_size):
+        yield board_from_puzzle(puzzle)
+
+
+def load_puzzle(path: str) -> Board:
+    """Returns the first puzzle of a Sudoku Maker file."""
+    for board in iter_puzzles(path):
+        return board
+    raise ValueError(f"{path} holds no puzzles")
+
+
+def write_puzzles(boards, stream) -> int:
+    """
+    Writes the boards to stream as a JSON array of puzzle objects, one
+    object at a time. Returns the number of puzzles written.
+    """
+    count = 0
+    stream.write("[")
+    for board in boards:
+        stream.write(",\n" if count else "\n")
+        # dumps uses the C encoder, dump would encode piece by piece in Python
+        stream.write(json.dumps(board_to_puzzle(board, puzzle_id=str(count)), separators=(",", ":")))
+        count += 1
+    stream.write("\n]\n")
+    return count
+
+
+def save_puzzle(board: Board, path: str) -> None:
+    """Saves a single board in the same layout as a Sudoku Maker export."""
+    with open(path, "w", encoding="utf-8") as stream:
+        json.dump(board_to_puzzle(board), stream, indent=2)
+
+
+def benchmark(count: int = 100_000) -> dict:
+    """Exports and re-imports count puzzles through a temporary file; returns puzzles/sec for each direction."""
+    import os
+    import tempfile
+    from itertools import cycle, islice
+
+    from codec import parse_board
+
+    sample = [
+        "300967001040302080020000070070000090000873000500010003004705100905000207800621004",
+        "4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......",
+    ]
+    boards = [parse_board(puzzle) for puzzle in sample]
+    boards[1].fill_candidates()
+    boards[1].clear_seen_candidates()
+
+    handle, path = tempfile.mkstemp(suffix=".json")
+    os.close(handle)
+    try:
+        start = time.perf_counter()
+        with open(path, "w", encoding="utf-8") as stream:
+            write_puzzles(islice(cycle(boards), count), stream)
+        export_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        imported = sum(1 for _ in iter_puzzles(path))
+        import_time = time.perf_counter() - start
+    finally:
+        os.remove(path)
+    if imported != count:
+        raise RuntimeError(f"wrote {count} puzzles but read back {imported}")
+    return {"export": count / export_time, "import": count / import_time}
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    for direction, rate in benchmark(count).items():
+        print(f"{direction}: {rate:.0f} puzzles/sec")
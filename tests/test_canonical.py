@@ -0,0 +1,44 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from canonical import canonicalize  # noqa: E402
+from solver import solve  # noqa: E402
+
+PUZZLE = "4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......"
+
+
+def transformed(puzzle: str, rng: random.Random) -> str:
+    """puzzle under a random relabeling, band, stack, row and column permutation and transposition."""
+    labels = list("123456789")
+    rng.shuffle(labels)
+    relabel = dict(zip("123456789", labels))
+
+    def order() -> list:
+        bands = rng.sample(range(3), 3)
+        return [3 * band + row for band in bands for row in rng.sample(range(3), 3)]
+
+    rows, cols = order(), order()
+    grid = [[puzzle[9 * r + c] for c in cols] for r in rows]
+    if rng.random() < 0.5:
+        grid = [list(column) for column in zip(*grid)]
+    return "".join(relabel.get(char, ".") for row in grid for char in row)
+
+
+def test_equivalent_puzzles_share_the_canonical_form():
+    rng = random.Random(0)
+    canonical, _ = canonicalize(PUZZLE)
+    for _ in range(20):
+        assert canonicalize(transformed(PUZZLE, rng))[0] == canonical
+
+
+def test_the_transform_maps_solutions_both_ways():
+    rng = random.Random(1)
+    puzzle = transformed(PUZZLE, rng)
+    canonical, transform = canonicalize(puzzle)
+    solution = bytes(int(digit) for digit in str(solve(puzzle)))
+    canonical_solution = transform.to_canonical(solution)
+    assert str(solve(canonical)) == "".join(map(str, canonical_solution))
+    assert transform.from_canonical(canonical_solution) == solution
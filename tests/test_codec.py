@@ -0,0 +1,72 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from board import square_geometry  # noqa: E402
+from codec import (  # noqa: E402
+    decode_bytes, decode_cells, decode_many, decode_many_cells, encode, encode_bytes, encode_symbols, parse_board,
+)
+
+PUZZLE = "4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......"
+
+
+def sample_board():
+    """PUZZLE with a filled in digit and some centermarks besides its givens."""
+    board = parse_board(PUZZLE)
+    board.set_value(1, 1)
+    board.toggle_candidate(2, 2)
+    board.toggle_candidate(2, 6)
+    board.toggle_candidate(3, 9)
+    board.toggle_candidate(3, 3)
+    return board
+
+
+def test_packed_format_round_trips():
+    board = sample_board()
+    assert parse_board(encode(board)) == board
+
+
+def test_packed_format_accepts_either_case():
+    record = encode(sample_board())
+    assert record != record.upper()
+    assert parse_board(record.upper()) == parse_board(record)
+
+
+def test_symbols_accept_either_case():
+    text = "A" + "." * 254 + "g"
+    board = parse_board(text.lower())
+    assert board.geometry == square_geometry(16)
+    assert board.values[0] == 10 and board.values[255] == 16
+    assert encode_symbols(board) == text.replace(".", "0").upper()
+
+
+def test_decode_cells_matches_the_decoded_board():
+    board = sample_board()
+    for record in (encode_bytes(board), PUZZLE.encode()):
+        values, masks, given = decode_cells(record)
+        decoded = decode_bytes(record)
+        assert values == bytes(decoded.values)
+        assert list(masks) == list(decoded.candidates)
+        assert given == decoded.given
+
+
+def test_decode_many_cells_skips_blank_lines():
+    board = sample_board()
+    data = encode_bytes(board) + b"\n\n  \n" + PUZZLE.encode() + b"\n"
+    assert len(list(decode_many_cells(data))) == 2
+    assert list(decode_many(data)) == [board, parse_board(PUZZLE)]
+
+
+@pytest.mark.parametrize("record", [
+    b"",
+    PUZZLE.encode()[:-1],
+    PUZZLE.encode()[:-1] + b"x",
+    b"0" * 161 + b"w",
+    b"1" * 15 + b"H",
+])
+def test_decode_cells_rejects_invalid_records(record):
+    with pytest.raises(ValueError):
+        decode_cells(record)
@@ -0,0 +1,36 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import HEADER_INTERVAL, Corpus, CorpusWriter, SOLUTIONS, pack_lines  # noqa: E402
+
+PUZZLE = b"4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......"
+SOLUTION = b"417369825632158947958724316825437169791586432346912758289643571573291684164875293"
+FULL = b"358967421741352689629184375173546892492873516586219743264795138915438267837621954"
+
+
+def test_pack_lines_keeps_solutions_in_step_over_blank_lines(tmp_path):
+    path = str(tmp_path / "puzzles.sudc")
+    # batch solving drops the blank lines, so there is one solution line per puzzle
+    lines = [PUZZLE, b"", b"   ", FULL]
+    solutions = iter([SOLUTION, FULL])
+    with CorpusWriter(path, planes=SOLUTIONS) as writer:
+        assert pack_lines(lines, writer, solutions) == (2, 0)
+    with Corpus(path) as corpus:
+        assert len(corpus) == 2
+        assert corpus.solution(0) == bytes(int(digit) for digit in SOLUTION.decode())
+        assert corpus.solution(1) == bytes(int(digit) for digit in FULL.decode())
+
+
+def test_unclosed_writer_keeps_puzzles_up_to_the_last_header_rewrite(tmp_path):
+    path = str(tmp_path / "puzzles.sudc")
+    writer = CorpusWriter(path)
+    pack_lines([PUZZLE] * (HEADER_INTERVAL + 10), writer)
+    # a crash: the writer is never closed
+    writer.stream.flush()
+    with CorpusWriter(path, append=True) as appender:
+        assert appender.count == HEADER_INTERVAL
+    with Corpus(path) as corpus:
+        assert len(corpus) == HEADER_INTERVAL
+    writer.stream.close()
@@ -0,0 +1,47 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enumerator import SolutionEnumerator, count_parallel, count_subtree, split  # noqa: E402
+from solver import count_solutions  # noqa: E402
+
+SOLUTION = "417369825632158947958724316825437169791586432346912758289643571573291684164875293"
+# the solution with its first 20 cells blanked has 8 solutions, with 25 blanked 30
+PUZZLE = "." * 20 + SOLUTION[20:]
+OTHER = "." * 25 + SOLUTION[25:]
+
+
+def test_all_solutions_are_listed_once():
+    solutions = [bytes(solution) for solution in SolutionEnumerator(PUZZLE)]
+    assert len(solutions) == len(set(solutions)) == count_solutions(PUZZLE, limit=100).count
+
+
+@pytest.mark.parametrize("stop", [1, 3, 7])
+def test_a_cursor_resumes_after_the_last_solution(stop):
+    every = [bytes(solution) for solution in SolutionEnumerator(PUZZLE)]
+    assert len(every) == 8
+    first = SolutionEnumerator(PUZZLE)
+    listed = [bytes(next(first)) for _ in range(stop)]
+    resumed = SolutionEnumerator(PUZZLE, first.cursor())
+    assert resumed.count == stop
+    assert listed + [bytes(solution) for solution in resumed] == every
+    assert resumed.done
+
+
+def test_a_cursor_of_another_puzzle_is_refused():
+    cursor = SolutionEnumerator(PUZZLE).cursor()
+    with pytest.raises(ValueError):
+        SolutionEnumerator(OTHER, cursor)
+    with pytest.raises(ValueError):
+        SolutionEnumerator(PUZZLE, "not a cursor")
+
+
+@pytest.mark.parametrize("parts", [1, 2, 5, 64])
+def test_split_counts_add_up(parts):
+    total = count_solutions(PUZZLE, limit=100).count
+    cursors = split(PUZZLE, parts)
+    assert sum(count_subtree(PUZZLE, cursor)[0] for cursor in cursors) == total
+    assert sum(count for count, _ in count_parallel(PUZZLE, parts=parts)) == total
@@ -0,0 +1,72 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from board import Board, square_geometry  # noqa: E402
+from codec import parse_board  # noqa: E402
+from history import History, pack_state, unpack_state  # noqa: E402
+
+PUZZLE = "4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......"
+
+
+def edit(history, board, change, cells=None):
+    before = history.capture(board, cells)
+    change(board)
+    return history.record(board, before)
+
+
+def test_states_round_trip_on_the_largest_grid():
+    board = Board(square_geometry(25))
+    board.set_value(0, 25, given=True)
+    board.set_value(1, 17)
+    board.toggle_candidate(2, 1)
+    board.toggle_candidate(2, 25)
+    assert unpack_state(pack_state(board, 0)) == (25, 0, True)
+    assert unpack_state(pack_state(board, 1)) == (17, 0, False)
+    assert unpack_state(pack_state(board, 2)) == (0, 1 | 1 << 24, False)
+    assert unpack_state(pack_state(board, 3)) == (0, 0, False)
+
+
+def test_only_changed_cells_are_stored():
+    board = parse_board(PUZZLE)
+    history = History()
+    assert edit(history, board, lambda b: b.set_value(1, 1)) == [1]
+    # capturing every cell still stores a single word for the one change
+    assert len(history.changes) == 1
+    assert edit(history, board, lambda b: None) == []
+    assert len(history.ends) == 1
+
+
+def test_undo_and_redo_restore_every_state():
+    board = parse_board(PUZZLE)
+    history = History()
+    states = [board.copy()]
+    edit(history, board, lambda b: b.set_value(1, 1), [1])
+    states.append(board.copy())
+    edit(history, board, lambda b: (b.toggle_candidate(2, 2), b.toggle_candidate(3, 9)), [2, 3])
+    states.append(board.copy())
+    edit(history, board, lambda b: b.clear_cell(1), [1])
+    states.append(board.copy())
+    for state in reversed(states[:-1]):
+        history.undo(board)
+        assert board == state
+    assert not history.can_undo()
+    for state in states[1:]:
+        history.redo(board)
+        assert board == state
+    assert not history.can_redo()
+
+
+def test_a_new_edit_drops_the_undone_ones():
+    board = parse_board(PUZZLE)
+    history = History()
+    edit(history, board, lambda b: b.set_value(1, 1), [1])
+    edit(history, board, lambda b: b.set_value(2, 2), [2])
+    history.undo(board)
+    edit(history, board, lambda b: b.set_value(3, 3), [3])
+    assert not history.can_redo()
+    assert len(history.changes) == 2
+    history.undo(board)
+    history.undo(board)
+    assert board == parse_board(PUZZLE)
@@ -0,0 +1,77 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from board import Board, Geometry  # noqa: E402
+from cages import Cage  # noqa: E402
+from codec import parse_board  # noqa: E402
+from journal import Journal, encode_checkpoint, recover  # noqa: E402
+
+PUZZLE = "4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......"
+
+
+def journal_edits(path, edits):
+    """Journals the edits, each a function changing the board and returning the cells it changed."""
+    board = parse_board(PUZZLE)
+    journal = Journal(path)
+    journal.checkpoint(board)
+    boards = [board.copy()]
+    for change in edits:
+        journal.append(board, change(board))
+        boards.append(board.copy())
+    journal.close()
+    return boards
+
+
+EDITS = [
+    lambda b: (b.set_value(1, 1), [1])[1],
+    lambda b: (b.toggle_candidate(2, 2), b.toggle_candidate(3, 9), [2, 3])[2],
+    lambda b: (b.clear_cell(1), [1])[1],
+]
+
+
+def test_recover_replays_every_edit(tmp_path):
+    path = str(tmp_path / "session.journal")
+    boards = journal_edits(path, EDITS)
+    assert recover(path) == boards[-1]
+
+
+def test_a_torn_last_edit_is_ignored(tmp_path):
+    path = str(tmp_path / "session.journal")
+    boards = journal_edits(path, EDITS)
+    size = os.path.getsize(path)
+    # the last edit is one word, the one before it two
+    for cut, expected in ((1, boards[2]), (8, boards[2]), (9, boards[1]), (20, boards[1])):
+        with open(path, "r+b") as stream:
+            stream.truncate(size - cut)
+        assert recover(path) == expected
+        journal_edits(path, EDITS)
+
+
+def test_a_missing_journal_recovers_nothing(tmp_path):
+    assert recover(str(tmp_path / "missing.journal")) is None
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"SUDJ",
+    b"not a journal at all",
+    encode_checkpoint(parse_board(PUZZLE))[:40],
+])
+def test_damaged_journals_raise_value_error(tmp_path, data):
+    path = tmp_path / "session.journal"
+    path.write_bytes(data)
+    with pytest.raises(ValueError):
+        recover(str(path))
+
+
+def test_a_cut_cage_table_raises_value_error(tmp_path):
+    board = Board(Geometry(9, None, [Cage((0, 1, 2), 6), Cage((9, 10), 17)]))
+    path = tmp_path / "session.journal"
+    # the header, the cage count and half of the first cage
+    path.write_bytes(encode_checkpoint(board)[:12])
+    with pytest.raises(ValueError):
+        recover(str(path))
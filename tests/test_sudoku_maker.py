@@ -0,0 +1,58 @@
+import io
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from codec import parse_board  # noqa: E402
+from sudoku_maker import board_from_puzzle, board_to_puzzle, iter_json_objects, iter_puzzles, write_puzzles  # noqa: E402
+
+PUZZLE = "4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......"
+
+
+def puzzle_with_value(value, row=3, col=5):
+    puzzle = board_to_puzzle(parse_board(PUZZLE))
+    puzzle["cells"][row - 1][col - 1] = {"value": value}
+    return puzzle
+
+
+@pytest.mark.parametrize("value", [0, 10, -1])
+def test_digits_out_of_range_are_rejected(value):
+    with pytest.raises(ValueError, match="row 3, column 5"):
+        board_from_puzzle(puzzle_with_value(value))
+
+
+def test_out_of_range_centremarks_are_rejected():
+    puzzle = board_to_puzzle(parse_board(PUZZLE))
+    puzzle["cells"][0][1] = {"centremarks": [1, 12]}
+    with pytest.raises(ValueError, match="digit 12 out of range 1-9"):
+        board_from_puzzle(puzzle)
+
+
+def test_digits_in_range_are_given():
+    board = board_from_puzzle(puzzle_with_value(9, row=1, col=2))
+    assert board.values[1] == 9 and board.is_given(1)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 4096])
+def test_streaming_does_not_depend_on_chunk_boundaries(chunk_size):
+    boards = [parse_board(PUZZLE), parse_board("1" + "." * 80), parse_board("." * 80 + "9")]
+    stream = io.StringIO()
+    assert write_puzzles(boards, stream) == 3
+    stream.seek(0)
+    assert list(iter_puzzles(stream, chunk_size)) == boards
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5])
+def test_streaming_splits_a_sequence_of_values(chunk_size):
+    values = [{"a": [1, 2]}, 12345, "x y", [], 1.5]
+    text = "  ".join(json.dumps(value) for value in values)
+    assert list(iter_json_objects(io.StringIO(text), chunk_size)) == values
+
+
+def test_unterminated_array_is_an_error():
+    with pytest.raises(ValueError):
+        list(iter_json_objects(io.StringIO('[{"a": 1}, '), 4))
@@ -0,0 +1,116 @@
+"""
+Background tasks for the GUI.
+
+A Task runs a search function on a QThreadPool thread. The function is
+called with a progress callback that it hands on to the solver; the task
+turns those calls into throttled progress signals and answers True once the
+task was cancelled, which makes the solver stop. The result is delivered
+through the finished signal, which Qt queues onto the GUI thread.
+"""
+
+import threading
+import time
+import traceback
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+# minimum time between two progress signals, so a fast search cannot flood the event loop
+PROGRESS_PERIOD = 1 / 30
+
+
+class TaskSignals(QObject):
+    progress = Signal(int, float)  # nodes, elapsed seconds
+    finished = Signal(object)  # result of the function
+    failed = Signal(str)  # formatted traceback
+
+
+class Task(QRunnable):
+    """Runs function(*args, progress=callback) on a pool thread."""
+
+    def __init__(self, function, *args) -> None:
+        super().__init__()
+        self.function = function
+        self.args = args
+        self.signals = TaskSignals()
+        self.cancel_event = threading.Event()
+        self.start_time = 0.0
+        self.last_progress = 0.0
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def progress(self, nodes: int) -> bool:
+        now = time.perf_counter()
+        if now - self.last_progress >= PROGRESS_PERIOD:
+            self.last_progress = now
+            self.signals.progress.emit(nodes, now - self.start_time)
+        return self.cancel_event.is_set()
+
+    def run(self) -> None:
+        self.start_time = self.last_progress = time.perf_counter()
+        try:
+            result = self.function(*self.args, progress=self.progress)
+        except Exception:
+            self.signals.failed.emit(traceback.format_exc())
+        else:
+            self.signals.finished.emit(result)
+
+
+class TaskRunner(QObject):
+    """
+    Runs one Task at a time; starting a new one cancels the previous one,
+    whose result is then dropped. running_changed is emitted when the runner
+    becomes busy or idle.
+    """
+
+    running_changed = Signal(bool)
+
+    def __init__(self, parent=None, pool=None) -> None:
+        super().__init__(parent)
+        self.pool = pool or QThreadPool.globalInstance()
+        self.task = None
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None
+
+    def start(self, function, *args, on_finished, on_progress=None, on_failed=None) -> Task:
+        self.cancel()
+        task = Task(function, *args)
+        task.setAutoDelete(False)
+        # the slots check the task is still current, results of cancelled tasks are dropped
+        task.signals.finished.connect(lambda result: self._finish(task, on_finished, result))
+        task.signals.failed.connect(lambda error: self._finish(task, on_failed, error))
+        if on_progress is not None:
+            task.signals.progress.connect(
+                lambda nodes, elapsed: task is self.task and not task.cancelled and on_progress(nodes, elapsed)
+            )
+        self.task = task
+        self.running_changed.emit(True)
+        self.pool.start(task)
+        return task
+
+    def _finish(self, task: Task, callback, value) -> None:
+        if task is not self.task:
+            return
+        self.task = None
+        self.running_changed.emit(False)
+        if callback is not None and not task.cancelled:
+            callback(value)
+
+    def cancel(self) -> bool:
+        """Cancels the running task; returns False if there was none."""
+        task = self.task
+        if task is None:
+            return False
+        task.cancel()
+        self.task = None
+        self.running_changed.emit(False)
+        return True
+
+    def wait(self, msecs: int = -1) -> bool:
+        return self.pool.waitForDone(msecs)